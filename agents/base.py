@@ -1,8 +1,43 @@
+import os
 import json
-from jinja2 import Template
+import time
+import logging
+import threading
+from jinja2 import Environment, FileSystemLoader
+import metrics
 
-def render(t: str, **kw)->str:
-    return Template(t).render(**kw)
+logger = logging.getLogger("agentic_chatbot.base")
+
+PROMPT_DIR = os.getenv("PROMPT_DIR", "model_registry/prompts")
+
+# Templates are compiled once and cached by the Environment; auto_reload=False
+# skips the per-render mtime check.
+_env = Environment(
+    loader=FileSystemLoader(PROMPT_DIR, encoding="utf-8"),
+    auto_reload=False,
+)
+_last_render: dict = {}
+_last_render_lock = threading.Lock()
+
+def render_prompt(name: str, **kw) -> str:
+    """Render a prompt from the shared template environment and record timing/prefix stability.
+
+    Templates keep static instructions and schema first and the conversation
+    history and user input last, so consecutive prompts share a long prefix
+    that provider-side prompt caching can reuse.
+    """
+    t0 = time.perf_counter()
+    out = _env.get_template(name).render(**kw)
+    metrics.observe("prompt.render_ms", (time.perf_counter() - t0) * 1000.0)
+
+    with _last_render_lock:
+        prev = _last_render.get(name)
+        _last_render[name] = out
+    if prev is not None and out:
+        shared = len(os.path.commonprefix([prev, out]))
+        metrics.observe("prompt.prefix_stable_ratio", shared / len(out))
+        metrics.observe(f"prompt.prefix_chars.{name}", shared)
+    return out
 
 def extract_first_json_block(text: str)->dict:
     s=text.strip()
@@ -12,3 +47,15 @@ def extract_first_json_block(text: str)->dict:
             s=s.rsplit('\n',1)[0]
     a,b=s.find('{'), s.rfind('}')
     return json.loads(s[a:b+1]) if a!=-1 and b!=-1 and b>a else json.loads(s)
+
+def parse_model(text: str, model_cls, structured: bool = False) -> dict:
+    """Parse an agent's final JSON; validate it directly when it came from structured-output mode."""
+    if structured:
+        try:
+            data = model_cls.model_validate_json(text).model_dump()
+            metrics.incr("llm.structured_parse_ok")
+            return data
+        except Exception:
+            logger.warning(f"Structured {model_cls.__name__} failed validation; scraping JSON from text instead.")
+            metrics.incr("llm.structured_parse_failed")
+    return extract_first_json_block(text)
@@ -1,15 +1,29 @@
 from typing import Dict, Any
-from agents.base import render
+from agents.base import render_prompt
 from graph.openai_client import openai_generate
+import metrics
 import logging
 
 logger = logging.getLogger("agentic_chatbot.clarify")
-tmpl = open('model_registry/prompts/clarify_agent.j2', encoding='utf-8').read()
+
+def _reply(state: Dict[str, Any], question: str) -> Dict[str, Any]:
+    state['response'] = question
+    state['current_agent'] = 'clarify_agent'
+    if state.get('memory'):
+        state['memory'].add_ai(question)
+    logger.info("Clarify question: %s", question)
+    return state
 
 def run_clarify(state: Dict[str, Any]) -> Dict[str, Any]:
+    templated = state.pop('slot_question', None)
+    if templated:
+        # The slot pass already knows exactly which fields are missing.
+        metrics.incr("clarify.templated")
+        return _reply(state, templated)
+
     history = state['memory'].get_formatted() if state.get('memory') else ''
-    prompt = render(
-        tmpl,
+    prompt = render_prompt(
+        'clarify_agent.j2',
         conversation_history=history,
         user_input=state['query'],
     )
@@ -19,10 +33,4 @@ def run_clarify(state: Dict[str, Any]) -> Dict[str, Any]:
     except Exception as e:
         logger.exception("Clarify Agent failed to generate; providing minimal fallback question.")
         question = "Could you share any missing details so I can proceed?"
-
-    state['response'] = question
-    state['current_agent'] = 'clarify_agent'
-    if state.get('memory'):
-        state['memory'].add_ai(question)
-    logger.info(f"Clarify question: {question}")
-    return state
+    return _reply(state, question)
@@ -1,9 +1,12 @@
+import json
 import logging
-from typing import Dict, Any
-from agents.base import render, extract_first_json_block
-from model_registry.schemas import PolicyAnswer
+from typing import Dict, Any, List
+from agents.base import render_prompt, parse_model
+from model_registry.schemas import PolicyAnswer, cached_schema_json
 from tools.tools import openai_tools_for_faq, faq_dispatch
-from graph.openai_client import openai_tool_loop
+from graph.openai_client import openai_tool_loop, structured_output_active, DeadlineExceeded
+from answer_cache import get_answer_cache, CACHE_ENABLED
+import metrics
 
 logger = logging.getLogger("agentic_chatbot.faq")
 
@@ -14,49 +17,144 @@ SYSTEM_PROMPT = """You are the FAQ/RAG AGENT.
 - When done, RETURN ONLY a valid PolicyAnswer JSON (no backticks, no extra text).
 """
 
-USER_TMPL = open('model_registry/prompts/faq_agent.j2', encoding='utf-8').read()
+SYSTEM_PROMPT_WITH_EVIDENCE = SYSTEM_PROMPT.replace(
+    "- You MUST call the tool `rag_search` (exact name) before answering.",
+    "- Evidence for this question was already retrieved and is in the user message; answer from it and call the tool `rag_search` (exact name) only if it is insufficient.",
+)
+
+USER_TMPL = 'faq_agent.j2'
+
+def _hits(payloads: List[Any]) -> List[Dict[str, Any]]:
+    """rag_search hits from raw tool outputs / prefetched evidence, de-duplicated by chunk id."""
+    hits, seen = [], set()
+    for p in payloads:
+        if isinstance(p, str):
+            try:
+                p = json.loads(p)
+            except Exception:
+                continue
+        for hit in p if isinstance(p, list) else []:
+            if isinstance(hit, dict) and hit.get("id") and hit["id"] not in seen:
+                seen.add(hit["id"])
+                hits.append(hit)
+    return hits
+
+def _chunk_ids(payloads: List[Any]) -> List[str]:
+    return [hit["id"] for hit in _hits(payloads)]
+
+def _evidence_answer(payloads: List[Any]) -> Dict[str, Any]:
+    """PolicyAnswer-shaped reply quoting the best retrieved chunk, for turns that ran out of time."""
+    hits = _hits(payloads)
+    if not hits:
+        return {"response": "I couldn't finish checking the policy documents in time. Please try again.",
+                "sources": [], "confidence": 0.0}
+    top = hits[0]
+    chunk = (top.get("chunk") or "").strip()
+    if len(chunk) > 600:
+        chunk = chunk[:600].rsplit(" ", 1)[0] + " …"
+    return {
+        "response": f"Here is the most relevant passage from {top.get('title') or 'our policy documents'}:\n{chunk}",
+        "sources": [{"title": h.get("title") or "", "id": h["id"]} for h in hits[:3]],
+        "confidence": 0.3,
+    }
+
+def _finish(state: Dict[str, Any], data: Dict[str, Any]) -> Dict[str, Any]:
+    state['response'] = data.get('response', '')
+    state['rag'] = data
+    state['current_agent'] = 'faq_agent'
+    if state.get('memory'):
+        state['memory'].add_ai(state['response'])
+    logger.info("FAQ Agent answer: %s", state['response'])
+    return state
 
 def run_faq(state: Dict[str, Any]) -> Dict[str, Any]:
     logger.info("Entering FAQ Agent (Chat Completions tool-calling).")
-    schema = PolicyAnswer.model_json_schema()
-    history = state['memory'].get_formatted() if state.get('memory') else ''
+    evidence = state.pop('prefetched_evidence', None)
+    fused = state.pop('fused', None)
+
+    cache, query_vec = None, None
+    # A follow-up ("and for children?") means something only with the history, so it is neither answered
+    # from nor stored in a cache keyed by the query text alone.
+    if CACHE_ENABLED and state.get('memory') and state['memory'].has_history:
+        state['faq_cache'] = 'bypass'
+        metrics.incr("faq_cache.bypassed_history")
+    elif CACHE_ENABLED:
+        try:
+            cache = get_answer_cache()
+            query_vec = cache.embed(state['query'])
+            cached = cache.lookup(query_vec)
+        except Exception:
+            logger.warning("FAQ answer cache unavailable for this turn.", exc_info=True)
+            cache, cached = None, None
+        if cached is not None:
+            state['faq_cache'] = 'hit'
+            return _finish(state, cached)
+        state['faq_cache'] = 'miss'
 
-    user_prompt = render(
+    history = state['memory'].get_formatted() if state.get('memory') else ''
+    user_prompt = render_prompt(
         USER_TMPL,
+        schema_json=cached_schema_json(PolicyAnswer),
         conversation_history=history,
         user_input=state['query'],
-        schema=schema,
+        evidence=json.dumps(evidence, ensure_ascii=False) if evidence else "",
     )
 
     tools = openai_tools_for_faq()
     dispatch = faq_dispatch()
+    searches = []
+    rag_search = dispatch["rag_search"]
 
-    resp = openai_tool_loop(
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": user_prompt},
-        ],
-        tools=tools,
-        dispatch=dispatch,
-        max_rounds=3,
-        temperature=0.2,
-        max_output_tokens=500,
-        finalizer_prompt="Return ONLY the final PolicyAnswer JSON now. No backticks, no commentary.",
-    )
+    def _tracked_search(args: str) -> str:
+        out = rag_search(args)
+        searches.append(out)
+        return out
+    dispatch["rag_search"] = _tracked_search
+
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT_WITH_EVIDENCE if evidence else SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt},
+    ]
+    fused_outputs = []
+    if fused and fused.get('agent') == 'faq':
+        logger.info("Continuing from the fused router's tool results.")
+        messages += fused['messages']
+        fused_outputs = list(fused.get('outputs') or [])
+
+    try:
+        resp = openai_tool_loop(
+            messages=messages,
+            tools=tools,
+            dispatch=dispatch,
+            max_rounds=3,
+            temperature=0.2,
+            max_output_tokens=500,
+            finalizer_prompt="Return ONLY the final PolicyAnswer JSON now. No backticks, no commentary.",
+            response_model=PolicyAnswer,
+            deadline=state.get('deadline'),
+        )
+    except DeadlineExceeded:
+        logger.warning("Turn deadline reached inside the FAQ tool loop; answering from retrieved evidence.")
+        metrics.incr("faq.deterministic_answer")
+        return _finish(state, _evidence_answer([evidence or []] + fused_outputs + searches))
+
+    if evidence and not searches:
+        metrics.incr("prefetch.tool_round_skipped")
 
     text = resp.choices[0].message.content or ""
     try:
-        data = extract_first_json_block(text)
+        data = parse_model(text, PolicyAnswer, structured=structured_output_active())
     except Exception:
         logger.exception("Failed to parse PolicyAnswer JSON after tool loop.")
         state['response'] = "I couldn't produce the final policy JSON answer. Please try rephrasing."
         state['current_agent'] = 'faq_agent'
         return state
 
-    state['response'] = data.get('response', '')
-    state['rag'] = data
-    state['current_agent'] = 'faq_agent'
-    if state.get('memory'):
-        state['memory'].add_ai(state['response'])
-    logger.info(f"FAQ Agent answer: {state['response']}")
-    return state
+    if cache is not None and data.get('response'):
+        try:
+            answer = PolicyAnswer.model_validate(data).model_dump()
+            cache.put(query_vec, state['query'], answer, _chunk_ids([evidence or []] + fused_outputs + searches))
+        except Exception:
+            logger.info("FAQ answer not cached (failed PolicyAnswer validation).")
+
+    return _finish(state, data)
@@ -1,9 +1,13 @@
+import json
 import logging
 from typing import Dict, Any, List
-from agents.base import render, extract_first_json_block
-from model_registry.schemas import FlightAnswer
+from agents.base import render_prompt, parse_model
+from model_registry.schemas import FlightAnswer, cached_schema_json
 from tools.tools import openai_tools_for_flight, flight_dispatch
-from graph.openai_client import openai_tool_loop
+from helpers import FlightResultCache, criteria_delta
+from agents.slots import slots_from_criteria
+import metrics
+from graph.openai_client import openai_tool_loop, structured_output_active, DeadlineExceeded
 
 logger = logging.getLogger("agentic_chatbot.flight")
 
@@ -14,7 +18,7 @@ SYSTEM_PROMPT = """You are the FLIGHT AGENT.
 - In the FlightAnswer.summary, include a concise natural-language recap mentioning airline(s), layover(s), price, dates.
 """
 
-USER_TMPL = open('model_registry/prompts/flight_agent.j2', encoding='utf-8').read()
+USER_TMPL = 'flight_agent.j2'
 
 
 def _format_itinerary(it: Dict[str, Any]) -> str:
@@ -74,49 +78,102 @@ def _format_response(data: Dict[str, Any], max_lines: int = 3) -> str:
     return "\n".join(lines)
 
 
+def _deterministic_answer(cache: FlightResultCache) -> Dict[str, Any]:
+    """FlightAnswer-shaped dict built from this turn's flight_filter call, without another model round."""
+    return {
+        "intent": "schedule_search",
+        "criteria": dict(cache.entry["criteria"]),
+        "itineraries": sorted(cache.matches(), key=lambda it: it.get("price_usd") or 0),
+        "summary": "",
+    }
+
+
 def run_flight(state: Dict[str, Any]) -> Dict[str, Any]:
     logger.info("Entering Flight Agent (Chat Completions tool-calling).")
-    schema = FlightAnswer.model_json_schema()
     history = state['memory'].get_formatted() if state.get('memory') else ''
-
-    user_prompt = render(
+    prev = state.get('results') or {}
+    prev_criteria = prev.get('criteria') or None
+    # When the slot pass routed this turn, its slots are the intended criteria, so the change to the last
+    # search is known before the model runs and is handed to it rather than reconstructed afterwards.
+    planned_delta = {}
+    if prev_criteria and state.get('route_path') == 'slots' and state.get('slots'):
+        planned_delta = criteria_delta(slots_from_criteria(prev_criteria), slots_from_criteria(state['slots']))
+
+    user_prompt = render_prompt(
         USER_TMPL,
+        schema_json=cached_schema_json(FlightAnswer),
         conversation_history=history,
+        previous_criteria=json.dumps(prev_criteria, ensure_ascii=False) if prev_criteria else "",
+        slots=json.dumps(state['slots'], ensure_ascii=False) if state.get('slots') else "",
+        criteria_delta=json.dumps(planned_delta, ensure_ascii=False) if planned_delta else "",
         user_input=state['query'],
-        schema=schema,
     )
 
     tools = openai_tools_for_flight()
-    dispatch = flight_dispatch()
-
-    resp = openai_tool_loop(
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": user_prompt},
-        ],
-        tools=tools,
-        dispatch=dispatch,
-        max_rounds=4,
-        temperature=0.2,
-        max_output_tokens=700,
-        finalizer_prompt="Return ONLY the final FlightAnswer JSON now. No backticks, no commentary.",
-    )
+    fused = state.pop('fused', None)
+    if fused and fused.get('agent') == 'flight':
+        cache = fused.get('flight_cache') or FlightResultCache(prev.get('search'))
+    else:
+        cache = FlightResultCache(prev.get('search'))
+    dispatch = flight_dispatch(cache)
+
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt},
+    ]
+    if fused and fused.get('agent') == 'flight':
+        logger.info("Continuing from the fused router's tool results.")
+        messages += fused['messages']
 
-    text = resp.choices[0].message.content or ""
     try:
-        data = extract_first_json_block(text)
-    except Exception:
-        logger.exception("Failed to parse FlightAnswer JSON after tool loop.")
-        state['response'] = "I couldn't produce the final flight JSON answer. Please try rephrasing."
-        state['current_agent'] = 'flight_agent'
-        return state
+        resp = openai_tool_loop(
+            messages=messages,
+            tools=tools,
+            dispatch=dispatch,
+            max_rounds=4,
+            temperature=0.2,
+            max_output_tokens=700,
+            finalizer_prompt="Return ONLY the final FlightAnswer JSON now. No backticks, no commentary.",
+            response_model=FlightAnswer,
+            deadline=state.get('deadline'),
+        )
+    except DeadlineExceeded:
+        logger.warning("Turn deadline reached inside the flight tool loop.")
+        resp = None
+
+    data = None
+    if resp is not None:
+        text = resp.choices[0].message.content or ""
+        try:
+            data = parse_model(text, FlightAnswer, structured=structured_output_active())
+        except Exception:
+            logger.exception("Failed to parse FlightAnswer JSON after tool loop.")
+
+    if data is None:
+        if cache.entry is prev.get('search'):
+            state['response'] = "I couldn't produce the final flight JSON answer. Please try rephrasing."
+            state['current_agent'] = 'flight_agent'
+            return state
+        # The search itself ran this turn; format its matches instead of failing the turn.
+        metrics.incr("flight.deterministic_answer")
+        data = _deterministic_answer(cache)
 
     pretty = _format_response(data, max_lines=3)
+    if cache.entry:
+        data['search'] = cache.entry
+    state['criteria_delta'] = criteria_delta(prev_criteria, data.get('criteria'))
+    if prev_criteria:
+        logger.info("Criteria changed since last search: %s", sorted(state['criteria_delta']))
+        if planned_delta and sorted(planned_delta) != sorted(state['criteria_delta']):
+            logger.info("Model changed %s; the slot pass asked for %s.", sorted(state['criteria_delta']),
+                        sorted(planned_delta))
 
     state['response'] = pretty
     state['results'] = data
+    state['slots'] = slots_from_criteria(data.get('criteria'))
+    state['pending_slots'] = []
     state['current_agent'] = 'flight_agent'
     if state.get('memory'):
         state['memory'].add_ai(state['response'])
-    logger.info(f"Flight Agent response composed ({len(data.get('itineraries') or [])} itineraries).")
+    logger.info("Flight Agent response composed (%d itineraries).", len(data.get('itineraries') or []))
     return state
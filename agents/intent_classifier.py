@@ -0,0 +1,174 @@
+import os
+import re
+import json
+import threading
+import logging
+from typing import Dict, Any, List, Tuple
+from places import get_place_index
+
+logger = logging.getLogger("agentic_chatbot.intent")
+
+INTENT_TRAIN_PATH = os.getenv("INTENT_TRAIN_PATH", "data/intent_train.jsonl")
+FASTPATH_ENABLED = os.getenv("INTENT_FASTPATH", "1").lower() not in ("0", "false", "no")
+FASTPATH_THRESHOLD = float(os.getenv("INTENT_FASTPATH_THRESHOLD", "0.8"))
+CENTROID_TEMPERATURE = float(os.getenv("INTENT_CENTROID_TEMPERATURE", "0.05"))
+# A flight word with no route is only weak evidence of missing fields (the route may be phrased in a way the
+# rules miss), so on its own it never reaches the fast-path threshold.
+ABSENCE_CONFIDENCE = 0.6
+
+INTENTS = ("schedule_search", "policy_visa", "policy_refund", "clarify_missing_fields", "off_topic")
+
+_VISA = [re.compile(p, re.I) for p in (
+    r"\bvisas?\b",
+    r"\bvisa[- ]free\b",
+    r"\bpassport holders?\b",
+    r"\b(entry|immigration|transit) (rules?|requirements?)\b",
+)]
+_REFUND = [re.compile(p, re.I) for p in (
+    r"\brefunds?\b",
+    r"\bcancel(?:l?ations?|l?ed|l?ing|s)?\b",
+    r"\bmoney back\b",
+    r"\b(processing|change|cancellation) fees?\b",
+)]
+_ROUTE = re.compile(r"\bfrom\s+[a-z][a-z .'-]*?\s+to\s+[a-z]", re.I)
+# "to London from Dubai", "Dubai to London", "DXB-NRT": both sides (one or two words) must be known places,
+# so "to Tokyo station from the airport" is not a route.
+_TO_FROM = re.compile(r"\bto\s+([a-z][a-z.'-]*(?:\s+[a-z][a-z.'-]*)?)\s+from\s+([a-z][a-z.'-]*(?:\s+[a-z][a-z.'-]*)?)",
+                      re.I)
+_PAIR = re.compile(r"([a-z][a-z.'-]*(?:\s+[a-z][a-z.'-]*)?)"
+                   r"(?=(?:\s+to\s+|\s*(?:-|→|->)\s*)([a-z][a-z.'-]*(?:\s+[a-z][a-z.'-]*)?))", re.I)
+_FLIGHT = re.compile(r"\b(flights?|fly|flying|itinerar(?:y|ies)|round[- ]?trip|one[- ]way|airfare|tickets? to)\b", re.I)
+_CONSTRAINT = re.compile(
+    r"\b(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\b|\$\s*\d+|\b(under|below)\s+\d+|\b(star alliance|oneworld|skyteam)\b",
+    re.I,
+)
+
+
+def _place_pair(query: str) -> bool:
+    index = get_place_index()
+    return any(index.resolve(m.group(1), fuzzy=False) and index.resolve(m.group(2), fuzzy=False)
+               for pattern in (_TO_FROM, _PAIR) for m in pattern.finditer(query))
+
+
+def rule_scores(query: str) -> Dict[str, int]:
+    q = query or ""
+    scores: Dict[str, int] = {}
+    visa = sum(1 for p in _VISA if p.search(q))
+    refund = sum(1 for p in _REFUND if p.search(q))
+    if visa:
+        scores["policy_visa"] = visa
+    if refund:
+        scores["policy_refund"] = refund
+    route = bool(_ROUTE.search(q)) or _place_pair(q)
+    flight = bool(_FLIGHT.search(q))
+    if route:
+        scores["schedule_search"] = 1 + int(flight) + int(bool(_CONSTRAINT.search(q)))
+    elif flight and not (visa or refund):
+        scores["clarify_missing_fields"] = 1
+    return scores
+
+
+class CentroidModel:
+    """Nearest-centroid classifier over the rag_store sentence embeddings."""
+
+    def __init__(self, path: str = INTENT_TRAIN_PATH):
+        self.path = path
+        self.labels: List[str] = []
+        self.centroids = None
+        self.available = True
+        self._lock = threading.Lock()
+
+    def _load_examples(self) -> List[Tuple[str, str]]:
+        out = []
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                obj = json.loads(line)
+                if obj.get("intent") in INTENTS and obj.get("text"):
+                    out.append((obj["text"], obj["intent"]))
+        return out
+
+    def _fit(self):
+        import numpy as np
+        from rag_store import embed, _normalize_rows
+
+        examples = self._load_examples()
+        labels = sorted({lab for _, lab in examples})
+        emb = embed([t for t, _ in examples])
+        rows = []
+        for lab in labels:
+            idx = [i for i, (_, l) in enumerate(examples) if l == lab]
+            rows.append(emb[idx].mean(axis=0))
+        self.labels = labels
+        self.centroids = _normalize_rows(np.asarray(rows, dtype="float32"))
+        logger.info(f"Intent centroids fitted: {len(examples)} examples, {len(labels)} labels.")
+
+    def ready(self) -> bool:
+        if self.centroids is not None:
+            return True
+        if not self.available:
+            return False
+        with self._lock:
+            if self.centroids is None and self.available:
+                try:
+                    self._fit()
+                except Exception:
+                    logger.warning("Intent centroid model unavailable; using rules only.", exc_info=True)
+                    self.available = False
+        return self.centroids is not None
+
+    def predict(self, query: str) -> Tuple[str, float]:
+        import numpy as np
+        from rag_store import embed
+
+        sims = (self.centroids @ embed([query])[0]).astype("float64")
+        z = np.exp((sims - sims.max()) / CENTROID_TEMPERATURE)
+        probs = z / z.sum()
+        best = int(probs.argmax())
+        return self.labels[best], float(probs[best])
+
+
+_centroids = CentroidModel()
+
+
+def warm_up() -> bool:
+    """Fit the centroid model now instead of on the first classified query."""
+    return _centroids.ready()
+
+
+def classify(query: str, has_history: bool = False) -> Dict[str, Any]:
+    scores = rule_scores(query)
+    rule_intent, rule_conf = None, 0.0
+    if len(scores) == 1:
+        rule_intent, hits = next(iter(scores.items()))
+        rule_conf = ABSENCE_CONFIDENCE if rule_intent == "clarify_missing_fields" else min(0.95, 0.75 + 0.1 * hits)
+
+    cent_intent, cent_conf = None, 0.0
+    if _centroids.ready():
+        try:
+            cent_intent, cent_conf = _centroids.predict(query)
+        except Exception:
+            logger.warning("Centroid prediction failed; using rules only.", exc_info=True)
+
+    if rule_intent and cent_intent:
+        if rule_intent == cent_intent:
+            intent, conf, source = rule_intent, 1 - (1 - rule_conf) * (1 - cent_conf), "rules+centroid"
+        else:
+            intent, conf, source = (rule_intent, rule_conf * 0.5, "rules") if rule_conf >= cent_conf \
+                else (cent_intent, cent_conf * 0.5, "centroid")
+    elif rule_intent:
+        intent, conf, source = rule_intent, rule_conf, "rules"
+    elif cent_intent and not scores:
+        # A follow-up like "only refundable ones" depends on the history the
+        # centroid never sees, so it routes alone only on a fresh conversation.
+        intent, conf, source = cent_intent, (cent_conf if not has_history else cent_conf * 0.5), "centroid"
+    else:
+        intent, conf, source = "clarify_missing_fields", 0.0, "none"
+
+    if has_history and intent == "clarify_missing_fields":
+        # Missing fields may already be present in earlier turns.
+        conf *= 0.5
+
+    return {"intent": intent, "confidence": round(conf, 4), "source": source, "rules": scores}
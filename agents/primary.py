@@ -1,38 +1,151 @@
+import os
+import time
 from typing import Dict, Any
-from model_registry.schemas import PrimaryRoute
-from agents.base import render, extract_first_json_block
-from graph.openai_client import openai_generate
+from model_registry.schemas import PrimaryRoute, cached_schema_json
+from agents.base import render_prompt, parse_model
+from agents.intent_classifier import classify, rule_scores, FASTPATH_ENABLED, FASTPATH_THRESHOLD
+from agents import slots
+from graph.openai_client import openai_generate, openai_tool_step, assistant_tool_message, run_tool_calls, structured_output_active, llm_priority
+from tools.tools import openai_tools_for_flight, openai_tools_for_faq, flight_dispatch, faq_dispatch
+from helpers import FlightResultCache
+import metrics
 import logging
 
 logger = logging.getLogger("agentic_chatbot.primary")
 
-tmpl = open('model_registry/prompts/primary_router.j2', encoding='utf-8').read()
+FUSED_ROUTING = os.getenv("ROUTING_MODE", "split").lower() == "fused"
+
+TOOL_AGENTS = {"flight_filter": "flight", "rag_search": "faq"}
+
+def _has_prior_history(history: str, query: str) -> bool:
+    h = (history or "").strip()
+    return bool(h) and h != f"Human: {query}".strip()
+
+def _fast_route(state: Dict[str, Any], history: str) -> Dict[str, Any] | None:
+    t0 = time.perf_counter()
+    guess = classify(state['query'], has_history=_has_prior_history(history, state['query']))
+    metrics.observe("primary.classifier_ms", (time.perf_counter() - t0) * 1000.0)
+    if guess['confidence'] < FASTPATH_THRESHOLD:
+        logger.info("Primary fast-path declined (intent=%s, confidence=%s, source=%s); falling back to LLM.", guess['intent'], guess['confidence'], guess['source'])
+        return None
+    logger.info("Primary fast-path intent: %s (confidence=%s, source=%s)", guess['intent'], guess['confidence'], guess['source'])
+    return {"intent": guess['intent'], "response": "", "confidence": guess['confidence']}
+
+def _local_route(state: Dict[str, Any], history: str) -> Dict[str, Any] | None:
+    """Route without a model call: slot filling first, then the intent classifier."""
+    if slots.SLOTS_ENABLED:
+        data = slots.resolve(state)
+        if data is not None:
+            state['route_path'] = 'slots'
+            metrics.incr("primary.slot_path")
+            logger.info("Primary slot-path intent: %s (slots=%s)", data['intent'], state.get('slots'))
+            return data
+    if FASTPATH_ENABLED:
+        data = _fast_route(state, history)
+        if data is not None:
+            state['route_path'] = 'fast'
+            metrics.incr("primary.fast_path")
+            return data
+    return None
+
+def _policy_intent(query: str) -> str:
+    scores = rule_scores(query)
+    return 'policy_refund' if scores.get('policy_refund', 0) > scores.get('policy_visa', 0) else 'policy_visa'
+
+def _recording(fn, outputs: list):
+    """Tool messages carry the budgeted output; keep the full results for the agent's local use."""
+    def call(args: str) -> str:
+        out = fn(args)
+        outputs.append(out)
+        return out
+    return call
+
+def _fused_route(state: Dict[str, Any], history: str) -> Dict[str, Any]:
+    """One completion that both classifies and, for flight/policy turns, emits the tool call.
+
+    Executed tool results are parked in state['fused'] so the chosen agent can
+    continue from them instead of spending its own first round.
+    """
+    prompt = render_prompt('fused_router.j2', schema_json=cached_schema_json(PrimaryRoute), conversation_history=history, query=state['query'])
+    logger.info("Primary routing started (fused routing + tool selection).")
+    with llm_priority("interactive"):
+        resp = openai_tool_step(
+            [{"role": "user", "content": prompt}],
+            openai_tools_for_flight() + openai_tools_for_faq(),
+            temperature=0.2,
+            max_output_tokens=400,
+            response_model=PrimaryRoute,
+        )
+    msg = resp.choices[0].message
+    tool_calls = msg.tool_calls or []
+    agents = {TOOL_AGENTS.get(tc.function.name) for tc in tool_calls}
+    if len(agents) == 1 and None not in agents:
+        agent = agents.pop()
+        flight_cache = FlightResultCache((state.get('results') or {}).get('search')) if agent == 'flight' else None
+        dispatch = flight_dispatch(flight_cache) if agent == 'flight' else faq_dispatch()
+        outputs = []
+        tracked = {name: _recording(fn, outputs) for name, fn in dispatch.items()}
+        state['fused'] = {
+            'agent': agent,
+            'messages': [assistant_tool_message(msg)] + run_tool_calls(tool_calls, tracked),
+            'outputs': outputs,
+            'flight_cache': flight_cache,
+        }
+        metrics.incr("primary.fused_tool_call")
+        intent = 'schedule_search' if agent == 'flight' else _policy_intent(state['query'])
+        logger.info("Fused router issued %d %s tool call(s); intent=%s", len(tool_calls), agent, intent)
+        return {"intent": intent, "response": ""}
+    if tool_calls:
+        logger.warning("Fused router mixed flight and policy tool calls; ignoring them.")
+    return parse_model(msg.content or "", PrimaryRoute, structured=structured_output_active())
 
 def run_primary(state: Dict[str, Any]) -> Dict[str, Any]:
-    schema = PrimaryRoute.model_json_schema()
     history = state['memory'].get_formatted() if state.get('memory') else ''
-    prompt = render(tmpl, schema=schema, query=state['query'], conversation_history=history)
-
-    logger.info("Primary routing started (LLM-only).")
-    try:
-        out = openai_generate(prompt, max_output_tokens=250, temperature=0.2)
-        data = extract_first_json_block(out)
-        logger.info(f"Primary LLM intent: {data.get('intent')}")
-    except Exception as e:
-        # Still LLM-first; if classification fails (rare), we conservatively ask to clarify
-        logger.exception("Primary LLM classification failed; routing to clarify.")
-        data = {"intent": "clarify_missing_fields", "response": "Let’s clarify a couple of details."}
+    state.pop('fused', None)
+    state.pop('slot_question', None)
+
+    data = _local_route(state, history)
+    if data is None and FUSED_ROUTING:
+        state['route_path'] = 'fused'
+        metrics.incr("primary.fused_path")
+        try:
+            data = _fused_route(state, history)
+            logger.info("Primary fused intent: %s", data.get('intent'))
+        except Exception:
+            logger.exception("Primary fused routing failed; routing to clarify.")
+            state.pop('fused', None)
+            data = {"intent": "clarify_missing_fields", "response": "Let’s clarify a couple of details."}
+    elif data is None:
+        state['route_path'] = 'llm'
+        metrics.incr("primary.llm_path")
+        prompt = render_prompt('primary_router.j2', schema_json=cached_schema_json(PrimaryRoute), conversation_history=history, query=state['query'])
+
+        logger.info("Primary routing started (LLM).")
+        try:
+            with llm_priority("interactive"):
+                out = openai_generate(prompt, max_output_tokens=250, temperature=0.2, response_model=PrimaryRoute)
+            data = parse_model(out, PrimaryRoute, structured=structured_output_active())
+            logger.info("Primary LLM intent: %s", data.get('intent'))
+        except Exception as e:
+            # If classification fails (rare), we conservatively ask to clarify
+            logger.exception("Primary LLM classification failed; routing to clarify.")
+            data = {"intent": "clarify_missing_fields", "response": "Let’s clarify a couple of details."}
 
     pr = PrimaryRoute(
         intent=data.get("intent", "clarify_missing_fields"),
-        response=data.get("response", "")
+        response=data.get("response", ""),
+        confidence=data.get("confidence", 0.7),
     ).model_dump()
 
     state['intent'] = pr['intent']
+    if state['route_path'] != 'slots':
+        # An LLM-routed clarify still asks for whatever is missing; anything else ends the slot dialogue.
+        is_clarify = pr['intent'] == 'clarify_missing_fields'
+        state['pending_slots'] = slots.missing(state.get('slots') or {}) if is_clarify else []
     state['primary'] = pr
     state['response'] = pr.get('response', '')
     if state.get('memory') and state['response']:
         state['memory'].add_ai(state['response'])
 
-    logger.info(f"Primary routing decided: {state['intent']}")
+    logger.info("Primary routing decided: %s (path=%s)", state['intent'], state['route_path'])
     return state
@@ -1,119 +1,228 @@
-import re, json
-from typing import List, Dict, Any
-from graph.openai_client import openai_generate as hf_generate
+import os, json
+from typing import Callable, List, Dict, Any
+from tokens import count_tokens, truncate_tokens
 import logging
 logger = logging.getLogger("agentic_chatbot.react")
 
+REACT_OBSERVATION_TOKENS = int(os.getenv("REACT_OBSERVATION_TOKENS", "400"))
+REACT_HISTORY_TOKENS = int(os.getenv("REACT_HISTORY_TOKENS", "1200"))
+STOP_SEQUENCES = ["\nObservation:"]
+
+_MARKERS = (("final", "final:"), ("input", "action input:"), ("action", "action:"),
+            ("observation", "observation:"), ("thought", "thought:"))
+
+
+def _default_generate(prompt: str, max_output_tokens: int, temperature: float, stop: List[str] | None) -> str:
+    from graph.openai_client import openai_generate
+    return openai_generate(prompt, max_output_tokens=max_output_tokens, temperature=temperature, stop=stop)
+
+
+def _strip_fences(text: str) -> str:
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        if text.rstrip().endswith("```"):
+            text = text.rstrip()[:-3]
+    return text.strip()
+
+
+def _json_object(text: str) -> dict | None:
+    text = _strip_fences(text)
+    start = text.find("{")
+    if start == -1:
+        return None
+    try:
+        obj, _ = json.JSONDecoder().raw_decode(text[start:])
+    except ValueError:
+        return None
+    return obj if isinstance(obj, dict) else None
+
+
+class StepParser:
+    """Single-pass parser for one model step (Thought / Action / Action Input / Final).
+
+    Text can be fed in chunks as it arrives; complete lines are classified by
+    their leading marker once, and parsing stops at a hallucinated
+    "Observation:" line (the model must not write its own observations).
+    """
+
+    def __init__(self):
+        self.fields: Dict[str, List[str]] = {}
+        self._current: str | None = None
+        self._pending = ""
+        self.done = False
+
+    def feed(self, chunk: str) -> "StepParser":
+        if self.done:
+            return self
+        self._pending += chunk
+        *lines, self._pending = self._pending.split("\n")
+        for line in lines:
+            self._line(line)
+            if self.done:
+                break
+        return self
+
+    def close(self) -> "StepParser":
+        if self._pending and not self.done:
+            self._line(self._pending)
+        self._pending = ""
+        return self
+
+    def _line(self, line: str):
+        head = line.lstrip()[:14].lower()
+        for field, marker in _MARKERS:
+            if head.startswith(marker):
+                if field == "observation":
+                    self.done = True
+                    return
+                self._current = field
+                self.fields[field] = [line.lstrip()[len(marker):].strip()]
+                return
+        if self._current is not None:
+            self.fields[self._current].append(line)
+
+    def _text(self, field: str) -> str:
+        return "\n".join(self.fields.get(field, [])).strip()
+
+    @property
+    def action(self) -> Dict[str, str] | None:
+        tool = self._text("action")
+        if not tool:
+            return None
+        return {"tool": tool, "input": _strip_fences(self._text("input"))}
+
+    @property
+    def final(self) -> dict | None:
+        if "final" not in self.fields:
+            return None
+        return _json_object(self._text("final"))
+
+    def render(self) -> str:
+        """The step as it goes back into the transcript (without any hallucinated observation)."""
+        labels = (("thought", "Thought"), ("action", "Action"), ("input", "Action Input"))
+        return "\n".join(f"{label}: {self._text(field)}" for field, label in labels if field in self.fields)
+
+
+def parse_step(text: str) -> StepParser:
+    return StepParser().feed(text).close()
+
+
 class Reactor:
+    """Text ReAct loop: Thought / Action / Action Input, tool Observation, ..., Final: {json}.
+
+    Generation stops at "Observation:" so the model never writes past the tool
+    call, and the prompt for each iteration is the base prompt plus a history
+    kept under REACT_HISTORY_TOKENS (latest observation under
+    REACT_OBSERVATION_TOKENS, older steps condensed or dropped), so the cost
+    per iteration stays flat instead of growing with the transcript.
+    """
+
     def __init__(
         self,
         prompt_text: str,
         tools: List[Any],
         max_iters: int = 3,
         max_new_tokens: int = 600,
-        temperature: float = 0.3
+        temperature: float = 0.3,
+        generate: Callable[[str, int, float, List[str] | None], str] | None = None,
+        observation_tokens: int = REACT_OBSERVATION_TOKENS,
+        history_tokens: int = REACT_HISTORY_TOKENS,
     ):
-        self.base_prompt = prompt_text
+        self.base_prompt = prompt_text.strip()
         self.max_iters = max_iters
         self.max_new_tokens = max_new_tokens
         self.temperature = temperature
         self.tools: Dict[str, Any] = {t.name: t for t in tools}
-        logger.info(f"Initialized Reactor with {len(self.tools)} tools: {list(self.tools.keys())}")
+        self.generate = generate or _default_generate
+        self.observation_tokens = observation_tokens
+        self.history_tokens = history_tokens
+        logger.info("Initialized Reactor with %d tools: %s", len(self.tools), list(self.tools.keys()))
 
-    def _run_llm(self, prompt: str) -> str:
-        logger.info(f"Running LLM call: tokens={len(prompt)}, temp={self.temperature}")
+    def _run_llm(self, prompt: str, stop: List[str] | None = STOP_SEQUENCES) -> str:
+        logger.info("Running LLM call: prompt_chars=%d, temp=%s", len(prompt), self.temperature)
         try:
-            result = hf_generate(prompt, max_output_tokens=self.max_new_tokens, temperature=self.temperature)
-            logger.info(f"LLM call completed successfully ({len(result)} chars returned).")
+            result = self.generate(prompt, self.max_new_tokens, self.temperature, stop)
+            logger.info("LLM call completed successfully (%d chars returned).", len(result))
             return result
         except Exception as e:
             logger.exception("LLM generation failed.")
             raise e
 
-    @staticmethod
-    def _extract_action(block: str) -> Dict[str, Any] | None:
-        action_matches = list(re.finditer(r"(?i)^\s*Action\s*:\s*(.+)$", block, flags=re.MULTILINE))
-        if not action_matches:
-            return None
-        tool_name = action_matches[-1].group(1).strip()
-        after = block[action_matches[-1].end():]
-        m_in = re.search(r"(?i)^\s*Action\s*Input\s*:\s*(.+)$", after, flags=re.MULTILINE | re.DOTALL)
-        arg = (m_in.group(1).strip() if m_in else "").strip()
-        if not arg:
-            m2 = re.search(r"(?i)Action\s*Input\s*:\s*(.+)$", block, flags=re.MULTILINE | re.DOTALL)
-            if not m2:
-                return None
-            arg = m2.group(1).strip()
-        if arg.startswith("```"):
-            arg = arg.split("\n", 1)[1]
-            if arg.endswith("```"):
-                arg = arg.rsplit("\n", 1)[0]
-        return {"tool": tool_name, "input": arg}
-
-    @staticmethod
-    def _extract_final_json(text: str) -> dict:
-        m = re.search(r"(?i)Final\s*:\s*(\{.*)$", text, flags=re.DOTALL)
-        candidate = m.group(1).strip() if m else text.strip()
-        if candidate.startswith("```"):
-            candidate = candidate.split("\n", 1)[1]
-            if candidate.endswith("```"):
-                candidate = candidate.rsplit("\n", 1)[0]
-        start, end = candidate.rfind("{"), candidate.rfind("}")
-        if start == -1 or end == -1 or end < start:
-            raise ValueError("No JSON object found in Final output.")
-        return json.loads(candidate[start:end+1])
+    def _condensed(self, step: Dict[str, str]) -> str:
+        return (f"Action: {step['tool']}\nAction Input: {truncate_tokens(step['input'], 60)}\n"
+                f"Observation: {truncate_tokens(step['observation'], 60)}")
+
+    def _history(self, steps: List[Dict[str, str]]) -> str:
+        """Latest step verbatim (observation capped); older steps condensed, oldest dropped first."""
+        if not steps:
+            return ""
+        last = steps[-1]
+        blocks: List[str] = [f"{last['text']}\nObservation: {truncate_tokens(last['observation'], self.observation_tokens)}"]
+        budget = self.history_tokens - count_tokens(blocks[0])
+        dropped = 0
+        for i in range(len(steps) - 2, -1, -1):
+            block = self._condensed(steps[i])
+            cost = count_tokens(block)
+            if cost > budget:
+                dropped = i + 1
+                break
+            blocks.append(block)
+            budget -= cost
+        blocks.reverse()
+        if dropped:
+            blocks.insert(0, f"({dropped} earlier step(s) omitted)")
+        return "\n".join(blocks)
+
+    def _prompt(self, steps: List[Dict[str, str]], suffix: str = "") -> str:
+        history = self._history(steps)
+        return "\n".join(p for p in (self.base_prompt, history, suffix) if p) + "\n"
+
+    def _call_tool(self, tool_name: str, tool_input: str) -> str:
+        tool = self.tools.get(tool_name)
+        if not tool:
+            logger.warning("Tool '%s' not available; skipping.", tool_name)
+            return f"Tool '{tool_name}' not available. Choose a valid tool."
+        try:
+            logger.info("Invoking tool '%s'...", tool_name)
+            obs = tool.invoke(tool_input)
+            logger.info("Tool '%s' completed successfully.", tool_name)
+            return obs if isinstance(obs, str) else json.dumps(obs, ensure_ascii=False)
+        except Exception as e:
+            logger.exception("Tool '%s' failed.", tool_name)
+            return json.dumps({"error": f"Tool '{tool_name}' failed: {e}"})
 
     def invoke(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
-        transcript = self.base_prompt.strip()
-        logger.info(f"Starting ReAct loop (max_iters={self.max_iters})")
+        steps: List[Dict[str, str]] = []
+        calls = 0  # generate calls actually made; the loop may stop before max_iters
+        logger.info("Starting ReAct loop (max_iters=%d)", self.max_iters)
         for iteration in range(self.max_iters):
-            logger.info(f"Iteration {iteration+1}/{self.max_iters}")
-            step_out = self._run_llm(transcript + "\n")
+            logger.info("Iteration %d/%d", iteration + 1, self.max_iters)
+            step_out = self._run_llm(self._prompt(steps))
+            calls += 1
+            step = parse_step(step_out)
 
-            # Try extracting final JSON directly
-            try:
-                data = self._extract_final_json(step_out)
+            final = step.final
+            if final is not None:
                 logger.info("Final JSON successfully extracted.")
-                return {"output": step_out}
-            except Exception:
-                logger.debug("No valid Final JSON found yet; continuing ReAct loop.")
+                return {"output": step_out, "final": final, "iterations": iteration + 1}
 
-            # Extract action
-            act = self._extract_action(step_out)
+            act = step.action
             if not act:
-                logger.info("No Action found, checking for Final again or exiting loop.")
-                try:
-                    data = self._extract_final_json(step_out)
-                    logger.info("Final JSON found after Action failure.")
-                    return {"output": step_out}
-                except Exception:
-                    logger.warning("No Action or Final JSON found; breaking loop.")
-                    break
-
-            tool_name = act["tool"]
-            logger.info(f"Detected tool action: {tool_name} with input snippet={act['input'][:80]}")
-
-            tool = self.tools.get(tool_name)
-            if not tool:
-                logger.warning(f"Tool '{tool_name}' not available; skipping.")
-                transcript += f"\nObservation: Tool '{tool_name}' not available. Choose a valid tool."
-                continue
-
-            try:
-                logger.info(f"Invoking tool '{tool_name}'...")
-                obs = tool.invoke(act["input"])
-                logger.info(f"Tool '{tool_name}' completed successfully.")
-            except Exception as e:
-                logger.exception(f"Tool '{tool_name}' failed.")
-                obs = json.dumps({"error": f"Tool '{tool_name}' failed: {e}"})
-
-            # Log tool output (truncate for safety)
-            logger.debug(f"Tool observation (truncated): {obs[:200]}")
-            transcript += "\n" + step_out.strip() + f"\nObservation: {obs}\n"
+                final = _json_object(step_out)
+                if final is not None:
+                    logger.info("Final JSON found without a 'Final:' marker.")
+                    return {"output": step_out, "final": final, "iterations": iteration + 1}
+                logger.warning("No Action or Final JSON found; breaking loop.")
+                break
+
+            logger.info("Detected tool action: %s with input snippet=%.80s", act["tool"], act["input"])
+            obs = self._call_tool(act["tool"], act["input"])
+            logger.debug("Tool observation (truncated): %.200s", obs)
+            steps.append({"text": step.render(), "tool": act["tool"], "input": act["input"], "observation": obs})
 
         logger.warning("Max iterations reached or Final not found, forcing completion prompt.")
-        final_out = self._run_llm(
-            transcript + "\nPlease provide Final: the exact JSON now, nothing else.\n"
-        )
+        final_out = self._run_llm(self._prompt(steps, "Please provide Final: the exact JSON now, nothing else."), stop=None)
         logger.info("ReAct fallback completion step executed.")
-        return {"output": final_out}
+        final = parse_step(final_out).final or _json_object(final_out)
+        return {"output": final_out, "final": final, "iterations": calls + 1}
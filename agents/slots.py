@@ -0,0 +1,205 @@
+import os
+import re
+import logging
+from typing import Dict, Any, List, Tuple
+from agents.intent_classifier import rule_scores
+from helpers import CRITERIA_FIELDS
+from places import get_place_index
+
+logger = logging.getLogger("agentic_chatbot.slots")
+
+SLOTS_ENABLED = os.getenv("SLOT_FILLING", "1").lower() not in ("0", "false", "no")
+
+REQUIRED = ("origin", "destination", "month_hint")
+
+MONTHS = ["January", "February", "March", "April", "May", "June", "July", "August", "September", "October",
+          "November", "December"]
+ALLIANCES = {"star alliance": "Star Alliance", "oneworld": "Oneworld", "one world": "Oneworld", "skyteam": "SkyTeam",
+             "sky team": "SkyTeam"}
+
+# City names and aliases come from the airport table (data/airports.json) behind the place index.
+_PLACES = get_place_index()
+_CITY_CANON = {name.lower(): _PLACES.canonical(name) for name in _PLACES.city_names}
+_CITY = "(" + ("|".join(re.escape(c) for c in sorted(_CITY_CANON, key=len, reverse=True)) or r"(?!x)x") + ")"
+_CITY_RE = re.compile(r"\b" + _CITY + r"\b", re.I)
+# "from X to Y", where X and Y may be places the city names above do not cover.
+_ROUTE = re.compile(r"\bfrom\s+([a-z][a-z .'-]*?)\s+to\s+([a-z][a-z .'-]*?)"
+                    r"(?=\s+(?:in|on|for|under|below|with|by|around|during|next|this|please)\b|[,.?!]|$)", re.I)
+_PAIR = re.compile(r"\b" + _CITY + r"\s*(?:to|-|→|->)\s*" + _CITY + r"\b", re.I)
+_FROM = re.compile(r"\b(?:from|leaving|departing(?: from)?|out of)\s+" + _CITY + r"\b", re.I)
+_TO = re.compile(r"\b(?:to|into|visit(?:ing)?|destination is)\s+" + _CITY + r"\b", re.I)
+# Any word after an origin / destination cue; a word that is neither a known place nor in _NOT_PLACE makes the
+# slot unsure ("fly to Tbilisi") instead of silently leaving it empty.
+_FROM_WORD = re.compile(r"\b(?:from|leaving|departing(?: from)?|out of)\s+([a-z][a-z.'-]*)", re.I)
+_TO_WORD = re.compile(r"\b(?:to|into|visit(?:ing)?|destination is)\s+([a-z][a-z.'-]*)", re.I)
+_NOT_PLACE = {
+    "a", "an", "the", "my", "your", "our", "their", "his", "her", "me", "us", "you", "them", "it", "this", "that",
+    "these", "those", "any", "some", "another", "other", "and", "or", "about", "around", "where", "there", "here",
+    "somewhere", "anywhere", "home", "work", "school", "airport", "station", "hotel", "city", "town", "be", "do",
+    "go", "get", "fly", "book", "travel", "find", "see", "know", "bring", "take", "check", "change", "cancel",
+    "make", "leave", "depart", "return", "visit", "buy", "pay", "use", "have", "apply", "add", "stay", "spend",
+    "carry", "pack", "reach", "keep", "help", "search", "show", "compare", "plan", "catch", "board", "transit",
+    "connect", "land", "arrive", "ask", "start", "understand", "confirm", "learn", "look", "try", "wait",
+}
+# "May" is only a month in a date-like context, never as the modal verb.
+_MONTH = re.compile(r"\b(jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|jun(?:e)?|jul(?:y)?|aug(?:ust)?|"
+                    r"sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\b"
+                    r"|\b(?:in|during|for|early|mid|late|of|next|this)\s+(may)\b|\b(may)\s+\d"
+                    r"|\b\d{1,2}(?:st|nd|rd|th)?\s+(may)\b", re.I)
+_PRICE = re.compile(r"(?:under|below|less than|max(?:imum)?|up to|within|budget(?: of| is)?|cheaper than)\s*(?:usd|\$)?\s*"
+                    r"(\d[\d,]*)(?![\d,]*\s*(?:stops?|layovers?|hours?|hrs?|days?|weeks?|%))"
+                    r"|\$\s*(\d[\d,]*)|(\d[\d,]*)\s*(?:usd|dollars)\b", re.I)
+_ALLIANCE = re.compile(r"\b(" + "|".join(ALLIANCES) + r")\b", re.I)
+_NON_STOP = re.compile(r"\b(non[- ]?stop|direct(?: flights?)?|no (?:layovers?|stops))\b", re.I)
+_REFUNDABLE = re.compile(r"(?<!non-)(?<!non )\brefundable\b", re.I)
+# Follow-ups that refine the previous search ("refundable only", "what about April", "make it Madrid instead").
+_REFINE = re.compile(r"^\W*(?:only|just)\b|\bonly\W*(?:please\W*)?$|\b(?:instead|what about|how about|actually|"
+                     r"make it|anything (?:under|below|cheaper|on|with))\b", re.I)
+
+QUESTIONS = {
+    "origin": "which city you're flying from",
+    "destination": "where you'd like to fly to",
+    "month_hint": "which month you're planning to travel",
+}
+
+
+def _city(text: str) -> Tuple[str | None, bool]:
+    """(canonical city, known) for a captured place phrase; known is False when nothing matches.
+
+    Beyond the table's city names, the alias index resolves codes ("DXB"),
+    airport names and misspellings ("Tokio").
+    """
+    m = _CITY_RE.search(text)
+    if m:
+        return _CITY_CANON[m.group(1).lower()], True
+    city = _PLACES.canonical(text)
+    if city:
+        return city, True
+    words = text.strip(" .,'-").split()
+    return (" ".join(words[:3]).title() if words else None), False
+
+
+def extract_slots(text: str) -> Tuple[Dict[str, Any], List[str]]:
+    """Slots stated in one message, plus the names of slots that could not be resolved confidently."""
+    slots: Dict[str, Any] = {}
+    unsure: List[str] = []
+    m = _ROUTE.search(text)
+    pair = _PAIR.search(text)
+    if m:
+        for name, phrase in (("origin", m.group(1)), ("destination", m.group(2))):
+            city, known = _city(phrase)
+            slots[name] = city
+            if not known:
+                unsure.append(name)
+    elif pair:
+        slots["origin"], slots["destination"] = (_CITY_CANON[g.lower()] for g in pair.groups())
+    else:
+        for name, pattern, words in (("origin", _FROM, _FROM_WORD), ("destination", _TO, _TO_WORD)):
+            pm = pattern.search(text)
+            if pm:
+                slots[name] = _CITY_CANON[pm.group(1).lower()]
+                continue
+            for wm in words.finditer(text):
+                if wm.group(1).lower() in _NOT_PLACE:
+                    continue
+                city, known = _city(wm.group(1))
+                if known:
+                    slots[name] = city
+                else:
+                    unsure.append(name)
+                break
+    m = _MONTH.search(text)
+    if m:
+        word = next(g for g in m.groups() if g).lower()
+        slots["month_hint"] = next(name for name in MONTHS if name.lower().startswith(word[:3]))
+    m = _PRICE.search(text)
+    if m:
+        slots["max_price_usd"] = float(next(g for g in m.groups() if g).replace(",", ""))
+    m = _ALLIANCE.search(text)
+    if m:
+        slots["alliance"] = ALLIANCES[m.group(1).lower()]
+    if _NON_STOP.search(text):
+        slots["non_stop_only"] = True
+    if _REFUNDABLE.search(text):
+        slots["refundable_only"] = True
+    return slots, unsure
+
+
+def _bare_cities(text: str) -> List[str]:
+    return [_CITY_CANON[m.group(1).lower()] for m in _CITY_RE.finditer(text)]
+
+
+def missing(slots: Dict[str, Any]) -> List[str]:
+    return [name for name in REQUIRED if not slots.get(name)]
+
+
+def clarify_question(slots: Dict[str, Any], needed: List[str]) -> str:
+    """Templated follow-up naming what is already known and asking only for what is missing."""
+    known = []
+    if slots.get("origin"):
+        known.append(f"from {slots['origin']}")
+    if slots.get("destination"):
+        known.append(f"to {slots['destination']}")
+    if slots.get("month_hint"):
+        known.append(f"in {slots['month_hint']}")
+    asks = [QUESTIONS[name] for name in needed]
+    ask = asks[0] if len(asks) == 1 else ", ".join(asks[:-1]) + " and " + asks[-1]
+    lead = f"Happy to search flights {' '.join(known)}. " if known else "Happy to help you find a flight. "
+    return f"{lead}Could you tell me {ask}?"
+
+
+def resolve(state: Dict[str, Any]) -> Dict[str, Any] | None:
+    """Route a flight turn from slots alone, or return None to leave it to the classifier / LLM router.
+
+    Slots carry across turns in state['slots']; after a templated question the
+    slots it asked for are kept in state['pending_slots'] so a bare answer
+    ("Dubai", "in August") fills them. Turns with policy terms, unknown place
+    names or nothing slot-like are treated as ambiguous and fall through, and
+    earlier slots are only continued on a turn with a flight signal, a
+    refinement cue (_REFINE) or an answer to a pending question.
+    """
+    query = state.get('query') or ''
+    scores = rule_scores(query)
+    if 'policy_visa' in scores or 'policy_refund' in scores:
+        return None
+    prev = dict(state.get('slots') or {})
+    pending = list(state.get('pending_slots') or [])
+    found, unsure = extract_slots(query)
+    if unsure:
+        logger.info("Slot pass: unknown place(s) for %s; deferring to the router.", unsure)
+        return None
+
+    bare = _bare_cities(query)
+    if pending and bare and not any(found.get(s) for s in ("origin", "destination")):
+        open_places = [s for s in pending if s in ("origin", "destination")]
+        if len(open_places) == 1 and len(bare) == 1:
+            found[open_places[0]] = bare[0]
+        elif open_places:
+            return None  # "Dubai" when both ends are open: which one?
+
+    refine = bool(prev) and bool(_REFINE.search(query))
+    flight_turn = bool(scores.get('schedule_search') or scores.get('clarify_missing_fields'))
+    if not found or not (flight_turn or pending or refine):
+        return None  # "How do I get to Tokyo station?" after a search is not a new search
+    if not (pending or refine) and not any(found.get(s) for s in REQUIRED):
+        return None  # "Can I bring a stroller on direct flights?" states no route or month
+
+    if any(found.get(s) and found[s] != prev.get(s) for s in ("origin", "destination")):
+        # A new route is a new search: constraints from the old one do not carry over.
+        prev = {k: v for k, v in prev.items() if k in REQUIRED}
+    slots = {**prev, **found}
+    needed = missing(slots)
+    state['slots'] = slots
+    if needed:
+        state['pending_slots'] = needed
+        state['slot_question'] = clarify_question(slots, needed)
+        logger.info("Slot pass: missing %s; asking templated question.", needed)
+        return {"intent": "clarify_missing_fields", "response": "", "confidence": 0.9}
+    state['pending_slots'] = []
+    logger.info("Slot pass: all required slots filled %s.", {k: slots[k] for k in REQUIRED})
+    return {"intent": "schedule_search", "response": "", "confidence": 0.9}
+
+
+def slots_from_criteria(criteria: Dict[str, Any] | None) -> Dict[str, Any]:
+    """Slots implied by the criteria of a completed flight search."""
+    return {k: v for k, v in (criteria or {}).items() if k in CRITERIA_FIELDS and v not in (None, "", False)}
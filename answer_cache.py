@@ -0,0 +1,121 @@
+import os
+import time
+import threading
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, List
+import numpy as np
+import metrics
+from rag_store import embed, chunk_fingerprints, _faiss
+
+logger = logging.getLogger("agentic_chatbot.answer_cache")
+
+CACHE_ENABLED = os.getenv("FAQ_CACHE", "1").lower() not in ("0", "false", "no")
+CACHE_THRESHOLD = float(os.getenv("FAQ_CACHE_THRESHOLD", "0.92"))
+CACHE_TTL_S = float(os.getenv("FAQ_CACHE_TTL_S", "86400"))
+CACHE_CAPACITY = int(os.getenv("FAQ_CACHE_CAPACITY", "512"))
+CACHE_CANDIDATES = 4
+
+
+class SemanticAnswerCache:
+    """PolicyAnswer cache indexed by normalised query embeddings (cosine via inner product).
+
+    Each entry remembers the fingerprints of the chunks it was grounded on, so a
+    RAG rebuild that changes or removes one of them invalidates the entry.
+    """
+
+    def __init__(self, threshold: float = CACHE_THRESHOLD, ttl_s: float = CACHE_TTL_S, capacity: int = CACHE_CAPACITY):
+        self.threshold = threshold
+        self.ttl_s = ttl_s
+        self.capacity = capacity
+        self.index = None
+        self.entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "inserts": 0, "expired": 0, "stale": 0, "evicted": 0}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def embed(self, query: str) -> np.ndarray:
+        return embed([query])
+
+    def _remove(self, entry_id: int, reason: str):
+        self.entries.pop(entry_id, None)
+        self.index.remove_ids(np.asarray([entry_id], dtype="int64"))
+        self.stats[reason] += 1
+        metrics.incr(f"faq_cache.{reason}")
+
+    @staticmethod
+    def _fresh(entry: Dict[str, Any], fps: Dict[str, str]) -> bool:
+        return all(fps.get(cid) == fp for cid, fp in entry["chunks"].items())
+
+    def lookup(self, vec: np.ndarray) -> Dict[str, Any] | None:
+        fps = chunk_fingerprints()
+        now = time.time()
+        with self._lock:
+            if self.index is None or self.index.ntotal == 0:
+                self.stats["misses"] += 1
+                metrics.incr("faq_cache.misses")
+                return None
+            scores, ids = self.index.search(vec, min(CACHE_CANDIDATES, self.index.ntotal))
+            for score, entry_id in zip(scores[0].tolist(), ids[0].tolist()):
+                if entry_id < 0 or score < self.threshold:
+                    break
+                entry = self.entries.get(entry_id)
+                if entry is None:
+                    continue
+                if now - entry["created"] > self.ttl_s:
+                    self._remove(entry_id, "expired")
+                    continue
+                if not self._fresh(entry, fps):
+                    self._remove(entry_id, "stale")
+                    continue
+                self.entries.move_to_end(entry_id)
+                self.stats["hits"] += 1
+                metrics.incr("faq_cache.hits")
+                logger.info("FAQ cache hit (similarity=%.3f) for cached query: %.80s", score, entry['query'])
+                return dict(entry["answer"])
+            self.stats["misses"] += 1
+            metrics.incr("faq_cache.misses")
+            return None
+
+    def put(self, vec: np.ndarray, query: str, answer: Dict[str, Any], chunk_ids: List[str]):
+        fps = chunk_fingerprints()
+        chunks = {cid: fps[cid] for cid in chunk_ids if cid in fps}
+        if not chunks:
+            logger.info("Not caching FAQ answer without known source chunks.")
+            return
+        with self._lock:
+            if self.index is None:
+                faiss = _faiss()
+                self.index = faiss.IndexIDMap(faiss.IndexFlatIP(vec.shape[1]))
+            entry_id = self._next_id
+            self._next_id += 1
+            self.index.add_with_ids(vec, np.asarray([entry_id], dtype="int64"))
+            self.entries[entry_id] = {"query": query, "answer": dict(answer), "chunks": chunks, "created": time.time()}
+            self.stats["inserts"] += 1
+            metrics.incr("faq_cache.inserts")
+            while len(self.entries) > self.capacity:
+                oldest = next(iter(self.entries))
+                self._remove(oldest, "evicted")
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            if self.index is not None:
+                self.index.reset()
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"size": len(self.entries), "capacity": self.capacity, **self.stats}
+
+
+_cache: SemanticAnswerCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> SemanticAnswerCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SemanticAnswerCache()
+    return _cache
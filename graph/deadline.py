@@ -0,0 +1,39 @@
+import os
+import time
+import logging
+from typing import Dict, Any
+import metrics
+
+logger = logging.getLogger("agentic_chatbot.deadline")
+
+# Wall-clock budget for one turn, set when the turn enters the graph (0 disables).
+TURN_DEADLINE_MS = float(os.getenv("TURN_DEADLINE_MS", "8000"))
+# Turns slower than this are counted as SLO misses (defaults to the deadline).
+TURN_SLO_MS = float(os.getenv("TURN_SLO_MS", str(TURN_DEADLINE_MS)))
+
+
+def start_turn(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Stamp the turn start and its deadline (time.monotonic()); a caller may pass state['deadline_ms']."""
+    now = time.monotonic()
+    budget_ms = state.get('deadline_ms') or TURN_DEADLINE_MS
+    state['turn_started'] = now
+    state['deadline'] = now + budget_ms / 1000.0 if budget_ms > 0 else None
+    return state
+
+
+def remaining_ms(deadline: float | None) -> float | None:
+    return None if deadline is None else (deadline - time.monotonic()) * 1000.0
+
+
+def finish_turn(state: Dict[str, Any]) -> Dict[str, Any]:
+    started = state.get('turn_started')
+    if started is None:
+        return state
+    elapsed_ms = (time.monotonic() - started) * 1000.0
+    state['turn_ms'] = elapsed_ms
+    metrics.observe("turn.ms", elapsed_ms)
+    state['slo_exceeded'] = TURN_SLO_MS > 0 and elapsed_ms > TURN_SLO_MS
+    if state['slo_exceeded']:
+        metrics.incr("slo.exceeded")
+        logger.warning("Turn took %.0f ms (SLO %.0f ms; agent=%s).", elapsed_ms, TURN_SLO_MS, state.get('current_agent'))
+    return state
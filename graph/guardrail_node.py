@@ -1,10 +1,13 @@
 from typing import Dict, Any
+from graph.pii import scan
 
 class GuardrailNode:
     def __call__(self, state: Dict[str, Any]) -> Dict[str, Any]:
         q=state.get('query','') or ''
-        if any(x in q.lower() for x in ['ssn','credit card','passport number']):
-            return {'should_block': True, 'response': "Please don't share sensitive numbers. I can help without them."}
         if not q.strip():
             return {'should_block': True, 'response': 'Could you share a bit more detail?'}
+        result = scan(q)
+        if result['findings']:
+            return {'should_block': False, 'redacted_query': result['redacted'],
+                    'pii': sorted({f['kind'] for f in result['findings']})}
         return {'should_block': False}
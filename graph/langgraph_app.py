@@ -1,27 +1,76 @@
 from typing import Dict, Any
 from langgraph.graph import StateGraph, END
 from graph.guardrail_node import GuardrailNode
+from graph.prefetch import start_prefetch
+from graph.deadline import start_turn, finish_turn
 from agents.primary import run_primary
+from agents.intent_classifier import rule_scores
 from agents.flight import run_flight
 from agents.faq import run_faq
 from agents.clarify import run_clarify
 import logging
+import metrics
 
 logger = logging.getLogger("agentic_chatbot.graph")
 
+TERMINAL_NODES = ('flight', 'faq', 'clarify')
+
+def traced(name: str, fn):
+    def node(state: Dict[str, Any]) -> Dict[str, Any]:
+        with metrics.span(f"node.{name}") as sp:
+            out = fn(state)
+            sp.set(intent=out.get('intent'), agent=out.get('current_agent'))
+        if name in TERMINAL_NODES:
+            finish_turn(out)
+        return out
+    node.__name__ = fn.__name__
+    return node
+
 def guard_node(state: Dict[str, Any]) -> Dict[str, Any]:
+    start_turn(state)
     g = GuardrailNode()(state)
-    logger.info(f"Guardrail check complete. blocked={g.get('should_block', False)}")
+    logger.info("Guardrail check complete. blocked=%s", g.get('should_block', False))
     if g.get('should_block'):
         state['blocked'] = True
         state['response'] = g['response']
+        finish_turn(state)  # guard_cond ends the turn here, so no terminal node will record it
     else:
         state['blocked'] = False
+    state['pii_redacted'] = g.get('pii', [])
+    if g.get('redacted_query'):
+        logger.info("Redacted sensitive data from query: %s", ', '.join(g['pii']))
+        metrics.incr("guard.pii_redacted")
+        state['query'] = g['redacted_query']
+        mem = state.get('memory')
+        if mem is not None:
+            mem.redact_last_user(g['redacted_query'])
     return state
 
+def _likely_policy(state: Dict[str, Any]) -> bool:
+    """False when the cheap rules already say this is a flight or clarify turn, so retrieval would be thrown away."""
+    if state.get('pending_slots'):
+        return False  # answering a slot question
+    scores = rule_scores(state.get('query', ''))
+    if 'policy_visa' in scores or 'policy_refund' in scores:
+        return True
+    return not (scores.get('schedule_search') or scores.get('clarify_missing_fields'))
+
 def primary_node(state: Dict[str, Any]) -> Dict[str, Any]:
     logger.info("Routing to primary node.")
-    return run_primary(state)
+    state.pop('prefetched_evidence', None)
+    likely_policy = _likely_policy(state)
+    if not likely_policy:
+        metrics.incr("prefetch.skipped_route")
+    prefetch = start_prefetch(state.get('query', ''), likely_policy)
+    state = run_primary(state)
+    if prefetch is not None:
+        if (state.get('intent') or '').startswith('policy_') and not state.get('fused'):
+            hits = prefetch.collect()
+            if hits is not None:
+                state['prefetched_evidence'] = hits
+        else:
+            prefetch.discard()
+    return state
 
 def flight_node(state: Dict[str, Any]) -> Dict[str, Any]:
     logger.info("Routing to flight node.")
@@ -47,11 +96,11 @@ def intent_router(state: Dict[str, Any]) -> str:
 
 def build_graph():
     g = StateGraph(dict)
-    g.add_node('guard', guard_node)
-    g.add_node('primary', primary_node)
-    g.add_node('flight', flight_node)
-    g.add_node('faq', faq_node)
-    g.add_node('clarify', clarify_node)
+    g.add_node('guard', traced('guard', guard_node))
+    g.add_node('primary', traced('primary', primary_node))
+    g.add_node('flight', traced('flight', flight_node))
+    g.add_node('faq', traced('faq', faq_node))
+    g.add_node('clarify', traced('clarify', clarify_node))
 
     g.set_entry_point('guard')
     g.add_conditional_edges('guard', guard_cond, {'blocked': END, 'ok': 'primary'})
@@ -1,21 +1,328 @@
 import os
 import json
+import time
+import heapq
+import itertools
 import logging
+import threading
+import contextvars
+from contextlib import contextmanager
 from typing import Dict, Callable, Any, List
-from openai import OpenAI
+import metrics
+from model_registry.schemas import cached_schema
+from tools.budget import budget_tool_output
+from graph.deadline import remaining_ms
 
 logger = logging.getLogger("agentic_chatbot.openai")
 
 LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+STRUCTURED_OUTPUT = os.getenv("LLM_STRUCTURED_OUTPUT", "1").lower() not in ("0", "false", "no")
 
-def openai_generate(prompt: str, max_output_tokens: int = 700, temperature: float = 0.3) -> str:
+# Provider limits the scheduler paces calls against (0 disables that bucket).
+LLM_RPM = float(os.getenv("LLM_RPM", "0"))
+LLM_TPM = float(os.getenv("LLM_TPM", "0"))
+LLM_MAX_INFLIGHT = int(os.getenv("LLM_MAX_INFLIGHT", "0"))
+LLM_RATE_LIMIT_RETRIES = int(os.getenv("LLM_RATE_LIMIT_RETRIES", "2"))
+
+# Deadline-aware tool loops: a round is assumed to take LLM_ROUND_ESTIMATE_MS until one
+# has been measured, and output is budgeted at LLM_MS_PER_TOKEN per completion token.
+LLM_ROUND_ESTIMATE_MS = float(os.getenv("LLM_ROUND_ESTIMATE_MS", "1500"))
+LLM_MS_PER_TOKEN = float(os.getenv("LLM_MS_PER_TOKEN", "15"))
+LLM_MIN_OUTPUT_TOKENS = int(os.getenv("LLM_MIN_OUTPUT_TOKENS", "128"))
+
+PRIORITIES = {"interactive": 0, "agent": 1, "batch": 2}
+_priority_var: contextvars.ContextVar = contextvars.ContextVar("llm_priority", default="agent")
+_deadline_var: contextvars.ContextVar = contextvars.ContextVar("llm_deadline", default=None)
+
+_client = None
+_client_lock = threading.Lock()
+_structured_supported = True
+
+def get_client():
+    """OpenAI client, created (and the openai package imported) on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import OpenAI
+                # No SDK retries: _scheduled_create owns 429 handling, so a rate limit pauses the shared
+                # scheduler instead of being retried blindly inside one call.
+                _client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+    return _client
+
+@contextmanager
+def llm_priority(name: str, deadline: float | None = None):
+    """Run LLM calls in this context (thread/task) at a priority class, optionally with a time.monotonic() deadline.
+
+    Nesting never raises priority: routing inside a batch job stays "batch".
+    """
+    if name not in PRIORITIES:
+        raise ValueError(f"Unknown LLM priority {name!r}; expected one of {sorted(PRIORITIES)}")
+    current = _priority_var.get()
+    if PRIORITIES[current] > PRIORITIES[name]:
+        name = current
+    p_token = _priority_var.set(name)
+    d_token = _deadline_var.set(deadline) if deadline is not None else None
+    try:
+        yield
+    finally:
+        if d_token is not None:
+            _deadline_var.reset(d_token)
+        _priority_var.reset(p_token)
+
+
+class TokenBucket:
+    """Refills `per_minute` units evenly over a minute, holding at most one minute's worth."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.level = per_minute
+        self.stamp = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def wait_for(self, amount: float, now: float) -> float:
+        """Seconds until `amount` can be taken (0 when it can be taken now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        self.level -= min(amount, self.capacity)
+
+    def credit(self, amount: float):
+        """Return (or, if negative, charge) the difference between estimated and actual usage."""
+        self.level = min(self.capacity, self.level + amount)
+
+
+class LLMScheduler:
+    """Process-wide admission for chat completions.
+
+    Callers queue by (priority class, deadline, arrival) and only the head of
+    the queue may take from the request and token buckets, so interactive
+    routing calls overtake agent rounds and batch jobs once limits bind. With
+    no limits configured admission is immediate.
+    """
+
+    def __init__(self, rpm: float = LLM_RPM, tpm: float = LLM_TPM, max_inflight: int = LLM_MAX_INFLIGHT):
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+        self.max_inflight = max_inflight
+        self.inflight = 0
+        self.paused_until = 0.0
+        self._cond = threading.Condition()
+        self._queue: List[tuple] = []
+        self._seq = itertools.count()
+
+    @property
+    def enabled(self) -> bool:
+        return self.requests is not None or self.tokens is not None or self.max_inflight > 0
+
+    def _wait_time(self, est_tokens: float, now: float) -> float | None:
+        """0 when the head can go now, seconds to sleep for a refill, or None to wait for a release."""
+        if self.max_inflight and self.inflight >= self.max_inflight:
+            return None
+        wait = max(0.0, self.paused_until - now)
+        if self.requests is not None:
+            wait = max(wait, self.requests.wait_for(1, now))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.wait_for(est_tokens, now))
+        return wait
+
+    def acquire(self, est_tokens: float, priority: str = "agent", deadline: float | None = None) -> float:
+        """Block until admitted; returns the time spent queued in ms."""
+        if not self.enabled:
+            return 0.0
+        t0 = time.monotonic()
+        entry = (PRIORITIES.get(priority, 1), deadline if deadline is not None else float("inf"), next(self._seq))
+        with self._cond:
+            heapq.heappush(self._queue, entry)
+            metrics.gauge("llm.queue_depth", len(self._queue))
+            while True:
+                if self._queue[0] is entry:
+                    wait = self._wait_time(est_tokens, time.monotonic())
+                    if wait == 0.0:
+                        break
+                    self._cond.wait(wait)
+                else:
+                    self._cond.wait()
+            heapq.heappop(self._queue)
+            if self.requests is not None:
+                self.requests.take(1)
+            if self.tokens is not None:
+                self.tokens.take(est_tokens)
+            self.inflight += 1
+            metrics.gauge("llm.queue_depth", len(self._queue))
+            self._cond.notify_all()
+        waited_ms = (time.monotonic() - t0) * 1000.0
+        metrics.observe("llm.queue_wait_ms", waited_ms)
+        metrics.observe(f"llm.queue_wait_ms.{priority}", waited_ms)
+        if waited_ms >= 1.0:
+            metrics.incr("llm.throttled")
+        return waited_ms
+
+    def release(self, est_tokens: float, actual_tokens: float | None = None):
+        if not self.enabled:
+            return
+        with self._cond:
+            self.inflight -= 1
+            if self.tokens is not None and actual_tokens is not None:
+                self.tokens.credit(est_tokens - actual_tokens)
+            self._cond.notify_all()
+
+    def pause(self, seconds: float):
+        """Hold all admissions for `seconds` after the provider answered 429."""
+        with self._cond:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self._cond.notify_all()
+
+    def info(self) -> Dict[str, Any]:
+        with self._cond:
+            return {"queued": len(self._queue), "inflight": self.inflight,
+                    "rpm": self.requests.capacity if self.requests else 0,
+                    "tpm": self.tokens.capacity if self.tokens else 0}
+
+
+_scheduler: LLMScheduler | None = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler() -> LLMScheduler:
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = LLMScheduler()
+    return _scheduler
+
+def _estimate_tokens(kwargs: Dict[str, Any]) -> int:
+    """Cheap upper-ish estimate for TPM accounting: ~4 chars/token over the messages plus the output cap."""
+    chars = sum(len(str(m.get("content") or "")) for m in kwargs.get("messages") or [])
+    if kwargs.get("tools"):
+        chars += len(json.dumps(kwargs["tools"]))
+    return chars // 4 + int(kwargs.get("max_tokens") or 0)
+
+def _retry_after(err) -> float:
+    try:
+        return max(0.0, float(err.response.headers.get("retry-after")))
+    except Exception:
+        return 1.0
+
+class DeadlineExceeded(Exception):
+    """The turn's deadline passed before the model produced an answer; `messages` holds the tool results so far."""
+
+    def __init__(self, messages: List[Dict[str, Any]]):
+        super().__init__("Turn deadline reached before the model answered.")
+        self.messages = messages
+
+def _budget_tokens(max_output_tokens: int, left_ms: float | None, round_ms: float) -> int:
+    """Shrink max_tokens so generation fits in the time left after the round's fixed cost."""
+    if left_ms is None or left_ms >= round_ms + max_output_tokens * LLM_MS_PER_TOKEN:
+        return max_output_tokens
+    metrics.incr("deadline.max_tokens_shrunk")
+    fit = int((left_ms - round_ms / 2) / LLM_MS_PER_TOKEN)
+    return max(min(LLM_MIN_OUTPUT_TOKENS, max_output_tokens), min(max_output_tokens, fit))
+
+def structured_output_active() -> bool:
+    return STRUCTURED_OUTPUT and _structured_supported
+
+def _response_format(response_model) -> Dict[str, Any] | None:
+    if response_model is None or not structured_output_active():
+        return None
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": response_model.__name__,
+            "schema": cached_schema(response_model),
+            "strict": False,
+        },
+    }
+
+def _create(**kwargs):
+    global _structured_supported
+    client = get_client()
+    # Checked per call, not per loop: a rejection in one round (or another thread) drops the format for the rest.
+    if kwargs.get("response_format") is None or not _structured_supported:
+        kwargs.pop("response_format", None)
+        return client.chat.completions.create(**kwargs)
+    from openai import BadRequestError
+    try:
+        return client.chat.completions.create(**kwargs)
+    except BadRequestError as e:
+        if "response_format" not in str(e) and "json_schema" not in str(e):
+            raise
+        logger.warning("Provider rejected structured output (response_format); falling back to free-text JSON.")
+        _structured_supported = False
+        metrics.incr("llm.structured_unavailable")
+        kwargs.pop("response_format", None)
+        return client.chat.completions.create(**kwargs)
+
+def _scheduled_create(sp, **kwargs):
+    from openai import RateLimitError
+    scheduler = get_scheduler()
+    priority = _priority_var.get()
+    est = _estimate_tokens(kwargs)
+    for attempt in range(LLM_RATE_LIMIT_RETRIES + 1):
+        sp.set(priority=priority, queue_ms=scheduler.acquire(est, priority, _deadline_var.get()))
+        actual = None
+        try:
+            t0 = time.perf_counter()
+            resp = _create(**kwargs)
+            metrics.observe("llm.call_ms", (time.perf_counter() - t0) * 1000.0)
+            usage = getattr(resp, "usage", None)
+            if usage is not None:
+                actual = (usage.prompt_tokens or 0) + (usage.completion_tokens or 0)
+            return resp
+        except RateLimitError as e:
+            if attempt == LLM_RATE_LIMIT_RETRIES:
+                raise
+            delay = _retry_after(e)
+            logger.warning("Provider rate limit hit (429); pausing LLM admissions for %.2fs.", delay)
+            metrics.incr("llm.rate_limited")
+            scheduler.pause(delay)
+        finally:
+            scheduler.release(est, actual)
+
+_MESSAGE_KEYS = {"role", "content", "tool_calls", "tool_call_id", "name"}
+
+def _check_messages(messages: List[Dict[str, Any]]):
+    """Refuse to send local bookkeeping fields: they cost prompt tokens or get the request rejected."""
+    for m in messages or []:
+        extra = set(m) - _MESSAGE_KEYS
+        if extra:
+            raise ValueError(f"Chat message carries non-API field(s) {sorted(extra)}; pass it through _chat_message().")
+
+def _chat(**kwargs):
+    _check_messages(kwargs.get("messages"))
+    with metrics.span("llm.chat", model=kwargs.get("model"), messages=len(kwargs.get("messages") or []),
+                      tools=bool(kwargs.get("tools"))) as sp:
+        resp = _scheduled_create(sp, **kwargs)
+        metrics.incr("llm.calls")
+        usage = getattr(resp, "usage", None)
+        if usage is not None:
+            prompt_tokens = usage.prompt_tokens or 0
+            completion_tokens = usage.completion_tokens or 0
+            metrics.incr("llm.prompt_tokens", prompt_tokens)
+            metrics.incr("llm.completion_tokens", completion_tokens)
+            if metrics.TRACING:
+                metrics.histogram("llm.prompt_tokens_per_call", prompt_tokens, metrics.TOKEN_BUCKETS)
+                metrics.histogram("llm.completion_tokens_per_call", completion_tokens, metrics.TOKEN_BUCKETS)
+            sp.set(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+    return resp
+
+def openai_generate(prompt: str, max_output_tokens: int = 700, temperature: float = 0.3, response_model=None,
+                    stop: List[str] | None = None) -> str:
     logger.info("openai_generate(chat.completions) call")
-    resp = client.chat.completions.create(
+    extra = {"stop": stop} if stop else {}
+    resp = _chat(
         model=LLM_MODEL,
         messages=[{"role": "user", "content": prompt}],
         temperature=temperature,
         max_tokens=max_output_tokens,
+        response_format=_response_format(response_model),
+        **extra,
     )
     return resp.choices[0].message.content or ""
 
@@ -34,6 +341,80 @@ def _chat_tools_from_responses_tools(responses_tools: List[Dict[str, Any]]) -> L
         })
     return chat_tools
 
+def _chat_message(m: Dict[str, Any]) -> Dict[str, Any]:
+    out = {"role": m.get("role", "user"), "content": m.get("content", "")}
+    for key in ("tool_calls", "tool_call_id", "name"):
+        if m.get(key):
+            out[key] = m[key]
+    return out
+
+def assistant_tool_message(msg) -> Dict[str, Any]:
+    return {
+        "role": "assistant",
+        "content": msg.content or "",
+        "tool_calls": [
+            {
+                "id": tc.id,
+                "type": "function",
+                "function": {
+                    "name": tc.function.name,
+                    "arguments": tc.function.arguments
+                }
+            } for tc in (msg.tool_calls or [])
+        ]
+    }
+
+def run_tool_calls(tool_calls, dispatch: Dict[str, Callable[[str], str]]) -> List[Dict[str, Any]]:
+    out_messages = []
+    for tc in tool_calls:
+        name = tc.function.name
+        args_str = tc.function.arguments or "{}"
+        logger.info("Executing tool '%s' with args: %.200s", name, args_str)
+        t0 = time.perf_counter()
+        ok = True
+        with metrics.span(f"tool.{name}") as sp:
+            try:
+                fn = dispatch.get(name)
+                out_text = fn(args_str) if fn else json.dumps({"error": f"Unknown tool: {name}"})
+                logger.info("Tool '%s' ok; output length=%d", name, len(out_text))
+            except Exception as e:
+                logger.exception("Tool '%s' failed.", name)
+                out_text = json.dumps({"error": f"Tool '{name}' failed: {e}"})
+                ok = False
+            content = budget_tool_output(name, args_str, out_text)
+            sp.set(ok=ok, output_chars=len(out_text), sent_chars=len(content))
+        ms = (time.perf_counter() - t0) * 1000.0
+        metrics.incr("tool.calls")
+        metrics.event("tool_call", name=name, args=args_str[:500], ok=ok, ms=ms, output_chars=len(out_text),
+                      sent_chars=len(content))
+
+        out_messages.append({
+            "role": "tool",
+            "tool_call_id": tc.id,
+            "name": name,
+            "content": content,
+        })
+    return out_messages
+
+def openai_tool_step(
+    messages: List[Dict[str, Any]],
+    tools: List[Dict[str, Any]],
+    *,
+    temperature: float = 0.2,
+    max_output_tokens: int = 700,
+    response_model=None,
+):
+    chat_tools = _chat_tools_from_responses_tools(tools)
+    return _chat(
+        model=LLM_MODEL,
+        messages=[_chat_message(m) for m in messages],
+        tools=chat_tools if chat_tools else None,
+        tool_choice="auto" if chat_tools else None,
+        temperature=temperature,
+        max_tokens=max_output_tokens,
+        response_format=_response_format(response_model),
+    )
+
 def openai_tool_loop(
     messages: List[Dict[str, Any]],
     tools: List[Dict[str, Any]],
@@ -43,80 +424,98 @@ def openai_tool_loop(
     temperature: float = 0.2,
     max_output_tokens: int = 700,
     finalizer_prompt: str = "Return ONLY the final JSON now. No backticks, no commentary.",
+    response_model=None,
+    deadline: float | None = None,
 ):
-    logger.info(f"Starting CC tool loop with {len(tools)} tools; max_rounds={max_rounds}")
+    """Chat/tool rounds until the model answers, at most max_rounds plus one finalizer call.
 
+    With a deadline (time.monotonic()), each round checks the time left: max_tokens
+    shrinks to fit, and once another tool round plus an answer no longer fits the
+    loop goes straight to the finalizer. DeadlineExceeded is raised if the deadline
+    has already passed, so the caller can answer deterministically.
+    """
+    logger.info("Starting CC tool loop with %d tools; max_rounds=%d", len(tools), max_rounds)
+    d_token = _deadline_var.set(deadline) if deadline is not None else None
+    try:
+        with metrics.span("llm.tool_loop", max_rounds=max_rounds) as sp:
+            resp, rounds = _tool_loop(messages, tools, dispatch, max_rounds=max_rounds, temperature=temperature,
+                                      max_output_tokens=max_output_tokens, finalizer_prompt=finalizer_prompt,
+                                      response_model=response_model, deadline=deadline)
+            sp.set(rounds=rounds)
+    finally:
+        if d_token is not None:
+            _deadline_var.reset(d_token)
+    metrics.observe("llm.loop_rounds", rounds)
+    if metrics.TRACING:
+        metrics.histogram("llm.rounds_per_loop", rounds, metrics.COUNT_BUCKETS)
+    return resp
+
+
+def _tool_loop(messages, tools, dispatch, *, max_rounds, temperature, max_output_tokens, finalizer_prompt, response_model,
+               deadline=None):
     chat_tools = _chat_tools_from_responses_tools(tools)
-    chat_messages = []
-    for m in messages:
-        role = m.get("role", "user")
-        content = m.get("content", "")
-        chat_messages.append({"role": role, "content": content})
+    chat_messages = [_chat_message(m) for m in messages]
+    response_format = _response_format(response_model)
+    round_ms = LLM_ROUND_ESTIMATE_MS
 
     for round_idx in range(1, max_rounds + 1):
-        logger.info(f"CC Round {round_idx} -> calling model with {len(chat_messages)} messages")
-        resp = client.chat.completions.create(
+        left = remaining_ms(deadline)
+        if left is not None:
+            if left <= 0:
+                metrics.incr("deadline.exceeded_in_loop")
+                raise DeadlineExceeded(chat_messages)
+            if round_idx > 1 and left < 2 * round_ms:
+                logger.warning("%.0f ms left (round ~%.0f ms); skipping further tool rounds.", left, round_ms)
+                metrics.incr("deadline.rounds_skipped")
+                return _finalize(chat_messages, chat_tools, finalizer_prompt, temperature, max_output_tokens,
+                                 response_format, deadline, round_ms), round_idx
+        logger.info("CC Round %d -> calling model with %d messages", round_idx, len(chat_messages))
+        t0 = time.perf_counter()
+        resp = _chat(
             model=LLM_MODEL,
             messages=chat_messages,
             tools=chat_tools if chat_tools else None,
             tool_choice="auto" if chat_tools else None,
             temperature=temperature,
-            max_tokens=max_output_tokens,
+            max_tokens=_budget_tokens(max_output_tokens, left, round_ms),
+            response_format=response_format,
         )
+        round_ms = (time.perf_counter() - t0) * 1000.0
 
         msg = resp.choices[0].message
         tool_calls = msg.tool_calls or []
 
         if tool_calls:
-            logger.info(f"Model issued {len(tool_calls)} tool call(s)")
-            chat_messages.append({
-                "role": "assistant",
-                "content": msg.content or "",
-                "tool_calls": [
-                    {
-                        "id": tc.id,
-                        "type": "function",
-                        "function": {
-                            "name": tc.function.name,
-                            "arguments": tc.function.arguments
-                        }
-                    } for tc in tool_calls
-                ]
-            })
-
-            for tc in tool_calls:
-                name = tc.function.name
-                args_str = tc.function.arguments or "{}"
-                logger.info(f"Executing tool '{name}' with args: {args_str[:200]}")
-                try:
-                    fn = dispatch.get(name)
-                    out_text = fn(args_str) if fn else json.dumps({"error": f"Unknown tool: {name}"})
-                    logger.info(f"Tool '{name}' ok; output length={len(out_text)}")
-                except Exception as e:
-                    logger.exception(f"Tool '{name}' failed.")
-                    out_text = json.dumps({"error": f"Tool '{name}' failed: {e}"})
-
-                chat_messages.append({
-                    "role": "tool",
-                    "tool_call_id": tc.id,
-                    "name": name,
-                    "content": out_text
-                })
+            logger.info("Model issued %d tool call(s)", len(tool_calls))
+            chat_messages.append(assistant_tool_message(msg))
+            chat_messages.extend(run_tool_calls(tool_calls, dispatch))
             continue
         if msg.content and msg.content.strip():
             logger.info("Assistant produced final text (no further tool calls).")
-            return resp
+            return resp, round_idx
 
         logger.info("No content emitted; asking final JSON.")
+        metrics.incr("llm.finalizer_prompts")
         chat_messages.append({"role": "user", "content": finalizer_prompt})
 
     logger.warning("Max rounds reached; requesting final JSON once more.")
-    resp = client.chat.completions.create(
+    return _finalize(chat_messages, chat_tools, finalizer_prompt, temperature, max_output_tokens,
+                     response_format, deadline, round_ms), max_rounds + 1
+
+
+def _finalize(chat_messages, chat_tools, finalizer_prompt, temperature, max_output_tokens, response_format,
+              deadline, round_ms):
+    left = remaining_ms(deadline)
+    if left is not None and left <= 0:
+        metrics.incr("deadline.exceeded_in_loop")
+        raise DeadlineExceeded(chat_messages)
+    metrics.incr("llm.finalizer_prompts")
+    return _chat(
         model=LLM_MODEL,
         messages=chat_messages + [{"role": "user", "content": finalizer_prompt}],
         tools=chat_tools if chat_tools else None,
         tool_choice="none",
         temperature=temperature,
-        max_tokens=max_output_tokens,
+        max_tokens=_budget_tokens(max_output_tokens, left, round_ms),
+        response_format=response_format,
     )
-    return resp
@@ -0,0 +1,172 @@
+import re
+from collections import deque
+from typing import Dict, Any, Iterable, Iterator, List, Tuple
+
+# Phrases that signal the user is about to share (or is asking about) sensitive identifiers.
+SENSITIVE_TERMS = [
+    "ssn", "social security", "social security number",
+    "credit card", "debit card", "card number", "card no", "cvv", "cvc", "security code", "expiry date",
+    "passport number", "passport no", "passport #", "passport",
+    "bank account", "account number", "iban", "routing number", "sort code",
+    "national id", "id number", "driver's license", "drivers license",
+]
+
+CARD_TERMS = {"credit card", "debit card", "card number", "card no", "cvv", "cvc", "security code", "expiry date"}
+SSN_TERMS = {"ssn", "social security", "social security number"}
+PASSPORT_TERMS = {"passport number", "passport no", "passport #", "passport", "national id", "id number"}
+# How far (in characters) a keyword may sit from a number for the number to count as "near" it.
+KEYWORD_WINDOW = 40
+
+# One combined pattern for every number shape; the named group tells which one matched. A card or SSN
+# is never cut out of a longer separated digit run ("1000 2000 3000 4000 5000").
+_SHAPES = re.compile(
+    r"(?P<card>(?<![\dA-Za-z])(?<!\d[ -])\d(?:[ -]?\d){12,18}(?![\dA-Za-z])(?![ -]\d))"
+    r"|(?P<ssn>(?<![\d-])(?<!\d )\d{3}(?P<sep>[- ]?)\d{2}(?P=sep)\d{4}(?![\d-])(?! \d))"
+    r"|(?P<passport>(?<![A-Za-z0-9])(?:[A-Za-z]{1,2}\d{6,8}|\d{6,9})(?![A-Za-z0-9]))"
+)
+# Digit groupings printed on cards (Visa/Mastercard, Amex, Diners, 19-digit cards).
+CARD_GROUPINGS = {(4, 4, 4, 4), (4, 6, 5), (4, 6, 4), (4, 4, 4, 4, 3)}
+
+REDACTION = {"card": "[REDACTED_CARD]", "ssn": "[REDACTED_SSN]", "passport": "[REDACTED_PASSPORT]"}
+
+
+class KeywordAutomaton:
+    """Aho–Corasick matcher: one pass over the text regardless of how many terms are loaded."""
+
+    def __init__(self, terms: Iterable[str]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.out: List[List[str]] = [[]]
+        for term in terms:
+            self._add(term.lower())
+        self._link()
+
+    def _add(self, term: str):
+        node = 0
+        for ch in term:
+            nxt = self.goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[node][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append([])
+            node = nxt
+        self.out[node].append(term)
+
+    def _link(self):
+        queue = deque(self.goto[0].values())  # depth-1 nodes fail to the root
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def find(self, text: str) -> Iterator[Tuple[int, int, str]]:
+        """Yield (start, end, term) for every whole-word occurrence of a term."""
+        goto, fail, out = self.goto, self.fail, self.out
+        node = 0
+        low = text.lower()
+        n = len(low)
+        for i, ch in enumerate(low):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                for term in out[node]:
+                    start = i - len(term) + 1
+                    if (start == 0 or not low[start - 1].isalnum()) and (i + 1 == n or not low[i + 1].isalnum()):
+                        yield start, i + 1, term
+
+
+def luhn_ok(digits: str) -> bool:
+    total = 0
+    for i, ch in enumerate(reversed(digits)):
+        d = ord(ch) - 48
+        if i % 2:
+            d *= 2
+            if d > 9:
+                d -= 9
+        total += d
+    return total % 10 == 0
+
+
+def ssn_ok(value: str) -> bool:
+    digits = re.sub(r"[ -]", "", value)
+    area, group, serial = digits[:3], digits[3:5], digits[5:]
+    return area not in ("000", "666") and area[0] != "9" and group != "00" and serial != "0000"
+
+
+class PiiScanner:
+    """Finds card numbers (Luhn-checked), SSNs and passport numbers and redacts them.
+
+    Passport-shaped tokens (1-2 letters + 6-8 digits) are only redacted when a
+    sensitive term appears in the same message, so booking references and the
+    like pass through untouched. Shapes that are also ordinary numbers need a
+    matching keyword within KEYWORD_WINDOW characters: digit-only passports,
+    SSNs written with spaces or no separator, and space-separated card numbers
+    not in a printed grouping (4-4-4-4 and the like).
+    """
+
+    def __init__(self, terms: Iterable[str] = SENSITIVE_TERMS):
+        self.keywords = KeywordAutomaton(terms)
+
+    def scan(self, text: str) -> Dict[str, Any]:
+        hits = list(self.keywords.find(text))
+        terms = sorted({t for _, _, t in hits})
+
+        def near(kind_terms: set, start: int, end: int) -> bool:
+            return any(t in kind_terms and s - KEYWORD_WINDOW <= end and e + KEYWORD_WINDOW >= start
+                       for s, e, t in hits)
+
+        findings = []
+        for m in _SHAPES.finditer(text):
+            kind = "card" if m.group("card") else "ssn" if m.group("ssn") else "passport"
+            value = m.group(kind)
+            if kind == "card":
+                groups = tuple(len(g) for g in re.split(r"[ -]", value))
+                if len(groups) > 1 and groups not in CARD_GROUPINGS and not near(CARD_TERMS, m.start(), m.end()):
+                    continue
+                if not luhn_ok(re.sub(r"[ -]", "", value)):
+                    continue
+            elif kind == "ssn":
+                if m.group("sep") != "-" and not near(SSN_TERMS, m.start(), m.end()):
+                    if not (m.group("sep") == "" and near(PASSPORT_TERMS, m.start(), m.end())):
+                        continue
+                    kind = "passport"  # "passport number is 123456789"
+                elif not ssn_ok(value):
+                    continue
+            elif value[0].isdigit():
+                if not near(PASSPORT_TERMS, m.start(), m.end()):
+                    continue
+            elif not terms:
+                continue
+            findings.append({"kind": kind, "start": m.start(), "end": m.end()})
+        return {"terms": terms, "findings": findings, "redacted": self.redact(text, findings)}
+
+    @staticmethod
+    def redact(text: str, findings: List[Dict[str, Any]]) -> str:
+        if not findings:
+            return text
+        parts, last = [], 0
+        for f in findings:
+            parts += [text[last:f["start"]], REDACTION[f["kind"]]]
+            last = f["end"]
+        parts.append(text[last:])
+        return "".join(parts)
+
+
+_scanner = PiiScanner()
+
+
+def scan(text: str) -> Dict[str, Any]:
+    return _scanner.scan(text)
+
+
+def redact(text: str) -> str:
+    """The text with every finding replaced, for logs and memory written before the guardrail node runs."""
+    return _scanner.scan(text)["redacted"]
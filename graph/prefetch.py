@@ -0,0 +1,85 @@
+import os
+import sys
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, Any, List
+import metrics
+
+logger = logging.getLogger("agentic_chatbot.prefetch")
+
+PREFETCH_ENABLED = os.getenv("RAG_PREFETCH", "1").lower() not in ("0", "false", "no")
+PREFETCH_WORKERS = int(os.getenv("RAG_PREFETCH_WORKERS", "2"))
+PREFETCH_WAIT_S = float(os.getenv("RAG_PREFETCH_WAIT_S", "5"))
+
+_pool: ThreadPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="rag-prefetch")
+    return _pool
+
+
+class RetrievalPrefetch:
+    """Speculative rag_search started alongside primary routing."""
+
+    def __init__(self, query: str):
+        self.query = query
+        self.elapsed_ms: float | None = None
+        self.future: Future = _executor().submit(self._run)
+        metrics.incr("prefetch.issued")
+
+    def _run(self) -> List[Dict[str, Any]]:
+        from rag_store import search
+        t0 = time.perf_counter()
+        try:
+            return search(self.query)
+        finally:
+            self.elapsed_ms = (time.perf_counter() - t0) * 1000.0
+
+    def collect(self) -> List[Dict[str, Any]] | None:
+        t0 = time.perf_counter()
+        try:
+            hits = self.future.result(timeout=PREFETCH_WAIT_S)
+        except Exception:
+            logger.warning("Speculative retrieval failed; FAQ agent will search itself.", exc_info=True)
+            metrics.incr("prefetch.failed")
+            return None
+        waited_ms = (time.perf_counter() - t0) * 1000.0
+        # Retrieval time that overlapped with routing instead of running after it.
+        saved_ms = max(0.0, (self.elapsed_ms or 0.0) - waited_ms)
+        metrics.incr("prefetch.used")
+        metrics.observe("prefetch.saved_ms", saved_ms)
+        metrics.observe("prefetch.wait_ms", waited_ms)
+        logger.info("Prefetched evidence used (%d hits, retrieval=%.0fms, hidden=%.0fms).", len(hits), self.elapsed_ms or 0.0, saved_ms)
+        return hits
+
+    def discard(self):
+        self.future.cancel()
+        metrics.incr("prefetch.dropped")
+
+
+def _resident() -> bool:
+    # rag_store not imported yet means nothing is loaded; importing it here would pull in numpy.
+    rag_store = sys.modules.get("rag_store")
+    return rag_store is not None and rag_store.is_resident()
+
+
+def start_prefetch(query: str, likely_policy: bool = True) -> RetrievalPrefetch | None:
+    """Start a speculative rag_search, only when it is cheap (model and index resident) and may be used."""
+    if not PREFETCH_ENABLED or not likely_policy or not (query or "").strip():
+        return None
+    if not _resident():
+        metrics.incr("prefetch.skipped_cold")
+        return None
+    try:
+        return RetrievalPrefetch(query)
+    except Exception:
+        logger.warning("Could not start speculative retrieval.", exc_info=True)
+        return None
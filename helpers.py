@@ -1,8 +1,42 @@
-import os, json, re
+import os, json, re, threading
+from array import array
+from collections import OrderedDict
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple, Iterable
+import metrics
+from places import get_place_index, Place
+
+_flights_cache: Dict[str, Tuple[float, List[Dict[str, Any]]]] = {}
+_flights_lock = threading.Lock()
+
+
+def _read_flights(p: str) -> Tuple[float, List[Dict[str, Any]]]:
+    mtime = os.path.getmtime(p)
+    cached = _flights_cache.get(p)
+    if cached is not None and cached[0] == mtime:
+        return cached
+    with _flights_lock:
+        cached = _flights_cache.get(p)
+        if cached is not None and cached[0] == mtime:
+            return cached
+        with open(p, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = [data]
+        _flights_cache[p] = (mtime, data)
+        return _flights_cache[p]
+
 
 def load_flights(path: str = None) -> List[Dict[str, Any]]:
+    """Flight store, parsed once per file and reloaded only when the file's mtime changes.
+
+    The returned list is shared between callers; treat it as read-only.
+    """
+    return flight_store(path)[1]
+
+
+def flight_store(path: str = None) -> Tuple[str, List[Dict[str, Any]]]:
+    """(version, flights): the version changes whenever the backing file is replaced or edited."""
     candidates = []
     if path: candidates.append(path)
     candidates += [
@@ -13,14 +47,11 @@ def load_flights(path: str = None) -> List[Dict[str, Any]]:
     for p in candidates:
         if os.path.exists(p):
             try:
-                with open(p, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                if isinstance(data, dict):
-                    data = [data]
-                return data
+                mtime, data = _read_flights(p)
+                return f"{p}@{mtime}", data
             except Exception:
                 pass
-    return []
+    return "", []
 
 
 def _month_name_to_num(month: str) -> int | None:
@@ -72,9 +103,51 @@ def _pass_alliance(item: Dict[str, Any], alliance: str | None) -> bool:
     return False
 
 
+_ORIGIN_KEYS = ["from", "origin", "source", "from_city"]
+_DEST_KEYS = ["to", "destination", "dest", "to_city"]
+
+# Route ids of the most recently filtered flight lists, keyed by id(list).
+_ROUTE_IDS_SLOTS = 4
+_route_ids_cache: "OrderedDict[int, Tuple[List[Dict[str, Any]], int, Tuple[array, ...]]]" = OrderedDict()
+
+
+def route_ids(flights: List[Dict[str, Any]]) -> Tuple[array, array, array, array]:
+    """Per-itinerary (origin metro, origin airport, destination metro, destination airport) place ids.
+
+    Computed once per flight list (the loaded store is a shared list, so once per
+    store version) and reused by every filter call over it.
+    """
+    hit = _route_ids_cache.get(id(flights))
+    if hit is not None and hit[0] is flights and hit[1] == len(flights):
+        return hit[2]
+    index = get_place_index()
+    seen: Dict[Any, Place] = {}
+
+    def place(value: Any) -> Place:
+        key = value if isinstance(value, str) else None
+        if key not in seen:
+            seen[key] = index.row_place(key)
+        return seen[key]
+
+    cols = tuple(array("i") for _ in range(4))
+    for it in flights:
+        src = place(_first_nonempty(it, _ORIGIN_KEYS))
+        dst = place(_first_nonempty(it, _DEST_KEYS))
+        cols[0].append(src[0]); cols[1].append(src[1]); cols[2].append(dst[0]); cols[3].append(dst[1])
+    with _flights_lock:
+        _route_ids_cache[id(flights)] = (flights, len(flights), cols)
+        while len(_route_ids_cache) > _ROUTE_IDS_SLOTS:
+            _route_ids_cache.popitem(last=False)
+    return cols
+
+
+def _criteria_place(value: Any) -> Place | None:
+    return get_place_index().resolve(value) if isinstance(value, str) and value.strip() else None
+
+
 def _pass_route(item: Dict[str, Any], origin: str | None, destination: str | None) -> bool:
-    src = _first_nonempty(item, ["from", "origin", "source", "from_city"])
-    dst = _first_nonempty(item, ["to", "destination", "dest", "to_city"])
+    src = _first_nonempty(item, _ORIGIN_KEYS)
+    dst = _first_nonempty(item, _DEST_KEYS)
     ok_src = True if not origin else _ci_contains(src or "", origin)
     ok_dst = True if not destination else _ci_contains(dst or "", destination)
     return ok_src and ok_dst
@@ -90,8 +163,25 @@ def _pass_month(item: Dict[str, Any], month_hint: str | None) -> bool:
 
 
 def filter_flights(flights: List[Dict[str, Any]], criteria: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [flights[i] for i in filter_positions(flights, criteria)]
+
+
+def filter_positions(flights: List[Dict[str, Any]], criteria: Dict[str, Any],
+                     positions: Iterable[int] | None = None) -> List[int]:
+    """Indices of the itineraries matching criteria, scanning only `positions` when given.
+
+    Origin and destination are resolved to place ids once, so route matching is
+    an integer comparison against route_ids(flights). A name the place index
+    cannot resolve falls back to case-insensitive substring matching.
+    """
     origin = criteria.get("origin")
     destination = criteria.get("destination")
+    o_place, d_place = _criteria_place(origin), _criteria_place(destination)
+    o_metro, o_airport = o_place or (0, 0)
+    d_metro, d_airport = d_place or (0, 0)
+    om, oa, dm, da = route_ids(flights) if (o_place or d_place) else (None,) * 4
+    text_origin = origin if o_place is None else None
+    text_destination = destination if d_place is None else None
     month_hint = criteria.get("month_hint")
     alliance = criteria.get("alliance")
     max_price = criteria.get("max_price_usd")
@@ -100,14 +190,20 @@ def filter_flights(flights: List[Dict[str, Any]], criteria: Dict[str, Any]) -> L
     refundable_only = criteria.get("refundable_only")
 
     out = []
-    for it in flights:
-        if not _pass_route(it, origin, destination):            
+    for i in (range(len(flights)) if positions is None else positions):
+        it = flights[i]
+        # Same metro; when both sides name an airport, the airports must match too.
+        if o_metro and (om[i] != o_metro or (o_airport and oa[i] and oa[i] != o_airport)):
+            continue
+        if d_metro and (dm[i] != d_metro or (d_airport and da[i] and da[i] != d_airport)):
             continue
-        if not _pass_month(it, month_hint):                    
+        if (text_origin or text_destination) and not _pass_route(it, text_origin, text_destination):
             continue
-        if not _pass_price(it, max_price):                      
+        if not _pass_month(it, month_hint):
             continue
-        if not _pass_alliance(it, alliance):                    
+        if not _pass_price(it, max_price):
+            continue
+        if not _pass_alliance(it, alliance):
             continue
 
         if non_stop_only is True:
@@ -120,5 +216,76 @@ def filter_flights(flights: List[Dict[str, Any]], criteria: Dict[str, Any]) -> L
             if ref is not True:
                 continue
 
-        out.append(it)
+        out.append(i)
     return out
+
+
+CRITERIA_FIELDS = ("origin", "destination", "month_hint", "alliance", "max_price_usd", "non_stop_only", "refundable_only")
+
+
+def _norm_field(value: Any) -> Any:
+    if value in (None, ""):
+        return None
+    return value.strip().lower() if isinstance(value, str) else value
+
+
+def criteria_delta(prev: Dict[str, Any] | None, new: Dict[str, Any] | None) -> Dict[str, Dict[str, Any]]:
+    """Fields whose value changed between two FlightCriteria dicts: {field: {"from": old, "to": new}}."""
+    prev, new = prev or {}, new or {}
+    return {f: {"from": prev.get(f), "to": new.get(f)}
+            for f in CRITERIA_FIELDS if _norm_field(prev.get(f)) != _norm_field(new.get(f))}
+
+
+def is_narrowing(prev: Dict[str, Any], new: Dict[str, Any]) -> bool:
+    """True when every itinerary matching `new` also matches `prev`, so prev's matches can be re-filtered."""
+    for f in CRITERIA_FIELDS:
+        old, cur = _norm_field(prev.get(f)), _norm_field(new.get(f))
+        if old is None or old == cur:
+            continue
+        if cur is None:
+            return False
+        if f == "max_price_usd":
+            try:
+                if float(cur) <= float(old):
+                    continue
+            except (TypeError, ValueError):
+                pass
+            return False
+        if f in ("non_stop_only", "refundable_only") and old is not True:
+            continue
+        return False
+    return True
+
+
+class FlightResultCache:
+    """The last flight_filter call of one conversation: criteria, matched store positions and store version.
+
+    `entry` is plain JSON so it can live in state['results'] and the session store.
+    A follow-up whose criteria only narrow the previous ones (a lower price cap,
+    refundable/non-stop only, a route or month where none was given) is filtered
+    against the cached positions instead of the whole store.
+    """
+
+    def __init__(self, entry: Dict[str, Any] | None = None):
+        self.entry = entry
+
+    def search(self, criteria: Dict[str, Any]) -> List[Dict[str, Any]]:
+        version, flights = flight_store()
+        e = self.entry
+        if e and e.get("version") == version and is_narrowing(e.get("criteria") or {}, criteria):
+            metrics.incr("flight.cache_hit")
+            scan = e.get("positions") or []
+        else:
+            metrics.incr("flight.cache_miss")
+            scan = None
+        metrics.observe("flight.scanned", len(flights) if scan is None else len(scan))
+        positions = filter_positions(flights, criteria, scan)
+        self.entry = {"criteria": {f: criteria.get(f) for f in CRITERIA_FIELDS}, "positions": positions, "version": version}
+        return [flights[i] for i in positions]
+
+    def matches(self) -> List[Dict[str, Any]]:
+        """Itineraries of the cached entry, or [] when there is none or the store has changed since."""
+        version, flights = flight_store()
+        if not self.entry or self.entry.get("version") != version:
+            return []
+        return [flights[i] for i in self.entry.get("positions") or []]
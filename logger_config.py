@@ -1,21 +1,125 @@
-import logging
 import os
+import json
+import queue
+import atexit
+import logging
+import contextvars
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_DIR = os.getenv("LOG_DIR", "logs")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()  # file format: json | text
+LOG_CONSOLE = os.getenv("LOG_CONSOLE", "1").lower() not in ("0", "false", "no")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+
+TEXT_FORMAT = "%(asctime)s | %(levelname)s | %(name)s | %(request_id)s %(session_id)s | %(message)s"
+
+request_id_var: contextvars.ContextVar = contextvars.ContextVar("log_request_id", default="-")
+session_id_var: contextvars.ContextVar = contextvars.ContextVar("log_session_id", default="-")
+
+_listener: QueueListener | None = None
+
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id", "session_id"}
+_SIMPLE_ARGS = (str, int, float, bool, type(None))
+
+
+@contextmanager
+def log_context(request_id: str | None = None, session_id: str | None = None):
+    """Tag every log record emitted in this context (thread/task) with request and session ids."""
+    tokens = []
+    if request_id is not None:
+        tokens.append((request_id_var, request_id_var.set(request_id)))
+    if session_id is not None:
+        tokens.append((session_id_var, session_id_var.set(session_id)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        record.session_id = session_id_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        out = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+            "session_id": getattr(record, "session_id", "-"),
+            "thread": record.threadName,
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                out[key] = value
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            out["exc"] = record.exc_text
+        return json.dumps(out, ensure_ascii=False, default=str)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """QueueHandler that leaves %-formatting to the writer thread when the args are immutable.
+
+    The stock QueueHandler formats every record on the calling thread; records
+    with mutable args or exception info still take that path so the writer
+    never sees objects that may change after the call returns.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        args = record.args
+        if record.exc_info or (args and not (isinstance(args, tuple) and all(isinstance(a, _SIMPLE_ARGS) for a in args))):
+            return super().prepare(record)
+        return record
+
+
+def setup_logger(log_dir: str = LOG_DIR, stream=None):
+    global _listener
+    logger = logging.getLogger("agentic_chatbot")
+    if _listener is not None:
+        return logger
 
-def setup_logger():
-    log_dir = "logs"
     os.makedirs(log_dir, exist_ok=True)
     log_file = os.path.join(log_dir, "agentic_chatbot.log")
 
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
-        handlers=[
-            logging.FileHandler(log_file, encoding="utf-8"),
-            logging.StreamHandler()
-        ]
-    )
+    file_handler = RotatingFileHandler(log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8")
+    file_handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+    handlers = [file_handler]
+    if LOG_CONSOLE:
+        console = logging.StreamHandler(stream)
+        console.setFormatter(logging.Formatter(TEXT_FORMAT))
+        handlers.append(console)
 
-    logger = logging.getLogger("agentic_chatbot")
-    logger.setLevel(logging.DEBUG)
+    # Request threads only enqueue; a single background listener does formatting and I/O.
+    log_queue: queue.Queue = queue.Queue(-1)
+    queue_handler = DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+    root = logging.getLogger()
+    root.setLevel(LOG_LEVEL)
+    root.addHandler(queue_handler)
+
+    logger.setLevel(logging.DEBUG if LOG_LEVEL == "DEBUG" else LOG_LEVEL)
     logger.info("Logger initialized.")
     return logger
+
+
+def shutdown_logging():
+    """Drain the queue and stop the writer thread (registered atexit)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -1,18 +1,16 @@
+import os
 from dotenv import load_dotenv
 load_dotenv()
 
-from logger_config import setup_logger
+from logger_config import setup_logger, log_context
 logger = setup_logger()
 
-from graph.langgraph_app import build_graph
 from memory.memory import ConversationMemory
+from graph.pii import redact
 
 
-def chat(app):
-    logger.info("Starting chat loop.")
-    print("LLM Agents (Multi-Prompt ReAct + Sliding Memory, GPT-4o-mini) ready. Type 'exit' to quit.\n")
-    mem = ConversationMemory()
-    state = {'messages': [], 'memory': mem}
+def _loop(app, mem: ConversationMemory, state: dict, session_id: str | None = None, store=None):
+    turn_no = 0
     while True:
         try:
             q = input("You: ")
@@ -20,16 +18,91 @@ def chat(app):
             break
         if q.strip().lower() == 'exit':
             break
-        logger.info(f"User query: {q}")
-        mem.add_user(q)
-        state['query'] = q
-        out = app.invoke(state)
-        resp = out.get('response') or "(No textual summary produced — but the agent returned structured results.)"
-        print("Bot:", resp)
-        logger.info(f"Response: {resp}")
+        turn_no += 1
+        with log_context(request_id=f"turn-{turn_no}", session_id=session_id or "cli"):
+            # Memory and logs only ever see the redacted text; the guard node redacts the query itself.
+            safe = redact(q)
+            logger.info("User query: %s", safe)
+            mem.add_user(safe)
+            state['query'] = q
+            out = app.invoke(state)
+            resp = out.get('response') or "(No textual summary produced — but the agent returned structured results.)"
+            print("Bot:", resp)
+            logger.info("Response: %s", resp)
+            if store is not None:
+                store.record_turn(session_id, out)
         state = {**out, 'memory': mem}
 
 
-if __name__ == '__main__':
+def chat(app, session_id: str | None = None):
+    logger.info("Starting chat loop.")
+    print("LLM Agents (Multi-Prompt ReAct + Sliding Memory, GPT-4o-mini) ready. Type 'exit' to quit.\n")
+    if not session_id:
+        mem = ConversationMemory()
+        _loop(app, mem, {'messages': [], 'memory': mem})
+        return
+    from memory.session_store import get_session_store
+    store = get_session_store()
+    try:
+        # Pinned for the whole chat, and released even when a turn raises.
+        with store.use(session_id) as session:
+            logger.info(f"Resumed session {session_id}.")
+            state = {'messages': [], 'memory': session.memory, 'results': session.flight_results,
+                     'slots': session.slots, 'pending_slots': session.pending_slots}
+            _loop(app, session.memory, state, session_id, store)
+    finally:
+        store.flush()
+
+
+def profile_startup(query: str):
+    """Print import-time and first-turn breakdowns for a cold process."""
+    import sys
+    import time
+    import importlib
+    import metrics
+
+    print("Import time (ms; modules already loaded by earlier rows are not re-counted):")
+    for name in ("langgraph.graph", "graph.langgraph_app", "openai", "numpy", "faiss", "sentence_transformers"):
+        before = len(sys.modules)
+        t0 = time.perf_counter()
+        try:
+            importlib.import_module(name)
+            note = f"+{len(sys.modules) - before} modules"
+        except Exception as e:
+            note = f"failed: {e!r}"
+        print(f"  {name:<24} {(time.perf_counter() - t0) * 1000.0:8.1f}  {note}")
+
+    from graph.langgraph_app import build_graph
+    t0 = time.perf_counter()
     app = build_graph()
-    chat(app)
+    print(f"  {'build_graph()':<24} {(time.perf_counter() - t0) * 1000.0:8.1f}")
+
+    print(f"\nFirst turn (no warmup): {query!r}")
+    mem = ConversationMemory()
+    mem.add_user(redact(query))
+    with metrics.turn() as rec:
+        t0 = time.perf_counter()
+        out = app.invoke({'messages': [], 'query': query, 'memory': mem})
+        total = (time.perf_counter() - t0) * 1000.0
+    depth: dict = {}
+    for sp in sorted(rec.spans, key=lambda s: s["start"]):
+        depth[sp["span_id"]] = depth.get(sp["parent_id"], -1) + 1
+        print(f"  {'  ' * depth[sp['span_id']]}{sp['name']:<{24 - 2 * depth[sp['span_id']]}} {sp['ms']:8.1f}")
+    print(f"  {'total':<24} {total:8.1f}  (intent={out.get('intent')}, agent={out.get('current_agent')})")
+
+
+if __name__ == '__main__':
+    import argparse
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--session", default=os.getenv("CHAT_SESSION_ID"), help="Persisted session id to resume.")
+    ap.add_argument("--profile-startup", action="store_true", help="Report import-time and first-turn breakdowns, then exit.")
+    ap.add_argument("--profile-query", default="Do UAE passport holders need a visa for Japan?")
+    args = ap.parse_args()
+    if args.profile_startup:
+        profile_startup(args.profile_query)
+    else:
+        from graph.langgraph_app import build_graph
+        from warmup import start_warmup
+        start_warmup()  # retriever, flight store and caches load while the user types
+        app = build_graph()
+        chat(app, session_id=args.session)
@@ -1,20 +1,203 @@
 import os
-from langchain.memory import ConversationBufferWindowMemory
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Tuple
+from tokens import count_tokens
+
+logger = logging.getLogger("agentic_chatbot.memory")
+
+ROLE_PREFIX = {"user": "Human", "ai": "AI"}
+
+_summary_pool: ThreadPoolExecutor | None = None
+_summary_pool_lock = threading.Lock()
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def _summary_executor() -> ThreadPoolExecutor:
+    global _summary_pool
+    if _summary_pool is None:
+        with _summary_pool_lock:
+            if _summary_pool is None:
+                _summary_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="memory-summary")
+    return _summary_pool
+
+
+def _format_lines(messages: List[Tuple[str, str]]) -> str:
+    return "\n".join(f"{ROLE_PREFIX.get(r, r)}: {t}" for r, t in messages)
+
+
+def llm_summarize(previous: str, messages: List[Tuple[str, str]], max_tokens: int) -> str:
+    from agents.base import render_prompt
+    from graph.openai_client import openai_generate, llm_priority
+    prompt = render_prompt(
+        'memory_summary.j2',
+        max_words=max(20, int(max_tokens * 0.75)),
+        summary=previous or "(none)",
+        messages=_format_lines(messages),
+    )
+    with llm_priority("batch"):
+        return openai_generate(prompt, max_output_tokens=max_tokens, temperature=0.1).strip()
+
 
 class ConversationMemory:
-    def __init__(self, k: int | None = None):
-        if k is None:
+    """Token-budgeted conversation memory with a rolling summary.
+
+    Messages carry their token counts, so the budget check is incremental. Turns
+    pushed out by the budget (or the MEMORY_K window) are folded into a summary
+    on a background thread once the assistant reply is recorded, keeping the
+    summarisation call off the request path.
+    """
+
+    def __init__(
+        self,
+        k: int | None = None,
+        token_budget: int | None = None,
+        summary_tokens: int | None = None,
+        summarizer: Callable[[str, List[Tuple[str, str]], int], str] | None = None,
+    ):
+        self.k = k if k is not None else _env_int("MEMORY_K", 8)
+        self.token_budget = token_budget if token_budget is not None else _env_int("MEMORY_TOKEN_BUDGET", 1500)
+        self.summary_tokens = summary_tokens if summary_tokens is not None else _env_int("MEMORY_SUMMARY_TOKENS", 200)
+        self.summarizer = summarizer or llm_summarize
+
+        self.summary = ""
+        self._summary_tok = 0
+        self._messages: Deque[Tuple[str, str, int]] = deque()
+        self._tokens = 0
+        self._pending: List[Tuple[str, str]] = []
+        self._folding = None
+        self._formatted: str | None = None
+        self._lock = threading.RLock()
+        self.on_change: Callable[[], None] | None = None
+
+    @classmethod
+    def from_session(cls, session_id: str, store=None) -> "ConversationMemory":
+        """Memory bound to a persisted session; changes are written back by the session store."""
+        if store is None:
+            from memory.session_store import get_session_store
+            store = get_session_store()
+        return store.get(session_id).memory
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "summary": self.summary,
+                "messages": [list(m) for m in self._messages],
+                "pending": [list(m) for m in self._pending],
+            }
+
+    def load_dict(self, data: Dict[str, Any]):
+        with self._lock:
+            self.summary = data.get("summary") or ""
+            self._summary_tok = count_tokens(self.summary)
+            self._messages = deque((r, t, int(n)) for r, t, n in data.get("messages") or [])
+            self._tokens = sum(n for _, _, n in self._messages)
+            self._pending = [(r, t) for r, t in data.get("pending") or []]
+            self._formatted = None
+
+    def _changed(self):
+        self._formatted = None
+        if self.on_change is not None:
             try:
-                k = int(os.getenv("MEMORY_K", "8"))
+                self.on_change()
             except Exception:
-                k = 8
-        self.mem = ConversationBufferWindowMemory(k=k, return_messages=False, memory_key="history")
-    
+                logger.warning("Memory change callback failed.", exc_info=True)
+
     def add_user(self, text: str):
-        self.mem.chat_memory.add_user_message(text)
-    
+        self._add("user", text)
+
     def add_ai(self, text: str):
-        self.mem.chat_memory.add_ai_message(text)
-    
+        self._add("ai", text)
+        self._schedule_fold()
+
+    def redact_last_user(self, text: str):
+        """Replace the most recent user message (e.g. after the guardrail redacts PII)."""
+        with self._lock:
+            for i in range(len(self._messages) - 1, -1, -1):
+                role, _, n = self._messages[i]
+                if role == "user":
+                    m = count_tokens(text)
+                    self._messages[i] = ("user", text, m)
+                    self._tokens += m - n
+                    self._changed()
+                    return
+
+    def _add(self, role: str, text: str):
+        text = text or ""
+        n = count_tokens(text)
+        with self._lock:
+            self._messages.append((role, text, n))
+            self._tokens += n
+            self._enforce_budget()
+            self._changed()
+
+    def _enforce_budget(self):
+        # Always keep the latest exchange verbatim, even if it alone exceeds the budget.
+        while len(self._messages) > 2 and (
+            len(self._messages) > 2 * self.k or self._tokens + self._summary_tok > self.token_budget
+        ):
+            role, text, n = self._messages.popleft()
+            self._tokens -= n
+            self._pending.append((role, text))
+
+    def _schedule_fold(self):
+        with self._lock:
+            if not self._pending or self._folding is not None:
+                return
+            batch = list(self._pending)
+            previous = self.summary
+            self._folding = _summary_executor().submit(self._fold, previous, batch)
+
+    def _fold(self, previous: str, batch: List[Tuple[str, str]]):
+        try:
+            summary = self.summarizer(previous, batch, self.summary_tokens)
+        except Exception:
+            logger.warning("Rolling summary failed; keeping a truncated extract instead.", exc_info=True)
+            summary = (previous + "\n" + _format_lines(batch)).strip()[-4 * self.summary_tokens:]
+        with self._lock:
+            self.summary = summary
+            self._summary_tok = count_tokens(summary)
+            del self._pending[:len(batch)]
+            self._folding = None
+            self._enforce_budget()
+            self._changed()
+        logger.info(f"Memory folded {len(batch)} message(s) into rolling summary ({self._summary_tok} tokens).")
+        self._schedule_fold()
+
+    def wait_for_summary(self, timeout: float | None = None):
+        fut = self._folding
+        if fut is not None:
+            fut.result(timeout=timeout)
+
+    @property
+    def has_history(self) -> bool:
+        """True once an earlier turn has been answered (the current user message alone does not count)."""
+        with self._lock:
+            return bool(self.summary) or any(r == "ai" for r, _, _ in self._messages) or \
+                any(r == "ai" for r, _ in self._pending)
+
+    @property
+    def token_count(self) -> int:
+        with self._lock:
+            return self._tokens + self._summary_tok
+
     def get_formatted(self) -> str:
-        return self.mem.load_memory_variables({}).get("history", "")
+        cached = self._formatted
+        if cached is not None:
+            return cached
+        with self._lock:
+            if self._formatted is None:
+                body = _format_lines([(r, t) for r, t, _ in self._messages])
+                if self.summary:
+                    body = f"Summary of earlier conversation: {self.summary}\n{body}" if body else \
+                        f"Summary of earlier conversation: {self.summary}"
+                self._formatted = body
+            return self._formatted
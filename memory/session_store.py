@@ -0,0 +1,253 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+from memory.memory import ConversationMemory
+
+logger = logging.getLogger("agentic_chatbot.sessions")
+
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "data/sessions.sqlite3")
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "5000"))
+SESSION_IDLE_TTL_S = float(os.getenv("SESSION_IDLE_TTL_S", "1800"))
+SESSION_FLUSH_INTERVAL_S = float(os.getenv("SESSION_FLUSH_INTERVAL_S", "0.5"))
+SESSION_FLUSH_BATCH = int(os.getenv("SESSION_FLUSH_BATCH", "64"))
+
+
+class Session:
+    """Per-user conversation state: memory turns, the last flight search and the filled flight slots."""
+
+    def __init__(self, session_id: str, memory: ConversationMemory,
+                 flight_criteria: Dict[str, Any] | None = None, flight_results: Dict[str, Any] | None = None,
+                 slots: Dict[str, Any] | None = None, pending_slots: List[str] | None = None):
+        self.session_id = session_id
+        self.memory = memory
+        self.flight_criteria = flight_criteria
+        self.flight_results = flight_results
+        self.slots = slots
+        self.pending_slots = pending_slots
+        self.last_access = time.monotonic()
+        self.lock = threading.Lock()
+        self.pins = 0  # turns in flight (SessionStore.use); guarded by the store lock
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "memory": self.memory.to_dict(),
+            "flight_criteria": self.flight_criteria,
+            "flight_results": self.flight_results,
+            "slots": self.slots,
+            "pending_slots": self.pending_slots,
+        }, ensure_ascii=False)
+
+
+class SessionStore:
+    """SQLite (WAL) backed sessions with an in-memory LRU of hot sessions.
+
+    Writes are batched: changes only mark a session dirty, and a background
+    writer upserts all dirty sessions in one transaction every
+    SESSION_FLUSH_INTERVAL_S (or sooner once SESSION_FLUSH_BATCH are pending).
+    Idle or overflowing sessions are flushed and dropped from memory, then
+    rehydrated lazily on their next access. A session that is pinned (a turn
+    in flight, see use()) or whose lock is held is never evicted, so its
+    memory writes keep reaching the store and later requests share the same
+    Session object.
+    """
+
+    def __init__(self, path: str = SESSION_DB_PATH, capacity: int = SESSION_CACHE_SIZE,
+                 idle_ttl_s: float = SESSION_IDLE_TTL_S, flush_interval_s: float = SESSION_FLUSH_INTERVAL_S,
+                 flush_batch: int = SESSION_FLUSH_BATCH):
+        self.path = path
+        self.capacity = capacity
+        self.idle_ttl_s = idle_ttl_s
+        self.flush_interval_s = flush_interval_s
+        self.flush_batch = flush_batch
+        self.stats = {"hits": 0, "rehydrated": 0, "created": 0, "evicted": 0, "flushes": 0, "rows_written": 0}
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " session_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._db_lock = threading.Lock()
+
+        # Lock order: never take a memory/session lock while holding self._lock.
+        self._lock = threading.Lock()
+        self._lru: "OrderedDict[str, Session]" = OrderedDict()
+        self._dirty: set = set()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._writer = threading.Thread(target=self._writer_loop, name="session-writer", daemon=True)
+        self._writer.start()
+
+    def _load(self, session_id: str) -> Session:
+        with self._db_lock:
+            row = self._db.execute("SELECT data FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        memory = ConversationMemory()
+        if row is None:
+            with self._lock:
+                self.stats["created"] += 1
+            return Session(session_id, memory)
+        data = json.loads(row[0])
+        memory.load_dict(data.get("memory") or {})
+        with self._lock:
+            self.stats["rehydrated"] += 1
+        return Session(session_id, memory, data.get("flight_criteria"), data.get("flight_results"),
+                       data.get("slots"), data.get("pending_slots"))
+
+    def get(self, session_id: str, pin: bool = False) -> Session:
+        """The session, loaded on a miss; with pin=True it stays resident until release()."""
+        with self._lock:
+            sess = self._lru.get(session_id)
+            if sess is not None:
+                self._lru.move_to_end(session_id)
+                sess.last_access = time.monotonic()
+                sess.pins += pin
+                self.stats["hits"] += 1
+                return sess
+        loaded = self._load(session_id)
+        loaded.memory.on_change = lambda sid=session_id: self.mark_dirty(sid)
+        with self._lock:
+            sess = self._lru.setdefault(session_id, loaded)
+            self._lru.move_to_end(session_id)
+            sess.pins += pin
+            overflow = len(self._lru) > self.capacity
+        if overflow:
+            self._wake.set()
+        return sess
+
+    def release(self, sess: Session):
+        with self._lock:
+            sess.pins -= 1
+            sess.last_access = time.monotonic()
+
+    @contextmanager
+    def use(self, session_id: str) -> Iterator[Session]:
+        """The session, pinned for the duration of a turn."""
+        sess = self.get(session_id, pin=True)
+        try:
+            yield sess
+        finally:
+            self.release(sess)
+
+    def mark_dirty(self, session_id: str):
+        with self._lock:
+            self._dirty.add(session_id)
+            pending = len(self._dirty)
+        if pending >= self.flush_batch:
+            self._wake.set()
+
+    def update(self, session_id: str, **fields):
+        sess = self.get(session_id)
+        for key in ("flight_criteria", "flight_results", "slots", "pending_slots"):
+            if key in fields:
+                setattr(sess, key, fields[key])
+        self.mark_dirty(session_id)
+
+    def record_turn(self, session_id: str, state: Dict[str, Any]):
+        """Persist the last flight criteria/results and the slot-filling state produced by a graph turn."""
+        fields = {key: state[key] for key in ("slots", "pending_slots") if key in state}
+        if state.get('current_agent') == 'flight_agent' and state.get('results'):
+            results = state['results']
+            fields.update(flight_criteria=results.get('criteria'), flight_results=results)
+        if fields:
+            self.update(session_id, **fields)
+
+    def flush(self) -> int:
+        with self._lock:
+            ids = list(self._dirty)
+            self._dirty.clear()
+            sessions = [self._lru.get(sid) for sid in ids]
+        rows = []
+        now = time.time()
+        for sid, sess in zip(ids, sessions):
+            if sess is not None:
+                rows.append((sid, sess.to_json(), now))
+        if not rows:
+            return 0
+        with self._db_lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany(
+                    "INSERT INTO sessions (session_id, data, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(session_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                    rows,
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                with self._lock:
+                    self._dirty.update(sid for sid, _, _ in rows)
+                raise
+        with self._lock:
+            self.stats["flushes"] += 1
+            self.stats["rows_written"] += len(rows)
+        return len(rows)
+
+    @staticmethod
+    def _busy(sess: Session) -> bool:
+        return sess.pins > 0 or sess.lock.locked()
+
+    def _evict(self):
+        now = time.monotonic()
+        with self._lock:
+            idle = [sid for sid, s in self._lru.items() if not self._busy(s)]
+            victims: List[str] = [sid for sid in idle if now - self._lru[sid].last_access > self.idle_ttl_s]
+            overflow = len(self._lru) - len(victims) - self.capacity
+            if overflow > 0:
+                chosen = set(victims)
+                victims += [sid for sid in idle if sid not in chosen][:overflow]
+            if not victims:
+                return
+        self.flush()
+        with self._lock:
+            for sid in victims:
+                sess = self._lru.get(sid)
+                # Re-checked under the store lock: get(pin=True) may have picked the session up since.
+                if sess is None or sid in self._dirty or self._busy(sess):
+                    continue
+                del self._lru[sid]
+                sess.memory.on_change = None
+                self.stats["evicted"] += 1
+
+    def _writer_loop(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval_s)
+            self._wake.clear()
+            try:
+                self.flush()
+                self._evict()
+            except Exception:
+                logger.exception("Session store flush failed; will retry.")
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        self._writer.join(timeout=5)
+        self.flush()
+        with self._db_lock:
+            self._db.close()
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"resident": len(self._lru), "dirty": len(self._dirty), "capacity": self.capacity, **self.stats}
+
+
+_store: SessionStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SessionStore()
+    return _store
@@ -0,0 +1,266 @@
+import os
+import json
+import time
+import uuid
+import atexit
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any, List, Deque
+
+MAX_SAMPLES = int(os.getenv("METRICS_MAX_SAMPLES", "10000"))
+TRACING = os.getenv("TRACING", "1").lower() not in ("0", "false", "no")
+TRACE_FILE = os.getenv("TRACE_FILE", "")
+HISTOGRAM_BUCKETS_MS = tuple(
+    float(b) for b in os.getenv("HISTOGRAM_BUCKETS_MS", "1,2.5,5,10,25,50,100,250,500,1000,2500,5000,10000,30000").split(",")
+)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+COUNT_BUCKETS = (0, 1, 2, 3, 4, 5, 8)
+
+_lock = threading.Lock()
+_counters: Dict[str, float] = {}
+_gauges: Dict[str, float] = {}
+_samples: Dict[str, Deque[float]] = {}
+_histograms: Dict[str, tuple] = {}  # name -> (bounds, per-bucket counts + [+Inf count, sum])
+_turn: contextvars.ContextVar = contextvars.ContextVar("agentic_chatbot_turn", default=None)
+_span: contextvars.ContextVar = contextvars.ContextVar("agentic_chatbot_span", default=None)
+_trace_lock = threading.Lock()
+_trace_fh = None
+
+
+class TurnRecord:
+    """Counters and samples collected for a single graph invocation."""
+
+    def __init__(self):
+        self.counters: Dict[str, float] = {}
+        self.samples: Dict[str, List[float]] = {}
+        self.events: List[Dict[str, Any]] = []
+        self.spans: List[Dict[str, Any]] = []
+        self.trace_id = uuid.uuid4().hex[:16]
+
+    def incr(self, name: str, value: float = 1.0):
+        self.counters[name] = self.counters.get(name, 0.0) + value
+
+    def observe(self, name: str, value: float):
+        self.samples.setdefault(name, []).append(value)
+
+    def event(self, kind: str, **fields):
+        self.events.append({"kind": kind, **fields})
+
+
+def incr(name: str, value: float = 1.0):
+    with _lock:
+        _counters[name] = _counters.get(name, 0.0) + value
+    rec = _turn.get()
+    if rec is not None:
+        rec.incr(name, value)
+
+
+def observe(name: str, value: float):
+    with _lock:
+        buf = _samples.get(name)
+        if buf is None:
+            buf = _samples[name] = deque(maxlen=MAX_SAMPLES)
+        buf.append(value)
+    rec = _turn.get()
+    if rec is not None:
+        rec.observe(name, value)
+
+
+def gauge(name: str, value: float):
+    with _lock:
+        _gauges[name] = value
+
+
+def histogram(name: str, value: float, buckets: tuple = HISTOGRAM_BUCKETS_MS):
+    with _lock:
+        h = _histograms.get(name)
+        if h is None:
+            h = _histograms[name] = (buckets, [0.0] * (len(buckets) + 2))
+        bounds, counts = h
+        n = len(bounds)
+        for i, le in enumerate(bounds):
+            if value <= le:
+                counts[i] += 1
+                break
+        else:
+            counts[n] += 1
+        counts[n + 1] += value
+
+
+class Span:
+    """A timed section of a turn; attributes can be added while it is open."""
+
+    __slots__ = ("name", "span_id", "parent_id", "trace_id", "attrs", "start")
+
+    def __init__(self, name: str, parent: "Span | None", trace_id: str, attrs: Dict[str, Any]):
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent is not None else None
+        self.trace_id = trace_id
+        self.attrs = attrs
+        self.start = time.time()
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def _write_trace(record: Dict[str, Any]):
+    global _trace_fh
+    with _trace_lock:
+        if _trace_fh is None:
+            if os.path.dirname(TRACE_FILE):
+                os.makedirs(os.path.dirname(TRACE_FILE), exist_ok=True)
+            _trace_fh = open(TRACE_FILE, "a", encoding="utf-8")
+            atexit.register(flush_traces)
+        _trace_fh.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+
+def flush_traces():
+    with _trace_lock:
+        if _trace_fh is not None:
+            _trace_fh.flush()
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Time a block as `<name>_ms` in the histograms and record it on the current turn.
+
+    With TRACING=0 this yields a no-op span and records nothing.
+    """
+    if not TRACING:
+        yield _NOOP_SPAN
+        return
+    rec = _turn.get()
+    parent = _span.get()
+    trace_id = parent.trace_id if parent is not None else (rec.trace_id if rec is not None else uuid.uuid4().hex[:16])
+    sp = Span(name, parent, trace_id, attrs)
+    token = _span.set(sp)
+    t0 = time.perf_counter()
+    try:
+        yield sp
+    except BaseException as e:
+        sp.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        ms = (time.perf_counter() - t0) * 1000.0
+        _span.reset(token)
+        histogram(f"{name}_ms", ms)
+        record = {"trace_id": trace_id, "span_id": sp.span_id, "parent_id": sp.parent_id,
+                  "name": name, "start": sp.start, "ms": ms, **sp.attrs}
+        if rec is not None:
+            rec.spans.append(record)
+        if TRACE_FILE:
+            _write_trace(record)
+
+
+def event(kind: str, **fields):
+    rec = _turn.get()
+    if rec is not None:
+        rec.event(kind, **fields)
+
+
+def current_turn() -> TurnRecord | None:
+    return _turn.get()
+
+
+@contextmanager
+def turn():
+    rec = TurnRecord()
+    token = _turn.set(rec)
+    try:
+        yield rec
+    finally:
+        _turn.reset(token)
+        if TRACE_FILE:
+            flush_traces()
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    s = sorted(values)
+    k = (len(s) - 1) * q / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(s) - 1)
+    return s[lo] + (s[hi] - s[lo]) * (k - lo)
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    values = list(values)
+    if not values:
+        return {"count": 0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values),
+    }
+
+
+def snapshot() -> Dict[str, Any]:
+    with _lock:
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+        samples = {k: list(v) for k, v in _samples.items()}
+        histograms = {k: (b, list(c)) for k, (b, c) in _histograms.items()}
+    return {
+        "counters": counters,
+        "gauges": gauges,
+        "timings": {k: summarize(v) for k, v in samples.items()},
+        "histograms": {
+            k: {"buckets": dict(zip(b, c[:len(b)])), "inf": c[len(b)], "sum": c[len(b) + 1], "count": sum(c[:len(b) + 1])}
+            for k, (b, c) in histograms.items()
+        },
+    }
+
+
+def _prom_name(name: str) -> str:
+    return "agentic_" + "".join(c if c.isalnum() else "_" for c in name)
+
+
+def prometheus_text() -> str:
+    snap = snapshot()
+    lines = []
+    for name, value in sorted(snap["counters"].items()):
+        n = _prom_name(name) + "_total"
+        lines += [f"# TYPE {n} counter", f"{n} {value:g}"]
+    for name, value in sorted(snap["gauges"].items()):
+        n = _prom_name(name)
+        lines += [f"# TYPE {n} gauge", f"{n} {value:g}"]
+    for name, s in sorted(snap["timings"].items()):
+        n = _prom_name(name)
+        lines.append(f"# TYPE {n} summary")
+        for q in ("p50", "p95", "p99"):
+            lines.append(f'{n}{{quantile="0.{q[1:]}"}} {s[q]:g}')
+        lines += [f"{n}_sum {s['mean'] * s['count']:g}", f"{n}_count {s['count']}"]
+    for name, h in sorted(snap["histograms"].items()):
+        n = _prom_name(name)
+        lines.append(f"# TYPE {n} histogram")
+        cum = 0.0
+        for le, c in h["buckets"].items():
+            cum += c
+            lines.append(f'{n}_bucket{{le="{le:g}"}} {cum:g}')
+        lines += [f'{n}_bucket{{le="+Inf"}} {h["count"]:g}', f"{n}_sum {h['sum']:g}", f"{n}_count {h['count']:g}"]
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _samples.clear()
+        _histograms.clear()
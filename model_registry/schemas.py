@@ -1,3 +1,5 @@
+import json
+from functools import lru_cache
 from typing import Optional, List, Dict, Any
 from pydantic import BaseModel
 
@@ -35,3 +37,13 @@ class PolicyAnswer(BaseModel):
     response: str
     sources: List[Dict[str, str]] = []
     confidence: float = 0.6
+
+
+@lru_cache(maxsize=None)
+def cached_schema(model_cls) -> Dict[str, Any]:
+    """model_json_schema() computed once per model; treat the result as read-only."""
+    return model_cls.model_json_schema()
+
+@lru_cache(maxsize=None)
+def cached_schema_json(model_cls) -> str:
+    return json.dumps(cached_schema(model_cls), sort_keys=True, ensure_ascii=False)
@@ -0,0 +1,186 @@
+import os
+import re
+import json
+import difflib
+import logging
+import threading
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Any, List, Tuple
+import metrics
+
+logger = logging.getLogger("agentic_chatbot.places")
+
+AIRPORTS_PATH = os.getenv("AIRPORTS_PATH", "data/airports.json")
+# Minimum difflib ratio for a trigram candidate to count as a misspelling of a known name.
+PLACE_FUZZY_RATIO = float(os.getenv("PLACE_FUZZY_RATIO", "0.8"))
+FUZZY_CANDIDATES = 8
+RESOLVE_CACHE_SIZE = 4096
+
+# Words that do not change which place is meant: "Dubai Intl" is Dubai.
+_GENERIC = {"international", "intl", "int", "airport", "airports", "apt", "arpt", "aeroport", "aeropuerto"}
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+# (metro id, airport id); airport 0 means "any airport of the metro".
+Place = Tuple[int, int]
+
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode("ascii").lower()
+    return " ".join(w for w in _NON_ALNUM.sub(" ", text).split() if w not in _GENERIC)
+
+
+def _trigrams(name: str) -> set:
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class PlaceIndex:
+    """Alias index over metro areas and their airports, with integer ids.
+
+    Built once from the bundled IATA/city table (AIRPORTS_PATH). Place names met
+    in the flight data that the table does not know are interned as new metros
+    on first sight. Lookups accept IATA airport and city codes ("NRT", "TYO"),
+    airport names ("Haneda", "Tokyo Haneda"), city names and aliases in any case
+    or accent ("Zürich", "dubai intl"), and misspellings of names ("Tokio"),
+    which are found through a trigram index and confirmed with difflib when
+    the lengths differ by at most a letter per five.
+    """
+
+    def __init__(self, path: str = AIRPORTS_PATH):
+        self.cities: List[str] = [""]  # metro id -> canonical city name (0 is "no place")
+        self.airports: List[str] = [""]  # airport id -> IATA code
+        self.city_names: List[str] = []  # table city names and their spelled-out aliases, for text matching
+        self._aliases: Dict[str, Place] = {}
+        self._trigram_index: Dict[str, set] = defaultdict(set)
+        self._resolved: Dict[str, Place | None] = {}
+        self._lock = threading.RLock()
+        self._load(path)
+
+    def _load(self, path: str):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                metros = json.load(f).get("metros") or []
+        except FileNotFoundError:
+            logger.warning("Airport table %s not found; place matching uses flight data names only.", path)
+            metros = []
+        airport_rows = []
+        for m in metros:
+            metro = self.intern(m["city"])
+            for name in [m.get("code")] + list(m.get("aliases") or []):
+                self._add(name, (metro, 0))
+            # Codes and two-letter aliases ("LA", "KL") are too ambiguous to spot in free text.
+            self.city_names += [m["city"]] + [a for a in m.get("aliases") or [] if len(a) > 2 and not a.isupper()]
+            airport_rows += [(metro, m["city"], a) for a in m.get("airports") or []]
+        # Airports after every metro, so a code or name shared with a city ("Dubai International") keeps
+        # meaning the whole city, while codes of single-airport cities still resolve to the airport.
+        for metro, city, a in airport_rows:
+            self.airports.append(a["iata"].upper())
+            place = (metro, len(self.airports) - 1)
+            self._add(a["iata"], place, replace=True)
+            for name in (a.get("name"), f"{city} {a.get('name') or ''}"):
+                self._add(name, place)
+        logger.info("Place index: %d metros, %d airports, %d aliases.", len(self.cities) - 1, len(self.airports) - 1,
+                    len(self._aliases))
+
+    def _add(self, name: str | None, place: Place, replace: bool = False):
+        key = normalize(name or "")
+        if not key or (key in self._aliases and not replace):
+            return
+        self._aliases[key] = place
+        if len(key) > 3:  # codes are never fuzzy-matched
+            for g in _trigrams(key):
+                self._trigram_index[g].add(key)
+
+    def intern(self, name: str) -> int:
+        """Metro id for a city name, registering it as a new metro when unknown."""
+        key = normalize(name)
+        if not key:
+            return 0
+        with self._lock:
+            place = self._aliases.get(key)
+            if place is not None:
+                return place[0]
+            self.cities.append(name.strip())
+            metro = len(self.cities) - 1
+            self._add(key, (metro, 0))
+            self._resolved.pop(key, None)
+            return metro
+
+    def _fuzzy(self, key: str) -> Place | None:
+        grams = _trigrams(key)
+        shared: Dict[str, int] = defaultdict(int)
+        for g in grams:
+            for name in self._trigram_index.get(g, ()):
+                shared[name] += 1
+        if not shared:
+            return None
+        ranked = sorted(shared, key=lambda n: (-2 * shared[n] / (len(grams) + len(_trigrams(n))), n))
+        best, best_ratio = None, PLACE_FUZZY_RATIO
+        for name in ranked[:FUZZY_CANDIDATES]:
+            # A dropped or added letter or two is a typo; more is a different place ("Bern" is not "Berlin").
+            if abs(len(name) - len(key)) > max(1, len(key) // 5):
+                continue
+            ratio = difflib.SequenceMatcher(None, key, name).ratio()
+            if ratio >= best_ratio and (best is None or ratio > best_ratio):
+                best, best_ratio = name, ratio
+        return self._aliases[best] if best else None
+
+    def _partial(self, key: str) -> Place | None:
+        """Longest known name inside a longer string ("tokyo hnd", "dubai terminal 3"), airports first."""
+        words = key.split()
+        for n in range(len(words) - 1, 0, -1):
+            found = [self._aliases[k] for k in (" ".join(words[i:i + n]) for i in range(len(words) - n + 1))
+                     if k in self._aliases]
+            if found:
+                return max(found, key=lambda p: p[1] > 0)
+        return None
+
+    def resolve(self, text: str | None, fuzzy: bool = True) -> Place | None:
+        """(metro id, airport id) for a place string, or None when nothing matches closely enough."""
+        key = normalize(text or "")
+        if not key:
+            return None
+        place = self._aliases.get(key) or self._partial(key)
+        if place is not None or not fuzzy:
+            return place
+        if key in self._resolved:
+            return self._resolved[key]
+        with self._lock:
+            place = self._fuzzy(key)
+            metrics.incr("places.fuzzy_hit" if place else "places.unresolved")
+            if len(self._resolved) >= RESOLVE_CACHE_SIZE:
+                self._resolved.clear()
+            self._resolved[key] = place
+        if place:
+            logger.info("Resolved place %r to %s by spelling similarity.", text, self.describe(place))
+        return place
+
+    def describe(self, place: Place) -> str:
+        metro, airport = place
+        return f"{self.cities[metro]} ({self.airports[airport]})" if airport else self.cities[metro]
+
+    def canonical(self, text: str | None) -> str | None:
+        """Canonical city name for a place string (an airport resolves to its city)."""
+        place = self.resolve(text)
+        return self.cities[place[0]] if place else None
+
+    def row_place(self, value: Any) -> Place:
+        """Place of a flight-store value; never fuzzy, and unknown names become new metros."""
+        if not isinstance(value, str) or not value.strip():
+            return (0, 0)
+        place = self.resolve(value, fuzzy=False)
+        return place if place is not None else (self.intern(value), 0)
+
+
+_index: PlaceIndex | None = None
+_index_lock = threading.Lock()
+
+
+def get_place_index() -> PlaceIndex:
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = PlaceIndex()
+    return _index
@@ -1,15 +1,81 @@
-import os, json, glob
-import faiss
+import os, re, json, glob, threading, hashlib
 import numpy as np
-from typing import List, Dict, Any, Tuple
-from sentence_transformers import SentenceTransformer
+from typing import List, Dict, Any, Tuple, TYPE_CHECKING
+import metrics
+
+# faiss and sentence-transformers are imported on first use: together they
+# account for most of the process start-up time (torch, CPU feature probing).
+if TYPE_CHECKING:
+    import faiss
+    from sentence_transformers import SentenceTransformer
 
 INDEX_DIR   = os.getenv("RAG_INDEX_DIR", "data/vectorstore")
 DOC_GLOB_RAW = os.getenv("RAG_DOC_GLOB", "data/**/*.md;data/**/*.txt")
 EMB_MODEL   = os.getenv("EMBEDDINGS_MODEL", "all-MiniLM-L6-v2")
+# "hash" swaps in a deterministic, offline embedder (benchmarks, CI); vectors are not semantic.
+EMB_PROVIDER = os.getenv("EMBEDDINGS_PROVIDER", "sentence-transformers").lower()
+EMB_DIM     = int(os.getenv("EMBEDDINGS_DIM", "384"))
 CHUNK_SIZE  = int(os.getenv("RAG_CHUNK_SIZE", "600"))
 CHUNK_OVERLAP = int(os.getenv("RAG_CHUNK_OVERLAP", "120"))
 TOP_K       = int(os.getenv("RAG_TOP_K", "5"))
+# Diversify the top-k with maximal marginal relevance over RAG_MMR_FETCH_K candidates;
+# lambda 1.0 is pure relevance, lower values push harder towards novelty.
+MMR_ENABLED = os.getenv("RAG_MMR", "1").lower() not in ("0", "false", "no")
+MMR_LAMBDA  = float(os.getenv("RAG_MMR_LAMBDA", "0.7"))
+MMR_FETCH_K = int(os.getenv("RAG_MMR_FETCH_K", "20"))
+# Chunks whose 64-bit SimHash is within this many bits of an already indexed
+# chunk are dropped at build time (negative disables).
+DEDUP_HAMMING = int(os.getenv("RAG_DEDUP_HAMMING", "3"))
+
+_model = None
+_model_lock = threading.Lock()
+_index_cache: Dict[str, Any] = {}
+_index_lock = threading.Lock()
+
+def _faiss():
+    import faiss
+    return faiss
+
+class HashEmbedder:
+    """Feature-hashing embedder with the slice of the SentenceTransformer API this module uses.
+
+    Each lower-cased word and word bigram is hashed (blake2b) to a bucket and a sign, so
+    texts sharing words get similar vectors; the output is stable across runs and machines.
+    """
+
+    def __init__(self, dim: int = EMB_DIM):
+        self.dim = dim
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def _features(self, text: str) -> List[str]:
+        words = _WORD.findall(text.lower())
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def encode(self, texts: List[str], normalize_embeddings: bool = False, show_progress_bar: bool = False) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype="float32")
+        for row, text in enumerate(texts):
+            for feat in self._features(text):
+                h = int.from_bytes(hashlib.blake2b(feat.encode("utf-8"), digest_size=8).digest(), "little")
+                out[row, h % self.dim] += 1.0 if (h >> 63) & 1 else -1.0
+        return _normalize_rows(out) if normalize_embeddings else out
+
+def _get_model() -> "SentenceTransformer":
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                if EMB_PROVIDER == "hash":
+                    _model = HashEmbedder()
+                else:
+                    from sentence_transformers import SentenceTransformer
+                    _model = SentenceTransformer(EMB_MODEL)
+    return _model
+
+def embed(texts: List[str]) -> np.ndarray:
+    emb = _get_model().encode(texts, normalize_embeddings=False, show_progress_bar=False)
+    return _normalize_rows(np.asarray(emb, dtype="float32"))
 
 def _ensure_dir(d: str):
     os.makedirs(d, exist_ok=True)
@@ -33,6 +99,66 @@ def _chunk_text(text: str, chunk_size: int, overlap: int) -> List[str]:
         i += step
     return chunks
 
+_WORD = re.compile(r"\w+")
+_BITS = np.uint64(1) << np.arange(64, dtype=np.uint64)
+
+def simhash(text: str, shingle: int = 3) -> int:
+    """64-bit SimHash over lower-cased word shingles; near-identical texts differ in few bits."""
+    words = _WORD.findall(text.lower())
+    grams = [" ".join(words[i:i + shingle]) for i in range(max(1, len(words) - shingle + 1))]
+    hashes = np.array([int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=8).digest(), "little")
+                       for g in grams], dtype=np.uint64)
+    votes = ((hashes[:, None] & _BITS) != 0).sum(axis=0) * 2 - len(hashes)
+    return int(_BITS[votes > 0].sum())
+
+def _hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+def _dedupe(docs: List[Dict[str, Any]], max_distance: int) -> List[Dict[str, Any]]:
+    """Keep the first of every group of chunks within max_distance bits of each other.
+
+    Signatures are split into max_distance + 1 bands (up to 16) and bucketed by each band,
+    so by pigeonhole any pair within max_distance bits shares a bucket and only those
+    candidates are compared.
+    """
+    bands = min(max_distance + 1, 16)
+    width = 64 // bands
+    buckets: Dict[Tuple[int, int], List[int]] = {}
+    kept: List[Dict[str, Any]] = []
+    for d in docs:
+        sig = d["simhash"] = simhash(d["chunk"])
+        keys = [(b, (sig >> (b * width)) & ((1 << width) - 1)) for b in range(bands)]
+        if any(_hamming(sig, kept[j]["simhash"]) <= max_distance for key in keys for j in buckets.get(key, ())):
+            continue
+        for key in keys:
+            buckets.setdefault(key, []).append(len(kept))
+        kept.append(d)
+    return kept
+
+def mmr(query_vec: np.ndarray, cand_vecs: np.ndarray, k: int, lam: float = MMR_LAMBDA) -> List[int]:
+    """Greedy maximal marginal relevance; returns positions into cand_vecs in pick order.
+
+    Vectors are L2-normalised, so dot products are cosine similarities. The pairwise
+    similarity matrix is computed once and the running max-similarity-to-selected is
+    updated with one vector op per pick.
+    """
+    n = cand_vecs.shape[0]
+    if n == 0 or k <= 0:
+        return []
+    relevance = cand_vecs @ query_vec
+    pairwise = cand_vecs @ cand_vecs.T
+    redundancy = np.zeros(n, dtype=relevance.dtype)
+    chosen = np.zeros(n, dtype=bool)
+    picks: List[int] = []
+    for _ in range(min(k, n)):
+        score = lam * relevance - (1.0 - lam) * redundancy
+        score[chosen] = -np.inf
+        i = int(np.argmax(score))
+        picks.append(i)
+        chosen[i] = True
+        redundancy = pairwise[:, i] if len(picks) == 1 else np.maximum(redundancy, pairwise[:, i])
+    return picks
+
 def _normalize_rows(x: np.ndarray) -> np.ndarray:
     norms = np.linalg.norm(x, axis=1, keepdims=True) + 1e-12
     return x / norms
@@ -63,16 +189,16 @@ def _paths() -> Dict[str, str]:
 def _save_index(index, metas: List[Dict[str, Any]], ids: List[str]):
     _ensure_dir(INDEX_DIR)
     p = _paths()
-    faiss.write_index(index, p["index"])
+    _faiss().write_index(index, p["index"])
     with open(p["metas"], "w", encoding="utf-8") as f:
         for m in metas:
             f.write(json.dumps(m, ensure_ascii=False) + "\n")
     with open(p["ids"], "w", encoding="utf-8") as f:
         f.write("\n".join(ids))
 
-def _load_index() -> Tuple[faiss.Index, List[Dict[str, Any]], List[str]]:
+def _load_index() -> Tuple["faiss.Index", List[Dict[str, Any]], List[str]]:
     p = _paths()
-    index = faiss.read_index(p["index"])
+    index = _faiss().read_index(p["index"])
     metas, ids = [], []
     with open(p["metas"], "r", encoding="utf-8") as f:
         for line in f:
@@ -81,22 +207,70 @@ def _load_index() -> Tuple[faiss.Index, List[Dict[str, Any]], List[str]]:
         ids = [ln.strip() for ln in f if ln.strip()]
     return index, metas, ids
 
+def _index_mtime() -> float:
+    p = _paths()
+    return max(os.path.getmtime(p[k]) for k in ("index", "metas", "ids"))
+
+def _get_index() -> Tuple["faiss.Index", List[Dict[str, Any]], List[str]]:
+    mtime = _index_mtime()
+    cached = _index_cache.get("entry")
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with _index_lock:
+        cached = _index_cache.get("entry")
+        if not cached or cached[0] != mtime:
+            _index_cache["entry"] = (mtime, _load_index())
+        return _index_cache["entry"][1]
+
+def chunk_fingerprints() -> Dict[str, str]:
+    """Map chunk id -> content hash for the current index; changes whenever a rebuild alters a chunk."""
+    mtime = _index_mtime()
+    cached = _index_cache.get("fingerprints")
+    if cached and cached[0] == mtime:
+        return cached[1]
+    _, metas, _ = _get_index()
+    fps = {m.get("id"): hashlib.sha1((m.get("chunk") or "").encode("utf-8")).hexdigest() for m in metas}
+    _index_cache["fingerprints"] = (mtime, fps)
+    return fps
+
+def _index_vectors() -> np.ndarray:
+    """All stored (normalised) embeddings as one matrix, reconstructed from the flat index once per build."""
+    mtime = _index_mtime()
+    cached = _index_cache.get("vectors")
+    if cached and cached[0] == mtime:
+        return cached[1]
+    index, _, _ = _get_index()
+    vecs = index.reconstruct_n(0, index.ntotal) if index.ntotal else np.zeros((0, index.d), dtype="float32")
+    _index_cache["vectors"] = (mtime, vecs)
+    return vecs
+
+def is_resident() -> bool:
+    return _model is not None and "entry" in _index_cache
+
+def warm_up() -> Dict[str, Any]:
+    """Load the embedding model and FAISS index up front so the first search doesn't pay for them."""
+    if not index_exists():
+        build_index(force_rebuild=False)
+    index, metas, _ = _get_index()
+    embed(["warm up"])
+    return {"model": "hash" if EMB_PROVIDER == "hash" else EMB_MODEL, "chunks": len(metas), "vectors": index.ntotal}
+
 def index_exists() -> bool:
     p = _paths()
     return os.path.exists(p["index"]) and os.path.exists(p["metas"]) and os.path.exists(p["ids"])
 
-def build_index(force_rebuild: bool = False) -> Tuple[faiss.Index, List[Dict[str, Any]], List[str]]:
+def build_index(force_rebuild: bool = False) -> Tuple["faiss.Index", List[Dict[str, Any]], List[str]]:
     if index_exists() and not force_rebuild:
         return _load_index()
 
-    model = SentenceTransformer(EMB_MODEL)
+    model = _get_model()
     paths = _collect_files()
     if not paths:
         print(f"[RAG] No documents matched RAG_DOC_GLOB='{DOC_GLOB_RAW}'. "
               f"Try setting it to 'data/**/*.md' or similar.")
         # build empty index
         dim = model.get_sentence_embedding_dimension()
-        index = faiss.IndexFlatIP(dim)
+        index = _faiss().IndexFlatIP(dim)
         _save_index(index, [], [])
         return index, [], []
 
@@ -115,9 +289,15 @@ def build_index(force_rebuild: bool = False) -> Tuple[faiss.Index, List[Dict[str
                 "chunk": ch.strip()
             })
 
+    if DEDUP_HAMMING >= 0:
+        total = len(docs)
+        docs = _dedupe(docs, DEDUP_HAMMING)
+        if total != len(docs):
+            print(f"[RAG] Dropped {total - len(docs)} near-duplicate chunks (SimHash distance <= {DEDUP_HAMMING})")
+
     if not docs:
         dim = model.get_sentence_embedding_dimension()
-        index = faiss.IndexFlatIP(dim)
+        index = _faiss().IndexFlatIP(dim)
         _save_index(index, [], [])
         return index, [], []
 
@@ -127,7 +307,7 @@ def build_index(force_rebuild: bool = False) -> Tuple[faiss.Index, List[Dict[str
     emb = _normalize_rows(emb)
 
     dim = emb.shape[1]
-    index = faiss.IndexFlatIP(dim)  # exact cosine via inner product on normalized vectors
+    index = _faiss().IndexFlatIP(dim)  # exact cosine via inner product on normalized vectors
     index.add(emb)
 
     _save_index(index, docs, [d["id"] for d in docs])
@@ -138,17 +318,23 @@ def search(query: str, k: int = TOP_K) -> List[Dict[str, Any]]:
     if not index_exists():
         build_index(force_rebuild=False)
 
-    index, metas, ids = _load_index()
-    model = SentenceTransformer(EMB_MODEL)
+    index, metas, ids = _get_index()
+    with metrics.span("rag.embed"):
+        q = embed([query])
 
-    q = model.encode([query], normalize_embeddings=False)
-    q = np.asarray(q, dtype="float32")
-    q = _normalize_rows(q)
-
-    scores, idxs = index.search(q, k)  # shapes: (1,k)
+    fetch_k = max(k, MMR_FETCH_K) if MMR_ENABLED else k
+    with metrics.span("rag.faiss", k=fetch_k, ntotal=index.ntotal):
+        scores, idxs = index.search(q, fetch_k)  # shapes: (1,fetch_k)
     idxs = idxs[0].tolist()
     scores = scores[0].tolist()
 
+    pairs = [(i, sc) for i, sc in zip(idxs, scores) if 0 <= i < len(metas)]
+    if MMR_ENABLED and len(pairs) > k:
+        with metrics.span("rag.mmr", candidates=len(pairs), k=k):
+            cand = _index_vectors()[[i for i, _ in pairs]]
+            pairs = [pairs[j] for j in mmr(q[0], cand, k)]
+    idxs, scores = [i for i, _ in pairs], [sc for _, sc in pairs]
+
     out = []
     for rank, (i, sc) in enumerate(zip(idxs, scores), start=1):
         if i < 0 or i >= len(metas):
@@ -0,0 +1,237 @@
+"""
+Batch/offline evaluation of conversations through build_graph().
+
+    python scripts/batch_eval.py --input data/eval_conversations.jsonl --out runs/eval.jsonl --concurrency 8
+    python scripts/batch_eval.py --mock --latency-ms 100 --concurrency 16
+
+Input lines: {"id": "...", "turns": ["query", {"query": "...", "expected_intent": "..."}, ...]}
+(a single {"id": ..., "query": ...} is treated as a one-turn conversation).
+
+Each conversation gets its own memory; turns within a conversation run in
+order, conversations run in parallel. One JSONL result line is appended per
+finished conversation, so an interrupted run resumes by skipping ids that are
+already in --out.
+"""
+from pathlib import Path
+import sys
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, List, Tuple
+
+DEFAULT_INPUT = ROOT / "data" / "eval_conversations.jsonl"
+DEFAULT_OUTPUT = ROOT / "logs" / "batch_eval.jsonl"
+
+
+def load_conversations(path: str) -> List[Dict[str, Any]]:
+    out = []
+    with open(path, "r", encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            obj = json.loads(line)
+            turns = obj.get("turns") or [obj.get("query", "")]
+            turns = [t if isinstance(t, dict) else {"query": str(t)} for t in turns]
+            out.append({"id": str(obj.get("id", f"line-{n}")), "turns": turns})
+    return out
+
+
+def done_ids(path: str) -> set:
+    ids = set()
+    if not os.path.exists(path):
+        return ids
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                ids.add(json.loads(line)["id"])
+            except Exception:
+                continue  # torn last line from a crash; that conversation is re-run
+    return ids
+
+
+def run_turn(app, state: Dict[str, Any], turn: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    import metrics
+    from graph.pii import redact
+    query = turn["query"]
+    state["memory"].add_user(redact(query))
+    state["query"] = query
+    node_ms: Dict[str, float] = {}
+    error = None
+    with metrics.turn() as rec:
+        t0 = prev = time.perf_counter()
+        try:
+            for chunk in app.stream(state, stream_mode="updates"):
+                now = time.perf_counter()
+                for node, update in chunk.items():
+                    node_ms[node] = node_ms.get(node, 0.0) + (now - prev) * 1000.0
+                    if isinstance(update, dict):
+                        state = update
+                prev = now
+        except Exception as e:
+            error = repr(e)
+        total = (time.perf_counter() - t0) * 1000.0
+
+    result = {
+        "query": query,
+        "intent": state.get("intent"),
+        "agent": state.get("current_agent"),
+        "route_path": state.get("route_path"),
+        "blocked": state.get("blocked", False),
+        "response": state.get("response"),
+        "tool_calls": [
+            {k: e[k] for k in ("name", "args", "ok", "ms")} for e in rec.events if e["kind"] == "tool_call"
+        ],
+        "latency_ms": total,
+        "node_ms": node_ms,
+        "llm_calls": rec.counters.get("llm.calls", 0.0),
+        "prompt_tokens": rec.counters.get("llm.prompt_tokens", 0.0),
+        "completion_tokens": rec.counters.get("llm.completion_tokens", 0.0),
+        "error": error,
+    }
+    if turn.get("expected_intent"):
+        result["expected_intent"] = turn["expected_intent"]
+        result["intent_ok"] = state.get("intent") == turn["expected_intent"]
+    return result, state
+
+
+def run_conversation(app, conv: Dict[str, Any]) -> Dict[str, Any]:
+    from memory.memory import ConversationMemory
+    from logger_config import log_context
+    from graph.openai_client import llm_priority
+    state: Dict[str, Any] = {"messages": [], "memory": ConversationMemory()}
+    turns = []
+    t0 = time.perf_counter()
+    for n, turn in enumerate(conv["turns"], 1):
+        with log_context(request_id=f"{conv['id']}#{n}", session_id=conv["id"]), llm_priority("batch"):
+            result, out = run_turn(app, state, turn)
+        turns.append(result)
+        state = {**out, "memory": state["memory"]}
+    return {"id": conv["id"], "turns": turns, "total_ms": (time.perf_counter() - t0) * 1000.0}
+
+
+def summarize_run(records: List[Dict[str, Any]], wall_s: float) -> Dict[str, Any]:
+    from metrics import summarize
+    turns = [t for r in records for t in r["turns"]]
+    ok = [t for t in turns if not t["error"]]
+    graded = [t for t in turns if "intent_ok" in t]
+    n = max(1, len(ok))
+    return {
+        "conversations": len(records),
+        "turns": len(turns),
+        "errors": len(turns) - len(ok),
+        "wall_s": wall_s,
+        "conversations_per_sec": len(records) / wall_s if wall_s > 0 else 0.0,
+        "turns_per_sec": len(turns) / wall_s if wall_s > 0 else 0.0,
+        "turn_latency_ms": summarize([t["latency_ms"] for t in ok]),
+        "llm_calls_per_turn": sum(t["llm_calls"] for t in ok) / n,
+        "tokens_per_turn": sum(t["prompt_tokens"] + t["completion_tokens"] for t in ok) / n,
+        "tool_calls_per_turn": sum(len(t["tool_calls"]) for t in ok) / n,
+        "intent_accuracy": (sum(t["intent_ok"] for t in graded) / len(graded)) if graded else None,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Run JSONL conversations through the graph and write JSONL results.")
+    ap.add_argument("--input", default=str(DEFAULT_INPUT))
+    ap.add_argument("--out", default=str(DEFAULT_OUTPUT))
+    ap.add_argument("--concurrency", type=int, default=4)
+    ap.add_argument("--limit", type=int, default=0, help="Only run the first N pending conversations.")
+    ap.add_argument("--fresh", action="store_true", help="Truncate --out instead of resuming.")
+    ap.add_argument("--progress-every", type=int, default=25)
+    ap.add_argument("--mock", action="store_true", help="Start the local stub LLM server in-process.")
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="Stub LLM latency (with --mock).")
+    ap.add_argument("--base-url", default=None, help="OpenAI-compatible base URL (e.g. a running stub).")
+    ap.add_argument("--summary-json", default=None, help="Write the run summary as JSON to this path.")
+    args = ap.parse_args()
+    # Paths are relative to where the script was run from; the chdir below is for the repo's own data paths.
+    args.input, args.out = str(Path(args.input).resolve()), str(Path(args.out).resolve())
+    if args.summary_json:
+        args.summary_json = str(Path(args.summary_json).resolve())
+
+    os.chdir(ROOT)
+    if args.mock:
+        from scripts.mock_llm_server import start_in_thread
+        _, url = start_in_thread(latency_ms=args.latency_ms, jitter_ms=0.0)
+        os.environ["OPENAI_BASE_URL"] = url
+        os.environ.setdefault("OPENAI_API_KEY", "mock")
+    elif args.base_url:
+        os.environ["OPENAI_BASE_URL"] = args.base_url
+        os.environ.setdefault("OPENAI_API_KEY", "mock")
+
+    from logger_config import setup_logger
+    setup_logger()
+    import logging
+    logging.getLogger().setLevel(logging.WARNING)
+
+    from graph.langgraph_app import build_graph
+    from helpers import load_flights
+    import rag_store
+
+    if args.fresh and os.path.exists(args.out):
+        os.remove(args.out)
+    finished = done_ids(args.out)
+    pending = [c for c in load_conversations(args.input) if c["id"] not in finished]
+    if args.limit:
+        pending = pending[:args.limit]
+    print(f"{len(finished)} conversation(s) already in {args.out}; {len(pending)} to run.")
+    if not pending:
+        return
+
+    # Load the shared resources once, before the workers start.
+    t0 = time.perf_counter()
+    app = build_graph()
+    load_flights()
+    try:
+        rag_store.search("warm up", k=1)
+    except Exception as e:
+        print(f"retriever warm-up failed: {e!r}")
+    print(f"graph, flight store and retriever ready in {time.perf_counter() - t0:.1f}s")
+
+    if os.path.dirname(args.out):
+        os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    if os.path.exists(args.out) and os.path.getsize(args.out):
+        with open(args.out, "rb+") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")  # terminate a torn line so the next record starts cleanly
+    records: List[Dict[str, Any]] = []
+    write_lock = threading.Lock()
+    t0 = time.perf_counter()
+    with open(args.out, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = [pool.submit(run_conversation, app, c) for c in pending]
+        for fut in as_completed(futures):
+            rec = fut.result()
+            with write_lock:
+                out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                out.flush()
+                records.append(rec)
+            if args.progress_every and len(records) % args.progress_every == 0:
+                elapsed = time.perf_counter() - t0
+                print(f"  {len(records)}/{len(pending)} conversations, {len(records) / elapsed:.2f} conv/s")
+    wall = time.perf_counter() - t0
+
+    rep = summarize_run(records, wall)
+    s = rep["turn_latency_ms"]
+    print(f"conversations={rep['conversations']} turns={rep['turns']} errors={rep['errors']} wall={wall:.1f}s")
+    print(f"throughput: {rep['conversations_per_sec']:.2f} conv/s, {rep['turns_per_sec']:.2f} turns/s")
+    print(f"turn latency ms: p50={s['p50']:.0f} p95={s['p95']:.0f} p99={s['p99']:.0f}")
+    print(f"per turn: llm_calls={rep['llm_calls_per_turn']:.2f} tokens={rep['tokens_per_turn']:.0f} "
+          f"tool_calls={rep['tool_calls_per_turn']:.2f}")
+    if rep["intent_accuracy"] is not None:
+        print(f"intent accuracy: {rep['intent_accuracy']:.1%}")
+    if args.summary_json:
+        with open(args.summary_json, "w", encoding="utf-8") as f:
+            json.dump(rep, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
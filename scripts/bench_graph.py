@@ -0,0 +1,217 @@
+"""
+End-to-end latency/throughput benchmark for build_graph().
+
+    python scripts/bench_graph.py --mock --latency-ms 200 --concurrency 8 --turns 200
+    python scripts/bench_graph.py --base-url http://127.0.0.1:8765/v1 --mode async
+
+Reports per-node and end-to-end p50/p95/p99, turns/sec, LLM round trips per
+turn and tokens per turn.
+"""
+from pathlib import Path
+import sys
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List
+
+DEFAULT_QUERIES = ROOT / "data" / "bench_queries.jsonl"
+
+
+def load_queries(path: str) -> List[str]:
+    out = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            obj = json.loads(line)
+            out.append(obj["query"] if isinstance(obj, dict) else str(obj))
+    return out
+
+
+def _new_state(query: str) -> Dict[str, Any]:
+    from memory.memory import ConversationMemory
+    mem = ConversationMemory()
+    mem.add_user(query)
+    return {"query": query, "memory": mem}
+
+
+def _turn_result(rec, node_ms: Dict[str, float], total_ms: float, error: str | None = None) -> Dict[str, Any]:
+    return {
+        "total_ms": total_ms,
+        "node_ms": node_ms,
+        "llm_calls": rec.counters.get("llm.calls", 0.0),
+        "tokens": rec.counters.get("llm.prompt_tokens", 0.0) + rec.counters.get("llm.completion_tokens", 0.0),
+        "error": error,
+    }
+
+
+def run_turn_sync(app, query: str) -> Dict[str, Any]:
+    import metrics
+    node_ms: Dict[str, float] = {}
+    error = None
+    with metrics.turn() as rec:
+        t0 = prev = time.perf_counter()
+        try:
+            for chunk in app.stream(_new_state(query), stream_mode="updates"):
+                now = time.perf_counter()
+                for node in chunk:
+                    node_ms[node] = node_ms.get(node, 0.0) + (now - prev) * 1000.0
+                prev = now
+        except Exception as e:
+            error = repr(e)
+        total = (time.perf_counter() - t0) * 1000.0
+    return _turn_result(rec, node_ms, total, error)
+
+
+async def run_turn_async(app, query: str) -> Dict[str, Any]:
+    import metrics
+    node_ms: Dict[str, float] = {}
+    error = None
+    with metrics.turn() as rec:
+        t0 = prev = time.perf_counter()
+        try:
+            async for chunk in app.astream(_new_state(query), stream_mode="updates"):
+                now = time.perf_counter()
+                for node in chunk:
+                    node_ms[node] = node_ms.get(node, 0.0) + (now - prev) * 1000.0
+                prev = now
+        except Exception as e:
+            error = repr(e)
+        total = (time.perf_counter() - t0) * 1000.0
+    return _turn_result(rec, node_ms, total, error)
+
+
+def run_sync(app, queries: List[str], concurrency: int) -> List[Dict[str, Any]]:
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(lambda q: run_turn_sync(app, q), queries))
+
+
+async def run_async(app, queries: List[str], concurrency: int) -> List[Dict[str, Any]]:
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(q: str):
+        async with sem:
+            return await run_turn_async(app, q)
+
+    return await asyncio.gather(*(one(q) for q in queries))
+
+
+def report(results: List[Dict[str, Any]], wall_s: float) -> Dict[str, Any]:
+    from metrics import summarize
+    ok = [r for r in results if not r["error"]]
+    nodes: Dict[str, List[float]] = {}
+    for r in ok:
+        for n, ms in r["node_ms"].items():
+            nodes.setdefault(n, []).append(ms)
+    n = max(1, len(ok))
+    return {
+        "turns": len(results),
+        "errors": len(results) - len(ok),
+        "wall_s": wall_s,
+        "turns_per_sec": len(ok) / wall_s if wall_s > 0 else 0.0,
+        "end_to_end_ms": summarize([r["total_ms"] for r in ok]),
+        "nodes_ms": {k: summarize(v) for k, v in sorted(nodes.items())},
+        "llm_round_trips_per_turn": sum(r["llm_calls"] for r in ok) / n,
+        "tokens_per_turn": sum(r["tokens"] for r in ok) / n,
+        "sample_errors": sorted({r["error"] for r in results if r["error"]})[:5],
+    }
+
+
+def _print_report(rep: Dict[str, Any]):
+    def row(name: str, s: Dict[str, float]):
+        print(f"  {name:<12} p50={s['p50']:8.1f}  p95={s['p95']:8.1f}  p99={s['p99']:8.1f}  (n={s['count']})")
+
+    print(f"turns={rep['turns']} errors={rep['errors']} wall={rep['wall_s']:.2f}s turns/sec={rep['turns_per_sec']:.2f}")
+    print(f"LLM round trips/turn={rep['llm_round_trips_per_turn']:.2f} tokens/turn={rep['tokens_per_turn']:.1f}")
+    print("latency (ms):")
+    row("end_to_end", rep["end_to_end_ms"])
+    for name, s in rep["nodes_ms"].items():
+        row(name, s)
+    timings = rep.get("metrics", {}).get("timings", {})
+    for key in ("prompt.render_ms", "prompt.prefix_stable_ratio", "llm.queue_wait_ms", "tool.output_tokens_raw",
+                "tool.output_tokens"):
+        if key in timings:
+            s = timings[key]
+            print(f"{key}: p50={s['p50']:.3f} p95={s['p95']:.3f} mean={s['mean']:.3f} (n={s['count']})")
+    counters = rep.get("metrics", {}).get("counters", {})
+    if counters.get("llm.throttled") or counters.get("llm.rate_limited"):
+        print(f"LLM scheduler: throttled={counters.get('llm.throttled', 0):g} provider_429s={counters.get('llm.rate_limited', 0):g}")
+    spans = rep.get("metrics", {}).get("histograms", {})
+    if spans:
+        print("spans (mean ms per occurrence, count):")
+        for name, h in sorted(spans.items()):
+            if name.endswith("_ms") and h["count"]:
+                print(f"  {name[:-3]:<24} {h['sum'] / h['count']:8.1f}  (n={h['count']:g})")
+    for e in rep["sample_errors"]:
+        print(f"  error: {e}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark build_graph().invoke end to end.")
+    ap.add_argument("--queries", default=str(DEFAULT_QUERIES), help="JSONL file with {\"query\": ...} lines.")
+    ap.add_argument("--turns", type=int, default=0, help="Total turns to run (corpus is repeated); default = corpus size.")
+    ap.add_argument("--concurrency", type=int, default=1)
+    ap.add_argument("--mode", choices=["sync", "async"], default="sync")
+    ap.add_argument("--warmup", type=int, default=2, help="Turns run before measuring.")
+    ap.add_argument("--mock", action="store_true", help="Start the local stub LLM server in-process.")
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="Stub LLM latency (with --mock).")
+    ap.add_argument("--jitter-ms", type=float, default=0.0, help="Stub LLM jitter (with --mock).")
+    ap.add_argument("--stub-rpm", type=int, default=0, help="Stub answers 429 beyond this many calls per minute (with --mock).")
+    ap.add_argument("--base-url", default=None, help="OpenAI-compatible base URL (e.g. a running stub).")
+    ap.add_argument("--json", default=None, help="Write the report as JSON to this path.")
+    args = ap.parse_args()
+
+    os.chdir(ROOT)
+    if args.mock:
+        from scripts.mock_llm_server import start_in_thread
+        _, url = start_in_thread(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, rpm=args.stub_rpm)
+        os.environ["OPENAI_BASE_URL"] = url
+        os.environ.setdefault("OPENAI_API_KEY", "mock")
+    elif args.base_url:
+        os.environ["OPENAI_BASE_URL"] = args.base_url
+        os.environ.setdefault("OPENAI_API_KEY", "mock")
+
+    from logger_config import setup_logger
+    setup_logger()
+    import logging
+    logging.getLogger().setLevel(logging.WARNING)
+
+    from graph.langgraph_app import build_graph
+    import metrics
+
+    app = build_graph()
+    corpus = load_queries(args.queries)
+    total = args.turns or len(corpus)
+    queries = [corpus[i % len(corpus)] for i in range(total)]
+
+    for q in corpus[:args.warmup]:
+        run_turn_sync(app, q)
+    metrics.reset()
+
+    t0 = time.perf_counter()
+    if args.mode == "async":
+        results = asyncio.run(run_async(app, queries, args.concurrency))
+    else:
+        results = run_sync(app, queries, args.concurrency)
+    wall = time.perf_counter() - t0
+
+    rep = report(results, wall)
+    rep["metrics"] = metrics.snapshot()
+    rep.update({"mode": args.mode, "concurrency": args.concurrency, "stub_latency_ms": args.latency_ms if args.mock else None})
+    _print_report(rep)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rep, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
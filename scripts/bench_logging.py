@@ -0,0 +1,126 @@
+"""
+Per-turn logging overhead on the request thread: legacy vs queue-backed setup.
+
+    python scripts/bench_logging.py --turns 2000
+
+"legacy" reproduces the old setup: synchronous FileHandler + StreamHandler on
+the root logger with eagerly built f-strings. "queued" uses
+logger_config.setup_logger(): a QueueHandler on the request thread, with
+formatting, JSON encoding, rotation and I/O done by the QueueListener.
+Console output goes to os.devnull in both modes so the terminal speed
+doesn't skew the numbers.
+"""
+from pathlib import Path
+import sys
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Dict, Any, List
+
+import metrics
+
+TOOL_ARGS = json.dumps({"criteria_json": json.dumps({"origin": "Dubai", "destination": "Tokyo", "month_hint": "August",
+                                                      "notes": "x" * 1500})})
+
+
+def turn_legacy(log: logging.Logger):
+    # Mirrors the hot-path log lines of one flight turn before the change.
+    log.info(f"Guardrail check complete. blocked={False}")
+    log.info("Routing to primary node.")
+    log.info(f"Primary fast-path intent: {'schedule_search'} (confidence={0.95}, source={'rules'})")
+    log.info(f"Primary routing decided: {'schedule_search'} (path={'fast'})")
+    log.info("Routing to flight node.")
+    log.info(f"Starting CC tool loop with {1} tools; max_rounds={4}")
+    for round_idx in (1, 2):
+        log.info(f"CC Round {round_idx} -> calling model with {2 + 2 * round_idx} messages")
+    log.info(f"Model issued {1} tool call(s)")
+    log.info(f"Executing tool '{'flight_filter'}' with args: {TOOL_ARGS[:200]}")
+    log.info(f"Tool '{'flight_filter'}' ok; output length={len(TOOL_ARGS)}")
+    log.info("Assistant produced final text (no further tool calls).")
+    log.info(f"Flight Agent response composed ({3} itineraries).")
+
+
+def turn_lazy(log: logging.Logger):
+    log.info("Guardrail check complete. blocked=%s", False)
+    log.info("Routing to primary node.")
+    log.info("Primary fast-path intent: %s (confidence=%s, source=%s)", "schedule_search", 0.95, "rules")
+    log.info("Primary routing decided: %s (path=%s)", "schedule_search", "fast")
+    log.info("Routing to flight node.")
+    log.info("Starting CC tool loop with %d tools; max_rounds=%d", 1, 4)
+    for round_idx in (1, 2):
+        log.info("CC Round %d -> calling model with %d messages", round_idx, 2 + 2 * round_idx)
+    log.info("Model issued %d tool call(s)", 1)
+    log.info("Executing tool '%s' with args: %.200s", "flight_filter", TOOL_ARGS)
+    log.info("Tool '%s' ok; output length=%d", "flight_filter", len(TOOL_ARGS))
+    log.info("Assistant produced final text (no further tool calls).")
+    log.info("Flight Agent response composed (%d itineraries).", 3)
+
+
+def measure(fn, log: logging.Logger, turns: int, gap_s: float) -> List[float]:
+    out = []
+    for _ in range(turns):
+        t0 = time.perf_counter()
+        fn(log)
+        out.append((time.perf_counter() - t0) * 1e6)
+        if gap_s:
+            time.sleep(gap_s)  # stands in for the LLM wait between turns
+    return out
+
+
+def reset_root():
+    root = logging.getLogger()
+    for h in list(root.handlers):
+        root.removeHandler(h)
+        h.close()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--turns", type=int, default=2000)
+    ap.add_argument("--gap-ms", type=float, default=2.0, help="Idle time between turns (0 = back-to-back).")
+    ap.add_argument("--json", default=None, help="Write results as JSON to this path.")
+    args = ap.parse_args()
+
+    devnull = open(os.devnull, "w")
+    log = logging.getLogger("agentic_chatbot.bench")
+    results: Dict[str, Any] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        reset_root()
+        fh = logging.FileHandler(os.path.join(tmp, "legacy.log"), encoding="utf-8")
+        sh = logging.StreamHandler(devnull)
+        fmt = logging.Formatter("%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+        for h in (fh, sh):
+            h.setFormatter(fmt)
+            logging.getLogger().addHandler(h)
+        logging.getLogger().setLevel(logging.INFO)
+        results["legacy"] = metrics.summarize(measure(turn_legacy, log, args.turns, args.gap_ms / 1000.0))
+        reset_root()
+
+        import logger_config
+        logger_config.setup_logger(log_dir=os.path.join(tmp, "queued"), stream=devnull)
+        results["queued"] = metrics.summarize(measure(turn_lazy, log, args.turns, args.gap_ms / 1000.0))
+        t0 = time.perf_counter()
+        logger_config.shutdown_logging()
+        results["queued_drain_ms"] = (time.perf_counter() - t0) * 1000.0
+        reset_root()
+
+    print(f"request-thread logging cost per turn (µs, {args.turns} turns, 13 records/turn, gap={args.gap_ms}ms)")
+    for mode in ("legacy", "queued"):
+        s = results[mode]
+        print(f"  {mode:<7} mean={s['mean']:7.1f}  p50={s['p50']:7.1f}  p95={s['p95']:7.1f}  p99={s['p99']:7.1f}")
+    print(f"  background writer drained the queue {results['queued_drain_ms']:.0f} ms after the last turn")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+Microbenchmarks for the data-path hot spots, on synthetic data.
+
+    python scripts/bench_micro.py --rows 10000,100000 --docs 200 --json bench/micro.json
+    python scripts/bench_micro.py --json new.json --compare bench/micro.json --threshold 1.25
+
+Covers helpers.filter_flights / load_flights, rag_store._chunk_text /
+build_index / search (with EMBEDDINGS_PROVIDER=hash, so no model download),
+agents.base.extract_first_json_block, the flight_filter input parsing in
+tools.tools and the tool-output compaction in tools.budget (with token sizes
+before and after). Groups whose dependencies are not installed are reported as
+skipped. --compare matches cases by name and parameters and exits non-zero
+when any case is slower than --threshold times the baseline.
+"""
+from pathlib import Path
+import sys
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+
+from scripts.synthetic_data import flights, write_flights, policy_corpus, write_corpus
+
+FLIGHT_CRITERIA = {
+    "route": {"origin": "Dubai", "destination": "Tokyo"},
+    "route_month": {"origin": "Dubai", "destination": "Tokyo", "month_hint": "August"},
+    "full": {"origin": "Dubai", "destination": "Tokyo", "month_hint": "Aug", "alliance": "Star Alliance",
+             "max_price_usd": 1500, "non_stop_only": True, "refundable_only": True},
+    "price_only": {"max_price_usd": 800},
+}
+
+SEARCH_QUERIES = ["do I need a transit visa for Tokyo", "refund for a cancelled refundable fare",
+                  "baggage allowance on the Doha segment", "passport rules at check-in"]
+
+JSON_CASES = {
+    "clean": '{"intent": "schedule_search", "criteria": {"origin": "Dubai"}, "itineraries": [], "summary": "ok"}',
+    "fenced": '```json\n{"intent": "policy_answer", "response": "You need a visa.", "sources": []}\n```',
+    "prose": 'Sure! Here is the answer:\n{"intent": "policy_answer", "response": "Yes", "confidence": 0.8}\nHope it helps.',
+    "large": json.dumps({"intent": "schedule_search", "criteria": {}, "summary": "x",
+                         "itineraries": flights(200, seed=3)}),
+}
+
+CRITERIA_INPUTS = {
+    "raw": json.dumps(FLIGHT_CRITERIA["full"]),
+    "wrapped": json.dumps({"criteria_json": json.dumps(FLIGHT_CRITERIA["full"])}),
+    "invalid": "flights from dubai to tokyo please",
+}
+
+
+class Suite:
+    def __init__(self, repeat: int, min_time_s: float):
+        self.repeat = repeat
+        self.min_time_s = min_time_s
+        self.results: List[Dict[str, Any]] = []
+
+    def bench(self, name: str, fn: Callable[[], Any], number: int | None = None, **params):
+        """Best and median per-call time over `repeat` runs of `number` calls (auto-sized when None)."""
+        if number is None:
+            number = 1
+            while True:
+                t0 = time.perf_counter()
+                for _ in range(number):
+                    fn()
+                if time.perf_counter() - t0 >= self.min_time_s or number >= 1 << 20:
+                    break
+                number *= 4
+        runs = []
+        for _ in range(self.repeat):
+            t0 = time.perf_counter()
+            for _ in range(number):
+                fn()
+            runs.append((time.perf_counter() - t0) / number)
+        row = {"name": name, "params": params, "ms_per_op": min(runs) * 1000.0,
+               "median_ms": statistics.median(runs) * 1000.0, "number": number, "repeat": self.repeat}
+        if "rows" in params:
+            row["rows_per_s"] = params["rows"] / min(runs)
+        if "bytes" in params:
+            row["mb_per_s"] = params["bytes"] / min(runs) / 1e6
+        self.results.append(row)
+        print(f"  {name:<28} {json.dumps(params):<60} {row['ms_per_op']:>11.4f} ms  (median {row['median_ms']:.4f})")
+        return row
+
+    def skip(self, group: str, err: BaseException):
+        self.results.append({"name": group, "skipped": f"{type(err).__name__}: {err}"})
+        print(f"  {group:<28} skipped ({type(err).__name__}: {err})")
+
+
+def bench_flights(suite: Suite, rows_list: List[int], tmp: str):
+    import helpers
+    print("helpers.filter_flights / load_flights")
+    for rows in rows_list:
+        inventory = flights(rows)
+        for label, criteria in FLIGHT_CRITERIA.items():
+            suite.bench("filter_flights", lambda: helpers.filter_flights(inventory, criteria),
+                        number=1 if rows >= 100000 else None, rows=rows, criteria=label)
+        del inventory
+        path = write_flights(os.path.join(tmp, f"flights_{rows}.json"), rows)
+
+        def cold():
+            helpers._flights_cache.clear()
+            helpers.load_flights(path)
+        suite.bench("load_flights.cold", cold, number=1, rows=rows, bytes=os.path.getsize(path))
+        suite.bench("load_flights.warm", lambda: helpers.load_flights(path), rows=rows)
+        helpers._flights_cache.clear()
+
+
+def bench_rag(suite: Suite, docs: int, tmp: str):
+    corpus_dir = os.path.join(tmp, "corpus")
+    write_corpus(corpus_dir, docs)
+    os.environ["EMBEDDINGS_PROVIDER"] = "hash"
+    os.environ["RAG_INDEX_DIR"] = os.path.join(tmp, "vectorstore")
+    os.environ["RAG_DOC_GLOB"] = os.path.join(corpus_dir, "*.md")
+    import rag_store
+    print("rag_store")
+    text = "\n\n".join(policy_corpus(docs))
+    suite.bench("_chunk_text", lambda: rag_store._chunk_text(text, rag_store.CHUNK_SIZE, rag_store.CHUNK_OVERLAP),
+                docs=docs, bytes=len(text.encode("utf-8")))
+
+    def build():
+        with contextlib.redirect_stdout(io.StringIO()):
+            rag_store.build_index(force_rebuild=True)
+    suite.bench("build_index", build, number=1, docs=docs, embedder="hash")
+    _, metas, _ = rag_store._get_index()
+    for mmr in (False, True):
+        rag_store.MMR_ENABLED = mmr
+        for k in (3, 5):
+            suite.bench("search", lambda: [rag_store.search(q, k=k) for q in SEARCH_QUERIES],
+                        docs=docs, chunks=len(metas), k=k, mmr=mmr, queries=len(SEARCH_QUERIES))
+
+
+def bench_json(suite: Suite):
+    from agents.base import extract_first_json_block
+    print("agents.base.extract_first_json_block")
+    for label, text in JSON_CASES.items():
+        suite.bench("extract_first_json_block", lambda: extract_first_json_block(text), case=label, chars=len(text))
+
+
+def bench_tool_input(suite: Suite):
+    from tools.tools import _maybe_json, _parse_criteria
+    print("tools.tools flight_filter input parsing")
+    for label, text in CRITERIA_INPUTS.items():
+        suite.bench("_maybe_json", lambda: _maybe_json(text), case=label)
+        suite.bench("_parse_criteria", lambda: _parse_criteria(text), case=label)
+
+
+def bench_tool_output(suite: Suite):
+    from tokens import count_tokens
+    from tools.budget import budget_tool_output
+    print("tools.budget tool-output compaction")
+    cases = {f"flight_filter.{n}": ("flight_filter", "{}", json.dumps(flights(n, seed=7))) for n in (5, 50, 500)}
+    hits = [{"rank": i + 1, "score": 0.5, "title": "Policy", "path": f"data/policy_{i}.md", "chunk": doc[:2400],
+             "id": f"policy_{i}.md#0"} for i, doc in enumerate(policy_corpus(5))]
+    cases["rag_search.5"] = ("rag_search", json.dumps({"question": SEARCH_QUERIES[0]}), json.dumps(hits))
+    for label, (name, args, text) in cases.items():
+        sent = budget_tool_output(name, args, text)
+        suite.bench("budget_tool_output", lambda: budget_tool_output(name, args, text), case=label,
+                    tokens_raw=count_tokens(text), tokens_sent=count_tokens(sent))
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str, threshold: float) -> int:
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        base = {(r["name"], json.dumps(r.get("params"), sort_keys=True)): r for r in json.load(f)["results"]}
+    regressions = 0
+    print(f"\nvs {baseline_path} (threshold x{threshold}):")
+    for r in results:
+        old = base.get((r["name"], json.dumps(r.get("params"), sort_keys=True)))
+        if "skipped" in r or old is None or "skipped" in old:
+            continue
+        ratio = r["ms_per_op"] / old["ms_per_op"] if old["ms_per_op"] else float("inf")
+        flag = "REGRESSION" if ratio > threshold else ""
+        regressions += bool(flag)
+        print(f"  {r['name']:<28} {json.dumps(r['params']):<60} x{ratio:6.2f} {flag}")
+    return regressions
+
+
+def _git_rev() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Microbenchmarks for flight filtering, RAG and JSON parsing.")
+    ap.add_argument("--rows", default="10000,100000", help="Flight inventory sizes, comma-separated (up to millions).")
+    ap.add_argument("--docs", type=int, default=100, help="Synthetic policy documents for the RAG cases.")
+    ap.add_argument("--only", default="flights,rag,json,tool_input,tool_output", help="Groups to run.")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--min-time", type=float, default=0.05, help="Seconds per repeat when auto-sizing the loop.")
+    ap.add_argument("--json", default=None, help="Write results as JSON to this path.")
+    ap.add_argument("--compare", default=None, help="Baseline JSON from an earlier run.")
+    ap.add_argument("--threshold", type=float, default=1.25, help="Slowdown ratio reported as a regression.")
+    args = ap.parse_args()
+
+    import logging
+    logging.getLogger("agentic_chatbot").setLevel(logging.WARNING)
+    suite = Suite(args.repeat, args.min_time)
+    groups = {
+        "flights": lambda tmp: bench_flights(suite, [int(x) for x in args.rows.split(",")], tmp),
+        "rag": lambda tmp: bench_rag(suite, args.docs, tmp),
+        "json": lambda tmp: bench_json(suite),
+        "tool_input": lambda tmp: bench_tool_input(suite),
+        "tool_output": lambda tmp: bench_tool_output(suite),
+    }
+    with tempfile.TemporaryDirectory(prefix="bench_micro_") as tmp:
+        for name in args.only.split(","):
+            try:
+                groups[name](tmp)
+            except ImportError as e:
+                suite.skip(name, e)
+
+    report = {
+        "meta": {"git": _git_rev(), "python": platform.python_version(), "platform": platform.platform(),
+                 "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "args": vars(args)},
+        "results": suite.results,
+    }
+    if args.json:
+        os.makedirs(os.path.dirname(args.json) or ".", exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        sys.exit(1 if compare(suite.results, args.compare, args.threshold) else 0)
+
+
+if __name__ == "__main__":
+    main()
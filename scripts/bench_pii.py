@@ -0,0 +1,87 @@
+"""
+Microbenchmark for the guardrail PII scanner (graph/pii.py).
+
+    python scripts/bench_pii.py --patterns 10,100,500,1000 --chars 20000
+
+Compares the Aho–Corasick keyword pass against the old per-term `in` checks
+as the term list grows, and times the full scan (keywords + number shapes +
+validators). Per-character cost of the automaton should stay flat.
+"""
+from pathlib import Path
+import sys
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import argparse
+import json
+import random
+import string
+import time
+from typing import Callable, Dict, Any, List
+
+from graph.pii import KeywordAutomaton, PiiScanner, SENSITIVE_TERMS
+
+FILLER = ("find me a flight from dubai to tokyo in august under 1000 dollars star alliance "
+          "do i need a visa for japan can i cancel a refundable ticket 48 hours before departure ")
+
+
+def synthetic_terms(n: int, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    terms = list(SENSITIVE_TERMS)
+    while len(terms) < n:
+        words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 9))) for _ in range(rng.randint(1, 3))]
+        terms.append(" ".join(words))
+    return terms[:n]
+
+
+def synthetic_text(chars: int) -> str:
+    base = FILLER + "my card is 4111 1111 1111 1111 and passport number X1234567 "
+    return (base * (chars // len(base) + 1))[:chars]
+
+
+def time_per_char(fn: Callable[[str], Any], text: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - t0)
+    return best * 1e9 / len(text)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--patterns", default="10,50,100,500,1000")
+    ap.add_argument("--chars", type=int, default=20000)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--json", default=None, help="Write results as JSON to this path.")
+    args = ap.parse_args()
+
+    text = synthetic_text(args.chars)
+    rows: List[Dict[str, Any]] = []
+    print(f"text={len(text)} chars; ns/char (best of {args.repeat})")
+    print(f"{'patterns':>9} {'automaton':>10} {'naive_in':>10} {'full_scan':>10} {'build_ms':>9}")
+    for n in [int(x) for x in args.patterns.split(",")]:
+        terms = synthetic_terms(n)
+        t0 = time.perf_counter()
+        automaton = KeywordAutomaton(terms)
+        build_ms = (time.perf_counter() - t0) * 1000.0
+        scanner = PiiScanner(terms)
+        row = {
+            "patterns": n,
+            "automaton_ns_per_char": time_per_char(lambda s: list(automaton.find(s)), text, args.repeat),
+            "naive_ns_per_char": time_per_char(lambda s: [t for t in terms if t in s.lower()], text, args.repeat),
+            "full_scan_ns_per_char": time_per_char(scanner.scan, text, args.repeat),
+            "build_ms": build_ms,
+        }
+        rows.append(row)
+        print(f"{n:>9} {row['automaton_ns_per_char']:>10.1f} {row['naive_ns_per_char']:>10.1f} "
+              f"{row['full_scan_ns_per_char']:>10.1f} {build_ms:>9.1f}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Replay scripted ReAct traces through the previous Reactor loop and the current one.
+
+    python scripts/bench_react.py --steps 2,4,8 --observation-tokens 1500
+
+The scripted model returns one Thought/Action step per call and a Final JSON
+after --steps tool calls. Without stop sequences it also "keeps talking"
+(a hallucinated Observation and next Thought), as real models do; with a stop
+sequence the output is cut there, as the API would. Reports prompt and
+completion tokens per iteration and parse time per step for both loops.
+"""
+from pathlib import Path
+import sys
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import argparse
+import json
+import re
+import time
+from typing import Any, Dict, List
+
+from agents.react_agent import Reactor
+from tokens import count_tokens
+
+BASE_PROMPT = """You are a travel policy assistant. Use the tools to gather evidence, then answer.
+Format:
+Thought: ...
+Action: <tool name>
+Action Input: <plain text>
+Observation: <tool output, provided to you>
+... (repeat)
+Final: {"answer": "...", "sources": [...]}
+Tools: rag_search(question) - search policy documents.
+Question: Which documents do I need to transit through Tokyo to Osaka with a UAE passport?"""
+
+RAMBLE = ("\nObservation: (the model guesses a tool result here) visa requirements vary by nationality and "
+          "length of stay; transit passengers may need ... \nThought: I should search again for more detail "
+          "about transit rules and the documents required at immigration")
+
+
+class FakeTool:
+    def __init__(self, name: str, observation_tokens: int):
+        self.name = name
+        self.payload = json.dumps([{"id": f"visa_rules.md#chunk_{i}", "chunk": "Transit visa rules for Japan. " * 6}
+                                   for i in range(max(1, observation_tokens // 50))])
+
+    def invoke(self, _input: str) -> str:
+        return self.payload
+
+
+class ScriptedModel:
+    def __init__(self, steps: int):
+        self.steps = steps
+        self.calls = 0
+        self.prompt_tokens: List[int] = []
+        self.completion_tokens = 0
+
+    def __call__(self, prompt: str, max_output_tokens: int, temperature: float, stop: List[str] | None) -> str:
+        self.prompt_tokens.append(count_tokens(prompt))
+        i = self.calls
+        self.calls += 1
+        if i < self.steps:
+            out = f"Thought: I need evidence part {i + 1}.\nAction: rag_search\nAction Input: transit visa Japan part {i + 1}" + RAMBLE
+        else:
+            out = 'Thought: I have enough evidence.\nFinal: {"answer": "A UAE passport holder needs ...", "sources": ["visa_rules.md#chunk_0"]}'
+        if stop:
+            cut = min((out.find(s) for s in stop if s in out), default=-1)
+            if cut != -1:
+                out = out[:cut]
+        self.completion_tokens += count_tokens(out)
+        return out
+
+
+class LegacyReactor:
+    """The loop as it was before: whole transcript re-sent each round, no stop sequence, regex re-scans."""
+
+    def __init__(self, prompt_text: str, tools: List[Any], max_iters: int, generate):
+        self.base_prompt = prompt_text
+        self.max_iters = max_iters
+        self.tools = {t.name: t for t in tools}
+        self.generate = generate
+        self.parse_us: List[float] = []
+
+    @staticmethod
+    def _extract_action(block: str) -> Dict[str, Any] | None:
+        action_matches = list(re.finditer(r"(?i)^\s*Action\s*:\s*(.+)$", block, flags=re.MULTILINE))
+        if not action_matches:
+            return None
+        tool_name = action_matches[-1].group(1).strip()
+        after = block[action_matches[-1].end():]
+        m_in = re.search(r"(?i)^\s*Action\s*Input\s*:\s*(.+)$", after, flags=re.MULTILINE | re.DOTALL)
+        arg = (m_in.group(1).strip() if m_in else "").strip()
+        if not arg:
+            m2 = re.search(r"(?i)Action\s*Input\s*:\s*(.+)$", block, flags=re.MULTILINE | re.DOTALL)
+            if not m2:
+                return None
+            arg = m2.group(1).strip()
+        return {"tool": tool_name, "input": arg}
+
+    @staticmethod
+    def _extract_final_json(text: str) -> dict:
+        m = re.search(r"(?i)Final\s*:\s*(\{.*)$", text, flags=re.DOTALL)
+        candidate = m.group(1).strip() if m else text.strip()
+        start, end = candidate.rfind("{"), candidate.rfind("}")
+        if start == -1 or end == -1 or end < start:
+            raise ValueError("No JSON object found in Final output.")
+        return json.loads(candidate[start:end + 1])
+
+    def invoke(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        transcript = self.base_prompt.strip()
+        for _ in range(self.max_iters):
+            step_out = self.generate(transcript + "\n", 600, 0.3, None)
+            t0 = time.perf_counter()
+            try:
+                data = self._extract_final_json(step_out)
+                self.parse_us.append((time.perf_counter() - t0) * 1e6)
+                return {"output": step_out, "final": data}
+            except Exception:
+                pass
+            act = self._extract_action(step_out)
+            self.parse_us.append((time.perf_counter() - t0) * 1e6)
+            if not act:
+                break
+            obs = self.tools[act["tool"]].invoke(act["input"])
+            transcript += "\n" + step_out.strip() + f"\nObservation: {obs}\n"
+        return {"output": self.generate(transcript + "\nPlease provide Final: the exact JSON now, nothing else.\n", 600, 0.3, None)}
+
+
+def run(kind: str, steps: int, observation_tokens: int) -> Dict[str, Any]:
+    model = ScriptedModel(steps)
+    tools = [FakeTool("rag_search", observation_tokens)]
+    if kind == "legacy":
+        agent = LegacyReactor(BASE_PROMPT, tools, max_iters=steps + 1, generate=model)
+    else:
+        agent = Reactor(BASE_PROMPT, tools, max_iters=steps + 1, generate=model)
+    t0 = time.perf_counter()
+    out = agent.invoke({})
+    wall_ms = (time.perf_counter() - t0) * 1000.0
+    parse_us = agent.parse_us if kind == "legacy" else _time_new_parse(steps)
+    return {
+        "loop": kind,
+        "steps": steps,
+        "llm_calls": model.calls,
+        "final_ok": bool(out.get("final")),
+        "prompt_tokens_per_call": model.prompt_tokens,
+        "prompt_tokens_total": sum(model.prompt_tokens),
+        "completion_tokens_total": model.completion_tokens,
+        "parse_us_mean": sum(parse_us) / max(1, len(parse_us)),
+        "wall_ms": wall_ms,
+    }
+
+
+def _time_new_parse(steps: int) -> List[float]:
+    from agents.react_agent import parse_step, STOP_SEQUENCES
+    replay = ScriptedModel(steps)
+    out = []
+    for _ in range(steps + 1):
+        text = replay("", 0, 0.0, STOP_SEQUENCES)
+        t0 = time.perf_counter()
+        step = parse_step(text)
+        _ = step.final or step.action
+        out.append((time.perf_counter() - t0) * 1e6)
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--steps", default="1,2,4,8", help="Tool calls before Final, comma-separated.")
+    ap.add_argument("--observation-tokens", type=int, default=1500, help="Approximate size of each tool observation.")
+    ap.add_argument("--json", default=None, help="Write results as JSON to this path.")
+    args = ap.parse_args()
+
+    import logging
+    logging.getLogger("agentic_chatbot").setLevel(logging.WARNING)
+    rows = []
+    print(f"{'loop':<8}{'steps':>6}{'calls':>6}{'prompt_tok':>11}{'last_call':>10}{'compl_tok':>10}{'parse_us':>9}  final")
+    for steps in [int(x) for x in args.steps.split(",")]:
+        for kind in ("legacy", "current"):
+            r = run(kind, steps, args.observation_tokens)
+            rows.append(r)
+            print(f"{kind:<8}{steps:>6}{r['llm_calls']:>6}{r['prompt_tokens_total']:>11}{r['prompt_tokens_per_call'][-1]:>10}"
+                  f"{r['completion_tokens_total']:>10}{r['parse_us_mean']:>9.1f}  {r['final_ok']}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
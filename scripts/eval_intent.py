@@ -0,0 +1,82 @@
+"""
+Accuracy/latency evaluation of the local fast-path intent classifier.
+
+    python scripts/eval_intent.py [--data data/intent_eval.jsonl] [--threshold 0.8] [--with-llm]
+
+Reports fast-path coverage, fast-path accuracy, overall accuracy of the local
+prediction and classifier latency. With --with-llm, queries below the
+threshold are also sent through the LLM router to measure end-to-end accuracy.
+"""
+from pathlib import Path
+import sys
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import argparse
+import json
+import os
+import time
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--data", default="data/intent_eval.jsonl")
+    ap.add_argument("--threshold", type=float, default=None)
+    ap.add_argument("--with-llm", action="store_true")
+    args = ap.parse_args()
+
+    os.chdir(ROOT)
+    from agents.intent_classifier import classify, FASTPATH_THRESHOLD, _centroids
+    from metrics import summarize
+
+    threshold = FASTPATH_THRESHOLD if args.threshold is None else args.threshold
+    rows = [json.loads(l) for l in open(args.data, encoding="utf-8") if l.strip()]
+
+    t0 = time.perf_counter()
+    _centroids.ready()
+    fit_ms = (time.perf_counter() - t0) * 1000.0
+
+    lat, fast, fast_ok, local_ok, final_ok = [], 0, 0, 0, 0
+    confusion = {}
+    for r in rows:
+        t0 = time.perf_counter()
+        g = classify(r["text"])
+        lat.append((time.perf_counter() - t0) * 1000.0)
+        hit = g["intent"] == r["intent"]
+        local_ok += hit
+        if g["confidence"] >= threshold:
+            fast += 1
+            fast_ok += hit
+            final_ok += hit
+            if not hit:
+                confusion[(r["intent"], g["intent"])] = confusion.get((r["intent"], g["intent"]), 0) + 1
+        elif args.with_llm:
+            import agents.primary as primary
+            from agents import slots
+            # The fallback must be the LLM router alone, not the slot pass that runs ahead of it.
+            prev, prev_slots = primary.FASTPATH_ENABLED, slots.SLOTS_ENABLED
+            primary.FASTPATH_ENABLED = False
+            slots.SLOTS_ENABLED = False
+            try:
+                out = primary.run_primary({"query": r["text"]})
+            finally:
+                primary.FASTPATH_ENABLED = prev
+                slots.SLOTS_ENABLED = prev_slots
+            final_ok += out["intent"] == r["intent"]
+
+    n = max(1, len(rows))
+    s = summarize(lat)
+    print(f"examples={len(rows)} threshold={threshold} centroid={'on' if _centroids.centroids is not None else 'off'} (fit {fit_ms:.0f} ms)")
+    print(f"fast-path coverage={fast / n:.1%} ({fast}/{len(rows)})  fast-path accuracy={fast_ok / max(1, fast):.1%}")
+    print(f"local accuracy (all examples)={local_ok / n:.1%}")
+    if args.with_llm:
+        print(f"end-to-end accuracy (fast path + LLM fallback)={final_ok / n:.1%}")
+    print(f"classifier latency ms: p50={s['p50']:.2f} p95={s['p95']:.2f} max={s['max']:.2f}")
+    for (gold, pred), c in sorted(confusion.items(), key=lambda kv: -kv[1]):
+        print(f"  fast-path error: {gold} -> {pred} x{c}")
+
+
+if __name__ == "__main__":
+    main()
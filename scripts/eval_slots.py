@@ -0,0 +1,96 @@
+"""
+LLM calls saved by local slot filling, on a recorded multi-turn query set.
+
+    python scripts/eval_slots.py [--data data/slot_eval.jsonl] [--verbose]
+
+Replays each conversation through agents.slots.resolve and counts, per turn,
+the routing and clarify LLM calls the graph would make with and without the
+slot pass (the router call is skipped when the intent fast path is confident;
+a clarify turn costs one more call unless its question was templated). Slot
+decisions are graded against expected_intent / expected_slots, and the
+expected slots are carried into the next turn the way a completed flight
+search would.
+"""
+from pathlib import Path
+import sys
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import argparse
+import json
+import os
+import time
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--data", default="data/slot_eval.jsonl")
+    ap.add_argument("--threshold", type=float, default=None, help="Intent fast-path threshold.")
+    ap.add_argument("--verbose", action="store_true")
+    args = ap.parse_args()
+
+    os.chdir(ROOT)
+    from agents import slots
+    from agents.intent_classifier import classify, FASTPATH_THRESHOLD, _centroids
+    from metrics import summarize
+
+    threshold = FASTPATH_THRESHOLD if args.threshold is None else args.threshold
+    convs = [json.loads(l) for l in open(args.data, encoding="utf-8") if l.strip()]
+
+    lat, turns, baseline, with_slots = [], 0, 0, 0
+    handled, intent_ok, slots_ok, slots_graded, templated = 0, 0, 0, 0, 0
+    errors = []
+    for conv in convs:
+        state = {"slots": None, "pending_slots": None}
+        for n, turn in enumerate(conv["turns"]):
+            turns += 1
+            expected = turn["expected_intent"]
+            guess = classify(turn["query"], has_history=n > 0)
+            router = 0 if guess["confidence"] >= threshold else 1
+            cost = router + (expected == "clarify_missing_fields")
+            baseline += cost
+
+            state["query"] = turn["query"]
+            t0 = time.perf_counter()
+            decided = slots.resolve(state)
+            lat.append((time.perf_counter() - t0) * 1000.0)
+            if decided is None:
+                with_slots += cost
+                is_clarify = expected == "clarify_missing_fields"
+                state["pending_slots"] = slots.missing(state.get("slots") or {}) if is_clarify else []
+                label = "defer"
+            else:
+                handled += 1
+                templated += state.pop("slot_question", None) is not None
+                ok = decided["intent"] == expected
+                intent_ok += ok
+                if not ok:
+                    errors.append((conv["id"], n + 1, expected, decided["intent"]))
+                label = decided["intent"]
+            if "expected_slots" in turn and decided is not None:
+                slots_graded += 1
+                slots_ok += state.get("slots") == turn["expected_slots"]
+            if "expected_slots" in turn:
+                state["slots"] = dict(turn["expected_slots"])
+            if expected == "schedule_search":
+                state["pending_slots"] = []
+            if args.verbose:
+                print(f"  {conv['id']}#{n + 1:<2} {label:<24} expected={expected:<24} slots={state.get('slots')}")
+
+    s = summarize(lat)
+    print(f"conversations={len(convs)} turns={turns} threshold={threshold} "
+          f"centroid={'on' if _centroids.centroids is not None else 'off'}")
+    print(f"slot pass decided {handled}/{turns} turns ({handled / max(1, turns):.1%}); "
+          f"intent accuracy={intent_ok / max(1, handled):.1%}, slot accuracy={slots_ok / max(1, slots_graded):.1%} "
+          f"({slots_graded} graded), templated questions={templated}")
+    print(f"router+clarify LLM calls: baseline={baseline} with slots={with_slots} "
+          f"saved={baseline - with_slots} ({(baseline - with_slots) / max(1, baseline):.1%})")
+    print(f"slot pass latency ms: p50={s['p50']:.3f} p95={s['p95']:.3f} max={s['max']:.3f}")
+    for cid, n, gold, pred in errors:
+        print(f"  slot-path error: {cid}#{n} {gold} -> {pred}")
+
+
+if __name__ == "__main__":
+    main()
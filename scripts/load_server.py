@@ -0,0 +1,91 @@
+"""
+Closed-loop load generator for the HTTP server (server.py).
+
+    python scripts/mock_llm_server.py --port 8765 --latency-ms 300
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=mock uvicorn server:app --port 8000
+    python scripts/load_server.py --url http://127.0.0.1:8000 --clients 32 --requests 500
+
+Each client owns one session id and sends the benchmark queries in turn.
+Reports status-code counts, client-side latency percentiles and requests/sec.
+"""
+from pathlib import Path
+import sys
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import argparse
+import itertools
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from typing import List
+
+import metrics
+from scripts.bench_graph import DEFAULT_QUERIES, load_queries
+
+
+def post(url: str, body: dict, timeout: float) -> int:
+    req = urllib.request.Request(url, data=json.dumps(body).encode("utf-8"),
+                                 headers={"Content-Type": "application/json"}, method="POST")
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            resp.read()
+            return resp.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except Exception:
+        return 0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", default="http://127.0.0.1:8000")
+    ap.add_argument("--clients", type=int, default=16)
+    ap.add_argument("--requests", type=int, default=200)
+    ap.add_argument("--queries", default=str(DEFAULT_QUERIES))
+    ap.add_argument("--stream", action="store_true", help="Use /chat/stream instead of /chat.")
+    ap.add_argument("--timeout", type=float, default=120.0)
+    args = ap.parse_args()
+
+    queries = load_queries(args.queries)
+    endpoint = args.url.rstrip("/") + ("/chat/stream" if args.stream else "/chat")
+    ticket = itertools.count()
+    statuses: Counter = Counter()
+    latencies: List[float] = []
+    lock = threading.Lock()
+
+    def client(cid: int):
+        session_id = f"load-{cid}"
+        while True:
+            n = next(ticket)
+            if n >= args.requests:
+                return
+            t0 = time.perf_counter()
+            status = post(endpoint, {"session_id": session_id, "message": queries[n % len(queries)]}, args.timeout)
+            ms = (time.perf_counter() - t0) * 1000.0
+            with lock:
+                statuses[status] += 1
+                if status == 200:
+                    latencies.append(ms)
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(args.clients)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+
+    s = metrics.summarize(latencies)
+    print(f"{args.requests} requests, {args.clients} clients, {wall:.1f}s wall, {args.requests / wall:.1f} req/s")
+    print("status: " + ", ".join(f"{code or 'conn_error'}={n}" for code, n in sorted(statuses.items())))
+    print(f"latency ms (200 only): p50={s['p50']:.0f} p95={s['p95']:.0f} p99={s['p99']:.0f} max={s['max']:.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+"""
+Local OpenAI-compatible stub for the chat completions endpoint.
+
+Replays scripted responses for the router, flight, FAQ and clarify prompts
+(including tool calls) so the graph can be exercised without the real API:
+
+    python scripts/mock_llm_server.py --port 8765 --latency-ms 300
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=mock python main.py
+
+GET /stats returns call and token counters, POST /reset clears them.
+"""
+from pathlib import Path
+import sys
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Any, List, Tuple
+
+from tools.budget import decode_flights
+
+MONTHS = ["january", "february", "march", "april", "may", "june", "july",
+          "august", "september", "october", "november", "december"]
+ALLIANCES = ["star alliance", "oneworld", "skyteam"]
+QUERY_MARKERS = ["User request:", "User question:", "User:"]
+
+
+def _approx_tokens(text: str) -> int:
+    return max(1, len(text or "") // 4)
+
+
+def _agent_of(messages: List[Dict[str, Any]]) -> str:
+    head = " ".join(str(m.get("content") or "") for m in messages[:2])
+    if "FLIGHT AGENT" in head:
+        return "flight"
+    if "FAQ/RAG AGENT" in head:
+        return "faq"
+    if "CLARIFY AGENT" in head:
+        return "clarify"
+    if "PRIMARY orchestrator" in head or "PRIMARY router" in head:
+        return "router"
+    return "generic"
+
+
+def _query_of(messages: List[Dict[str, Any]]) -> str:
+    users = [str(m.get("content") or "") for m in messages if m.get("role") == "user"]
+    text = users[0] if users else ""
+    for marker in QUERY_MARKERS:
+        i = text.rfind(marker)
+        if i != -1:
+            return text[i + len(marker):].strip()
+    return text.strip()
+
+
+def _intent_of(query: str) -> str:
+    q = query.lower()
+    if re.search(r"\b(visa|passport|entry)\b", q):
+        return "policy_visa"
+    if re.search(r"\b(refund|refundable|cancel\w*)\b", q) and not re.search(r"\bfrom\b.+\bto\b", q):
+        return "policy_refund"
+    if re.search(r"\b(flights?|fly|trip|itinerar\w*)\b", q) or re.search(r"\bfrom\b.+\bto\b", q):
+        return "schedule_search" if re.search(r"\bfrom\s+\w+.*\bto\s+\w+", q) else "clarify_missing_fields"
+    return "off_topic"
+
+
+def _criteria_of(query: str) -> Dict[str, Any]:
+    q = query.lower()
+    crit: Dict[str, Any] = {}
+    m = re.search(r"\bfrom\s+([a-z ]+?)\s+to\s+([a-z ]+?)(?:\s+(?:in|on|under|below|for|with|,)\b|[,.?!]|$)", q)
+    if m:
+        crit["origin"] = m.group(1).strip().title()
+        crit["destination"] = m.group(2).strip().title()
+    for name in MONTHS:
+        if re.search(rf"\b{name[:3]}\w*\b", q):
+            crit["month_hint"] = name.title()
+            break
+    m = re.search(r"(?:under|below|less than|max)\s*\$?\s*(\d+)", q)
+    if m:
+        crit["max_price_usd"] = float(m.group(1))
+    for a in ALLIANCES:
+        if a in q:
+            crit["alliance"] = a.title()
+    if re.search(r"non[- ]?stop|direct", q):
+        crit["non_stop_only"] = True
+    if "refundable" in q:
+        crit["refundable_only"] = True
+    return crit
+
+
+def _tool_outputs(messages: List[Dict[str, Any]]) -> List[Any]:
+    out = []
+    for m in messages:
+        if m.get("role") != "tool":
+            continue
+        try:
+            out.append(json.loads(m.get("content") or "null"))
+        except Exception:
+            table = decode_flights(m.get("content") or "")
+            out.append(m.get("content") if table is None else table)
+    return out
+
+
+def _tool_call(name: str, args: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": f"call_{uuid.uuid4().hex[:12]}",
+        "type": "function",
+        "function": {"name": name, "arguments": json.dumps(args)},
+    }
+
+
+def _router_reply(query: str, tools_offered: bool) -> Tuple[str, List[Dict[str, Any]]]:
+    intent = _intent_of(query)
+    if tools_offered and intent == "schedule_search":
+        return "", [_tool_call("flight_filter", {"criteria_json": json.dumps(_criteria_of(query))})]
+    if tools_offered and intent.startswith("policy_"):
+        return "", [_tool_call("rag_search", {"question": query})]
+    response = "Which origin, destination and travel month should I search?" if intent == "clarify_missing_fields" else ""
+    return json.dumps({"intent": intent, "response": response, "confidence": 0.9}), []
+
+
+def _previous_criteria(messages: List[Dict[str, Any]], tag: str = "previous_criteria") -> Dict[str, Any]:
+    users = [str(m.get("content") or "") for m in messages if m.get("role") == "user"]
+    m = re.search(rf"<{tag}>(.*?)</{tag}>", users[0] if users else "", flags=re.DOTALL)
+    try:
+        prev = json.loads(m.group(1)) if m else {}
+    except ValueError:
+        prev = {}
+    return {k: v for k, v in prev.items() if v not in (None, "")} if isinstance(prev, dict) else {}
+
+
+def _flight_reply(query: str, messages: List[Dict[str, Any]], tools_offered: bool) -> Tuple[str, List[Dict[str, Any]]]:
+    crit = {**_previous_criteria(messages), **_previous_criteria(messages, "slots"), **_criteria_of(query)}
+    outputs = _tool_outputs(messages)
+    if not outputs and tools_offered:
+        return "", [_tool_call("flight_filter", {"criteria_json": json.dumps(crit)})]
+    itins = []
+    for batch in outputs:
+        if isinstance(batch, dict):
+            batch = batch.get("itineraries") or []
+        for it in batch if isinstance(batch, list) else []:
+            if not isinstance(it, dict):
+                continue
+            itins.append({
+                "airline": it.get("airline", "Unknown Airline"),
+                "alliance": it.get("alliance"),
+                "segments": [{"from": it.get("from"), "to": it.get("to"),
+                              "departure_date": it.get("departure_date"),
+                              "arrival_date": it.get("return_date")}],
+                "price_usd": float(it.get("price_usd") or it.get("price") or 0),
+                "refundable": bool(it.get("refundable")),
+                "match_explanations": [],
+            })
+    summary = f"Found {len(itins)} itinerary(ies) matching your criteria."
+    return json.dumps({"intent": "schedule_search", "criteria": crit, "itineraries": itins, "summary": summary}), []
+
+
+def _faq_reply(query: str, messages: List[Dict[str, Any]], tools_offered: bool) -> Tuple[str, List[Dict[str, Any]]]:
+    outputs = _tool_outputs(messages)
+    evidence = "Retrieved evidence:" in " ".join(str(m.get("content") or "") for m in messages)
+    if not outputs and not evidence and tools_offered:
+        return "", [_tool_call("rag_search", {"question": query})]
+    hits = [h for batch in outputs if isinstance(batch, list) for h in batch if isinstance(h, dict)]
+    if hits:
+        answer = hits[0].get("chunk") or hits[0].get("text") or ""
+        sources = [{"id": str(h.get("id", "")), "title": str(h.get("title", ""))} for h in hits[:3]]
+    else:
+        answer = "Based on the retrieved policy evidence, please see the relevant policy section."
+        sources = []
+    return json.dumps({"intent": "policy_answer", "response": answer, "sources": sources, "confidence": 0.8}), []
+
+
+def _clarify_reply(query: str) -> Tuple[str, List[Dict[str, Any]]]:
+    return "Could you tell me your departure city, destination and preferred travel month?", []
+
+
+def script_reply(body: Dict[str, Any]) -> Tuple[str, List[Dict[str, Any]], str]:
+    messages = body.get("messages") or []
+    tools_offered = bool(body.get("tools")) and body.get("tool_choice") != "none"
+    agent = _agent_of(messages)
+    query = _query_of(messages)
+    if agent == "router":
+        content, calls = _router_reply(query, tools_offered)
+    elif agent == "flight":
+        content, calls = _flight_reply(query, messages, tools_offered)
+    elif agent == "faq":
+        content, calls = _faq_reply(query, messages, tools_offered)
+    elif agent == "clarify":
+        content, calls = _clarify_reply(query)
+    else:
+        content, calls = json.dumps({"intent": _intent_of(query), "response": ""}), []
+    return content, calls, agent
+
+
+class MockState:
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, reject_response_format: bool = False,
+                 rpm: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.reject_response_format = reject_response_format
+        self.rpm = rpm
+        self.window: "deque[float]" = deque()
+        self.lock = threading.Lock()
+        self.stats: Dict[str, Any] = {}
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.stats = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "by_agent": {}, "rate_limited": 0}
+            self.window.clear()
+
+    def admit(self) -> float:
+        """0 when the call fits the --rpm sliding window, else seconds until it would (sent as Retry-After)."""
+        if not self.rpm:
+            return 0.0
+        now = time.monotonic()
+        with self.lock:
+            while self.window and now - self.window[0] >= 60.0:
+                self.window.popleft()
+            if len(self.window) < self.rpm:
+                self.window.append(now)
+                return 0.0
+            self.stats["rate_limited"] += 1
+            return 60.0 - (now - self.window[0])
+
+    def record(self, agent: str, prompt_tokens: int, completion_tokens: int):
+        with self.lock:
+            self.stats["calls"] += 1
+            self.stats["prompt_tokens"] += prompt_tokens
+            self.stats["completion_tokens"] += completion_tokens
+            self.stats["by_agent"][agent] = self.stats["by_agent"].get(agent, 0) + 1
+
+    def delay(self):
+        d = self.latency_ms + (random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0)
+        if d > 0:
+            time.sleep(d / 1000.0)
+
+
+def make_handler(state: MockState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def _send(self, code: int, payload: Dict[str, Any], headers: Dict[str, str] | None = None):
+            raw = json.dumps(payload).encode("utf-8")
+            self.send_response(code)
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/stats"):
+                with state.lock:
+                    return self._send(200, json.loads(json.dumps(state.stats)))
+            if self.path.rstrip("/").endswith("/models"):
+                return self._send(200, {"object": "list", "data": [{"id": "mock", "object": "model"}]})
+            self._send(404, {"error": {"message": "not found"}})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if self.path.rstrip("/").endswith("/reset"):
+                state.reset()
+                return self._send(200, {"ok": True})
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                return self._send(404, {"error": {"message": "not found"}})
+            if state.reject_response_format and body.get("response_format"):
+                return self._send(400, {"error": {
+                    "message": "Invalid parameter: 'response_format' of type 'json_schema' is not supported with this model.",
+                    "type": "invalid_request_error", "param": "response_format", "code": None}})
+
+            retry_after = state.admit()
+            if retry_after:
+                return self._send(429, {"error": {
+                    "message": f"Rate limit reached: {state.rpm} requests per minute.",
+                    "type": "requests", "param": None, "code": "rate_limit_exceeded"}},
+                    headers={"Retry-After": f"{retry_after:.3f}"})
+
+            content, calls, agent = script_reply(body)
+            state.delay()
+            prompt_tokens = sum(_approx_tokens(str(m.get("content") or "")) for m in body.get("messages") or [])
+            completion_tokens = _approx_tokens(content + json.dumps(calls))
+            state.record(agent, prompt_tokens, completion_tokens)
+
+            message: Dict[str, Any] = {"role": "assistant", "content": content or None}
+            if calls:
+                message["tool_calls"] = calls
+            self._send(200, {
+                "id": f"chatcmpl-mock-{uuid.uuid4().hex[:12]}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "mock"),
+                "choices": [{
+                    "index": 0,
+                    "message": message,
+                    "finish_reason": "tool_calls" if calls else "stop",
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            })
+
+    return Handler
+
+
+def make_server(host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0.0, jitter_ms: float = 0.0, **options) -> ThreadingHTTPServer:
+    state = MockState(latency_ms=latency_ms, jitter_ms=jitter_ms, **options)
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.daemon_threads = True
+    server.mock_state = state
+    return server
+
+
+def start_in_thread(**kwargs) -> Tuple[ThreadingHTTPServer, str]:
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, name="mock-llm", daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}/v1"
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="OpenAI-compatible stub LLM server.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="Artificial latency per completion.")
+    ap.add_argument("--jitter-ms", type=float, default=0.0, help="Uniform +/- jitter added to the latency.")
+    ap.add_argument("--reject-response-format", action="store_true",
+                    help="Answer 400 to structured-output requests, like a provider without json_schema support.")
+    ap.add_argument("--rpm", type=int, default=0, help="Answer 429 beyond this many completions per minute (0 = unlimited).")
+    args = ap.parse_args()
+
+    srv = make_server(args.host, args.port, args.latency_ms, args.jitter_ms,
+                      reject_response_format=args.reject_response_format, rpm=args.rpm)
+    print(f"Mock LLM listening on http://{args.host}:{args.port}/v1 (latency={args.latency_ms}ms ±{args.jitter_ms}ms)")
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,153 @@
+"""
+Deterministic synthetic data for benchmarks: flight inventories and policy corpora.
+
+    python scripts/synthetic_data.py flights --rows 100000 --out /tmp/flights_100k.json
+    python scripts/synthetic_data.py corpus --docs 200 --out-dir /tmp/policy_corpus
+
+Flight rows use the same key variety `helpers.filter_flights` accepts
+(from/origin/source/from_city, price_usd/price, layovers/stops, ...), so every
+alias branch of the filters is exercised. Files are streamed, so multi-million
+row inventories never have to fit in memory as Python objects.
+"""
+from pathlib import Path
+import sys
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import argparse
+import json
+import os
+import random
+from datetime import date, timedelta
+from typing import Any, Dict, Iterator, List
+
+CITIES = ["Dubai", "Tokyo", "Osaka", "London", "Paris", "New York", "Singapore", "Istanbul", "Doha", "Frankfurt",
+          "Sydney", "Toronto", "Seoul", "Bangkok", "Karachi", "Lahore", "Riyadh", "Cairo", "Madrid", "Rome"]
+AIRLINES = [("Turkish Airlines", "Star Alliance"), ("Lufthansa", "Star Alliance"), ("ANA", "Star Alliance"),
+            ("British Airways", "Oneworld"), ("Qatar Airways", "Oneworld"), ("JAL", "Oneworld"),
+            ("Air France", "SkyTeam"), ("Korean Air", "SkyTeam"), ("Emirates", None), ("flydubai", None)]
+
+# Alternative spellings per field, as accepted by helpers._first_nonempty lookups.
+KEY_ALIASES = {
+    "from": ["from", "origin", "source", "from_city"],
+    "to": ["to", "destination", "dest", "to_city"],
+    "price": ["price_usd", "price"],
+    "departure_date": ["departure_date", "depart_date", "outbound_date"],
+    "return_date": ["return_date", "inbound_date"],
+    "layovers": ["layovers", "stops"],
+    "refundable": ["refundable", "is_refundable"],
+}
+
+
+def flight_row(rng: random.Random, alias_rate: float = 0.3) -> Dict[str, Any]:
+    def key(field: str) -> str:
+        names = KEY_ALIASES[field]
+        return rng.choice(names[1:]) if rng.random() < alias_rate else names[0]
+
+    src, dst = rng.sample(CITIES, 2)
+    airline, alliance = rng.choice(AIRLINES)
+    dep = date(2024, 1, 1) + timedelta(days=rng.randrange(365))
+    row: Dict[str, Any] = {
+        "airline": airline,
+        key("from"): src,
+        key("to"): dst,
+        key("departure_date"): dep.isoformat(),
+        key("return_date"): (dep + timedelta(days=rng.randint(3, 30))).isoformat(),
+        key("layovers"): rng.sample([c for c in CITIES if c not in (src, dst)], rng.choice([0, 0, 1, 1, 2])),
+        key("price"): rng.randint(150, 3000),
+        key("refundable"): rng.random() < 0.35,
+    }
+    if alliance:
+        row["alliance"] = alliance
+    return row
+
+
+def iter_flights(rows: int, seed: int = 13, alias_rate: float = 0.3) -> Iterator[Dict[str, Any]]:
+    rng = random.Random(seed)
+    for _ in range(rows):
+        yield flight_row(rng, alias_rate)
+
+
+def flights(rows: int, seed: int = 13, alias_rate: float = 0.3) -> List[Dict[str, Any]]:
+    return list(iter_flights(rows, seed, alias_rate))
+
+
+def write_flights(path: str, rows: int, seed: int = 13, alias_rate: float = 0.3) -> str:
+    """Stream a JSON array of `rows` itineraries to `path`."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[\n")
+        for i, row in enumerate(iter_flights(rows, seed, alias_rate)):
+            f.write((",\n" if i else "") + json.dumps(row, ensure_ascii=False))
+        f.write("\n]\n")
+    return path
+
+
+TOPICS = ["visa", "transit", "refund", "baggage", "check-in", "cancellation", "rebooking", "passport"]
+BOILERPLATE = ("This policy applies to all tickets issued on or after the effective date. Terms may change "
+               "without notice; the version published on the website at the time of travel prevails.")
+SENTENCES = [
+    "Passengers holding a {topic} document issued by {city} must present it at check-in.",
+    "A {topic} request submitted less than {hours} hours before departure is handled at the airport.",
+    "For travel through {city}, the {topic} rules of the final destination apply.",
+    "Fees for {topic} changes are waived for refundable fares booked directly with the airline.",
+    "The {topic} allowance depends on the fare family and the operating carrier on the {city} segment.",
+    "Requests concerning {topic} are processed within {days} business days of receipt.",
+]
+
+
+def policy_doc(rng: random.Random, paragraphs: int = 12, boilerplate_rate: float = 0.25) -> str:
+    topic = rng.choice(TOPICS)
+    out = [f"# {topic.title()} policy"]
+    for _ in range(paragraphs):
+        if rng.random() < boilerplate_rate:
+            out.append(BOILERPLATE)
+            continue
+        out.append(" ".join(
+            rng.choice(SENTENCES).format(topic=rng.choice(TOPICS), city=rng.choice(CITIES),
+                                         hours=rng.choice([24, 48, 72]), days=rng.randint(3, 21))
+            for _ in range(rng.randint(3, 7))))
+    return "\n\n".join(out) + "\n"
+
+
+def policy_corpus(docs: int, seed: int = 29, paragraphs: int = 12) -> List[str]:
+    rng = random.Random(seed)
+    return [policy_doc(rng, paragraphs) for _ in range(docs)]
+
+
+def write_corpus(out_dir: str, docs: int, seed: int = 29, paragraphs: int = 12) -> List[str]:
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for i, text in enumerate(policy_corpus(docs, seed, paragraphs)):
+        p = os.path.join(out_dir, f"policy_{i:05d}.md")
+        with open(p, "w", encoding="utf-8") as f:
+            f.write(text)
+        paths.append(p)
+    return paths
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Write synthetic flight inventories or policy corpora.")
+    sub = ap.add_subparsers(dest="kind", required=True)
+    f = sub.add_parser("flights")
+    f.add_argument("--rows", type=int, default=10000)
+    f.add_argument("--seed", type=int, default=13)
+    f.add_argument("--alias-rate", type=float, default=0.3, help="Share of fields written under an alias key.")
+    f.add_argument("--out", required=True)
+    c = sub.add_parser("corpus")
+    c.add_argument("--docs", type=int, default=100)
+    c.add_argument("--paragraphs", type=int, default=12)
+    c.add_argument("--seed", type=int, default=29)
+    c.add_argument("--out-dir", required=True)
+    args = ap.parse_args()
+
+    if args.kind == "flights":
+        print(write_flights(args.out, args.rows, args.seed, args.alias_rate))
+    else:
+        print(f"{len(write_corpus(args.out_dir, args.docs, args.seed, args.paragraphs))} documents in {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
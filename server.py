@@ -0,0 +1,248 @@
+"""
+HTTP (ASGI) entry point for the travel assistant.
+
+    uvicorn server:app --host 0.0.0.0 --port 8000
+
+POST /chat          {"session_id": "...", "message": "..."} -> final response
+POST /chat/stream   same body -> server-sent events, one per graph node, then "done"
+GET  /healthz       liveness / draining status
+GET  /metrics       Prometheus text exposition
+"""
+from dotenv import load_dotenv
+load_dotenv()
+
+from logger_config import setup_logger, log_context
+logger = setup_logger()
+
+import os
+import json
+import time
+import uuid
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Callable
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+
+import metrics
+from graph.langgraph_app import build_graph
+from memory.session_store import get_session_store
+from graph.pii import redact
+from warmup import start_warmup, status as warmup_status
+
+SERVER_MAX_INFLIGHT = int(os.getenv("SERVER_MAX_INFLIGHT", "16"))
+SERVER_MAX_QUEUE = int(os.getenv("SERVER_MAX_QUEUE", "64"))
+SERVER_SHUTDOWN_GRACE_S = float(os.getenv("SERVER_SHUTDOWN_GRACE_S", "30"))
+
+
+class ChatRequest(BaseModel):
+    session_id: str
+    message: str
+    deadline_ms: float | None = None
+
+
+class ChatResponse(BaseModel):
+    session_id: str
+    response: str
+    agent: str | None = None
+    intent: str | None = None
+    latency_ms: float
+
+
+class Admission:
+    """Bounded concurrency: SERVER_MAX_INFLIGHT graph workers plus SERVER_MAX_QUEUE waiting turns."""
+
+    def __init__(self, workers: int, queue: int):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="graph-worker")
+        self.limit = workers + queue
+        self.admitted = 0
+        self.running = 0
+        self.draining = False
+        self._lock = threading.Lock()
+
+    def try_admit(self) -> bool:
+        with self._lock:
+            if self.draining or self.admitted >= self.limit:
+                return False
+            self.admitted += 1
+            self._publish()
+            return True
+
+    def release(self):
+        with self._lock:
+            self.admitted -= 1
+            self._publish()
+
+    def _track(self, delta: int):
+        with self._lock:
+            self.running += delta
+            self._publish()
+
+    def _publish(self):
+        metrics.gauge("server.inflight", self.running)
+        metrics.gauge("server.queue_depth", self.admitted - self.running)
+
+    def submit(self, fn: Callable, *args):
+        queued_at = time.perf_counter()
+
+        def run():
+            metrics.observe("server.queue_wait_ms", (time.perf_counter() - queued_at) * 1000.0)
+            self._track(1)
+            try:
+                return fn(*args)
+            finally:
+                self._track(-1)
+
+        return asyncio.wrap_future(self.pool.submit(run))
+
+    async def drain(self, timeout: float):
+        with self._lock:
+            self.draining = True
+        deadline = time.monotonic() + timeout
+        while self.admitted > 0 and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if self.admitted:
+            logger.warning(f"Shutdown grace expired with {self.admitted} turn(s) still running.")
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+GRAPH = build_graph()
+admission = Admission(SERVER_MAX_INFLIGHT, SERVER_MAX_QUEUE)
+
+
+def _turn(session_id: str, message: str, on_node: Callable[[str, float], None] | None = None,
+          deadline_ms: float | None = None) -> Dict[str, Any]:
+    store = get_session_store()
+    # One turn at a time per session; different sessions run concurrently. The session stays pinned
+    # (never evicted) from lookup to the end of the turn.
+    with store.use(session_id) as session, session.lock, \
+            log_context(request_id=uuid.uuid4().hex[:12], session_id=session_id):
+        mem = session.memory
+        mem.add_user(redact(message))  # never persist PII, even if the turn fails before the guard node
+        state: Dict[str, Any] = {'messages': [], 'query': message, 'memory': mem, 'results': session.flight_results,
+                                 'slots': session.slots, 'pending_slots': session.pending_slots,
+                                 'deadline_ms': deadline_ms}
+        t0 = prev = time.perf_counter()
+        with metrics.turn(), metrics.span("turn", session_id=session_id):
+            if on_node is None:
+                state = GRAPH.invoke(state)
+            else:
+                for chunk in GRAPH.stream(state, stream_mode="updates"):
+                    now = time.perf_counter()
+                    for node, update in chunk.items():
+                        state = update if isinstance(update, dict) else state
+                        on_node(node, (now - prev) * 1000.0)
+                    prev = now
+        state['latency_ms'] = (time.perf_counter() - t0) * 1000.0
+        store.record_turn(session_id, state)
+    return state
+
+
+def _payload(session_id: str, out: Dict[str, Any]) -> Dict[str, Any]:
+    return ChatResponse(
+        session_id=session_id,
+        response=out.get('response') or "",
+        agent=out.get('current_agent'),
+        intent=out.get('intent'),
+        latency_ms=round(out.get('latency_ms', 0.0), 1),
+    ).model_dump()
+
+
+def _rejected() -> JSONResponse:
+    metrics.incr("server.rejected")
+    if admission.draining:
+        return JSONResponse({"error": "server is shutting down"}, status_code=503)
+    return JSONResponse({"error": "too many requests in flight; retry shortly"}, status_code=429,
+                        headers={"Retry-After": "1"})
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    start_warmup()
+    logger.info(f"HTTP server ready (inflight={SERVER_MAX_INFLIGHT}, queue={SERVER_MAX_QUEUE}).")
+    yield
+    logger.info("Draining in-flight turns before shutdown.")
+    await admission.drain(SERVER_SHUTDOWN_GRACE_S)
+    get_session_store().close()
+    logger.info("HTTP server stopped.")
+
+
+app = FastAPI(title="Agentic Travel Assistant", lifespan=lifespan)
+
+
+@app.post("/chat")
+async def chat(req: ChatRequest):
+    if not admission.try_admit():
+        return _rejected()
+    metrics.incr("server.requests")
+    try:
+        out = await admission.submit(_turn, req.session_id, req.message, None, req.deadline_ms)
+    except Exception as e:
+        logger.exception("Chat turn failed.")
+        metrics.incr("server.errors")
+        return JSONResponse({"error": f"turn failed: {e}"}, status_code=500)
+    finally:
+        admission.release()
+    metrics.observe("server.latency_ms", out.get('latency_ms', 0.0))
+    return _payload(req.session_id, out)
+
+
+@app.post("/chat/stream")
+async def chat_stream(req: ChatRequest):
+    if not admission.try_admit():
+        return _rejected()
+    metrics.incr("server.requests")
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+
+    def on_node(node: str, ms: float):
+        loop.call_soon_threadsafe(events.put_nowait, ("node", {"node": node, "ms": round(ms, 1)}))
+
+    async def run():
+        try:
+            out = await admission.submit(_turn, req.session_id, req.message, on_node, req.deadline_ms)
+            metrics.observe("server.latency_ms", out.get('latency_ms', 0.0))
+            await events.put(("done", _payload(req.session_id, out)))
+        except Exception as e:
+            logger.exception("Streaming chat turn failed.")
+            metrics.incr("server.errors")
+            await events.put(("error", {"error": f"turn failed: {e}"}))
+        finally:
+            admission.release()
+
+    task = asyncio.create_task(run())
+
+    async def sse():
+        while True:
+            kind, data = await events.get()
+            yield f"event: {kind}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+            if kind in ("done", "error"):
+                break
+        await task
+
+    return StreamingResponse(sse(), media_type="text/event-stream")
+
+
+@app.get("/healthz")
+async def healthz():
+    return {
+        "status": "draining" if admission.draining else "ok",
+        "inflight": admission.running,
+        "queued": admission.admitted - admission.running,
+        "sessions": get_session_store().info(),
+        "warmup": warmup_status(),
+    }
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.prometheus_text(), media_type="text/plain; version=0.0.4")
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host=os.getenv("SERVER_HOST", "127.0.0.1"), port=int(os.getenv("SERVER_PORT", "8000")))
@@ -4,32 +4,56 @@ load_dotenv(find_dotenv(), override=False) or load_dotenv(Path(__file__).resolve
 
 import os
 import json
+import time
 from datetime import datetime
+from typing import Any, Callable, Dict, Tuple
 import streamlit as st
 from graph.langgraph_app import build_graph
+from memory.memory import ConversationMemory
+from graph.pii import redact
+
+
+def _timed(loader: Callable[[], Any]) -> Tuple[Any, Dict[str, Any]]:
+    t0 = time.perf_counter()
+    value = loader()
+    return value, {"load_ms": round((time.perf_counter() - t0) * 1000.0, 1), "loaded_at": datetime.now().isoformat(timespec="seconds")}
+
+
+# Process-wide singletons: loaded once per server process and shared by every browser session.
+@st.cache_resource(show_spinner="Compiling agent graph…")
+def get_graph():
+    return _timed(build_graph)
+
+
+@st.cache_resource(show_spinner="Loading retriever (embedding model + FAISS index)…")
+def get_retriever():
+    import rag_store
+    return _timed(rag_store.warm_up)
+
+
+@st.cache_resource(show_spinner="Loading flight data…")
+def get_flight_data():
+    from helpers import load_flights
+    return _timed(load_flights)
+
+
+@st.cache_resource(show_spinner="Creating LLM client…")
+def get_llm_client():
+    from graph.openai_client import get_client
+    return _timed(get_client)
+
+
+def warm_up() -> Dict[str, Dict[str, Any]]:
+    """Touch every shared resource; only the first session after server start pays the load cost."""
+    status = {}
+    for name, loader in (("graph", get_graph), ("retriever", get_retriever),
+                         ("flight_data", get_flight_data), ("llm_client", get_llm_client)):
+        try:
+            _, status[name] = loader()
+        except Exception as e:
+            status[name] = {"error": repr(e)}
+    return status
 
-try:
-    from memory.memory import MemoryManager
-except Exception:
-    class MemoryManager:
-        def __init__(self, k: int = 8):
-            self.k = k
-            self._history = []
-
-        def add_user(self, msg: str):
-            self._history.append(("user", msg))
-            self._history = self._history[-2*self.k:]
-
-        def add_ai(self, msg: str):
-            self._history.append(("ai", msg))
-            self._history = self._history[-2*self.k:]
-
-        def get_formatted(self) -> str:
-            lines = []
-            for r, c in self._history[-2*self.k:]:
-                prefix = "User:" if r == "user" else "Assistant:"
-                lines.append(f"{prefix} {c}")
-            return "\n".join(lines)
 
 st.set_page_config(page_title="Agentic Travel Assistant", page_icon=" ", layout="wide")
 st.title(" Agentic Travel Assistant")
@@ -60,18 +84,42 @@ with st.sidebar:
 
     st.divider()
     if st.button("Clear conversation"):
-        for k in ("messages", "memory", "graph", "last_state"):
+        for k in ("messages", "memory", "last_state"):
             if k in st.session_state:
                 del st.session_state[k]
         st.success("Cleared. Ready for a fresh start.")
         st.rerun()
 
 
-if "graph" not in st.session_state:
-    st.session_state.graph = build_graph()
+resource_status = warm_up()
+
+with st.sidebar:
+    st.divider()
+    with st.expander("Status"):
+        st.caption("Shared resources (loaded once per server process)")
+        st.json(resource_status)
+        try:
+            flights, _ = get_flight_data()
+            import rag_store
+            from answer_cache import get_answer_cache
+            import metrics
+            counters = metrics.snapshot()["counters"]
+            st.caption("Caches")
+            st.json({
+                "flights_loaded": len(flights),
+                "retriever_resident": rag_store.is_resident(),
+                "faq_answer_cache": get_answer_cache().info(),
+                "llm_calls": counters.get("llm.calls", 0),
+                "tokens": counters.get("llm.prompt_tokens", 0) + counters.get("llm.completion_tokens", 0),
+            })
+        except Exception as e:
+            st.write(f"Cache stats unavailable: {e}")
+        if "memory" in st.session_state:
+            st.caption(f"This session's memory: {st.session_state.memory.token_count} tokens")
 
 if "memory" not in st.session_state:
-    st.session_state.memory = MemoryManager(k=st.session_state["mem_k"])
+    st.session_state.memory = ConversationMemory(k=st.session_state["mem_k"])
+st.session_state.memory.k = st.session_state["mem_k"]
 
 if "messages" not in st.session_state:
     st.session_state.messages = [
@@ -87,15 +135,18 @@ def call_graph(query: str):
       state['results']    -> flight JSON (if any)
       state['rag']        -> policy JSON (if any)
     """
-    st.session_state.memory.add_user(query)
+    graph, _ = get_graph()
+    st.session_state.memory.add_user(redact(query))
+    last = st.session_state.get("last_state") or {}
     state_in = {
         "query": query,
         "memory": st.session_state.memory,
+        "results": last.get("results"),
+        "slots": last.get("slots"),
+        "pending_slots": last.get("pending_slots"),
     }
-    out_state = st.session_state.graph.invoke(state_in)
-    if out_state.get("response"):
-        st.session_state.memory.add_ai(out_state["response"])
-    return out_state
+    # Agent nodes record their own reply in memory.
+    return graph.invoke(state_in)
 
 
 def render_debug_panels(state: dict):
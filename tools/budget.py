@@ -0,0 +1,202 @@
+import os
+import re
+import json
+import logging
+from typing import Dict, Any, List, Callable
+import metrics
+from tokens import count_tokens, truncate_tokens
+from helpers import _first_nonempty, _ORIGIN_KEYS, _DEST_KEYS
+
+logger = logging.getLogger("agentic_chatbot.tool_budget")
+
+TOOL_OUTPUT_COMPACT = os.getenv("TOOL_OUTPUT_COMPACT", "1").lower() not in ("0", "false", "no")
+# Upper bound on the tokens of one tool message sent back to the model (0 disables the cap).
+TOOL_OUTPUT_TOKEN_CAP = int(os.getenv("TOOL_OUTPUT_TOKEN_CAP", "1200"))
+# A trimmed chunk never goes below this many tokens, however many hits share the cap.
+MIN_CHUNK_TOKENS = 40
+
+FLIGHT_COLUMNS = ["airline", "alliance", "from", "to", "departure_date", "return_date", "layovers", "price_usd",
+                  "refundable"]
+_FLIGHT_KEYS = {
+    "airline": ["airline", "carrier"],
+    "alliance": ["alliance"],
+    "from": _ORIGIN_KEYS,
+    "to": _DEST_KEYS,
+    "departure_date": ["departure_date", "depart_date", "outbound_date"],
+    "return_date": ["return_date", "inbound_date"],
+    "layovers": ["layovers", "stops"],
+    "price_usd": ["price_usd", "price"],
+    "refundable": ["refundable", "is_refundable"],
+}
+_TABLE_HEAD = re.compile(r"^(\d+) itinerar(?:y|ies); columns: (.+)$")
+_WORD = re.compile(r"[a-z0-9]+")
+_SENTENCE = re.compile(r"(?<=[.!?])\s+|\n+")
+_STOPWORDS = {"the", "and", "for", "are", "can", "you", "what", "with", "does", "how", "need", "from", "that", "this",
+              "have", "about", "will", "any", "my", "our", "your", "is", "do", "a", "an", "to", "of", "in", "on", "i"}
+
+
+def _cell(field: str, value: Any) -> str:
+    if value is None:
+        return ""
+    if field == "layovers":
+        return ", ".join(str(v) for v in value) if isinstance(value, list) else str(value)
+    if field == "refundable":
+        return "yes" if value is True else "no"
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).replace("|", "/").replace("\n", " ")
+
+
+def _price(it: Dict[str, Any]) -> float:
+    try:
+        return float(_first_nonempty(it, _FLIGHT_KEYS["price_usd"]))
+    except (TypeError, ValueError):
+        return float("inf")
+
+
+def encode_flights(itineraries: List[Dict[str, Any]], max_tokens: int = 0) -> str:
+    """Itineraries as one pipe-separated row each, projected onto FLIGHT_COLUMNS.
+
+    Over max_tokens, only the cheapest rows that fit are kept and the header
+    says how many were left out.
+    """
+    if not itineraries:
+        return "0 itineraries matched."
+    rows = [(it, "|".join(_cell(f, _first_nonempty(it, _FLIGHT_KEYS[f])) for f in FLIGHT_COLUMNS))
+            for it in itineraries if isinstance(it, dict)]
+    head = f"{len(rows)} itineraries; columns: {'|'.join(FLIGHT_COLUMNS)}"
+    text = "\n".join([head] + [r for _, r in rows])
+    if not max_tokens or count_tokens(text) <= max_tokens:
+        return text
+    budget = max_tokens - count_tokens(head) - 20
+    kept = []
+    for _, row in sorted(rows, key=lambda r: _price(r[0])):
+        budget -= count_tokens(row) + 1
+        if budget < 0 and kept:
+            break
+        kept.append(row)
+    note = f"({len(rows) - len(kept)} more not shown; these are the {len(kept)} cheapest)"
+    return "\n".join([head] + kept + [note])
+
+
+def decode_flights(text: str) -> List[Dict[str, Any]] | None:
+    """Inverse of encode_flights (for the rows that were kept); None when text is not such a table."""
+    lines = (text or "").strip().splitlines()
+    if lines and lines[0] == "0 itineraries matched.":
+        return []
+    m = _TABLE_HEAD.match(lines[0]) if lines else None
+    if not m:
+        return None
+    cols = m.group(2).split("|")
+    out = []
+    for line in lines[1:]:
+        cells = line.split("|")
+        if len(cells) != len(cols):
+            continue
+        row: Dict[str, Any] = dict(zip(cols, cells))
+        row["layovers"] = [c for c in row.get("layovers", "").split(", ") if c]
+        row["refundable"] = row.get("refundable") == "yes"
+        try:
+            row["price_usd"] = float(row.get("price_usd") or 0)
+        except ValueError:
+            pass
+        out.append({k: v for k, v in row.items() if v != ""})
+    return out
+
+
+def _terms(question: str) -> set:
+    return {w for w in _WORD.findall((question or "").lower()) if len(w) > 2 and w not in _STOPWORDS}
+
+
+def trim_chunk(chunk: str, terms: set, max_tokens: int) -> str:
+    """Keep the sentences with the most query-term hits, in their original order, within max_tokens."""
+    if count_tokens(chunk) <= max_tokens:
+        return chunk
+    sentences = [s.strip() for s in _SENTENCE.split(chunk) if s.strip()]
+    scored = sorted(range(len(sentences)),
+                    key=lambda i: (-len(terms & set(_WORD.findall(sentences[i].lower()))), i))
+    keep, used = set(), 0
+    for i in scored:
+        cost = count_tokens(sentences[i]) + 1
+        if used + cost > max_tokens:
+            continue
+        keep.add(i)
+        used += cost
+    if not keep:
+        return truncate_tokens(sentences[scored[0]], max_tokens, marker=" …")
+    out, prev = [], -1
+    for i in sorted(keep):
+        if i != prev + 1:
+            out.append("…")
+        out.append(sentences[i])
+        prev = i
+    if prev != len(sentences) - 1:
+        out.append("…")
+    return " ".join(out)
+
+
+def compact_rag(hits: List[Dict[str, Any]], question: str, max_tokens: int = 0) -> str:
+    """rag_search hits projected onto title/id/chunk; chunks trimmed around query terms to share max_tokens."""
+    slim = [{"title": h.get("title"), "id": h.get("id"), "chunk": h.get("chunk") or ""}
+            for h in hits if isinstance(h, dict)]
+    text = json.dumps(slim, ensure_ascii=False, separators=(",", ":"))
+    if not max_tokens or not slim or count_tokens(text) <= max_tokens:
+        return text
+    overhead = count_tokens(json.dumps([{**h, "chunk": ""} for h in slim], ensure_ascii=False, separators=(",", ":")))
+    per_chunk = max(MIN_CHUNK_TOKENS, (max_tokens - overhead) // len(slim))
+    terms = _terms(question)
+    for h in slim:
+        h["chunk"] = trim_chunk(h["chunk"], terms, per_chunk)
+    return json.dumps(slim, ensure_ascii=False, separators=(",", ":"))
+
+
+def _question(args: str) -> str:
+    try:
+        obj = json.loads(args)
+    except ValueError:
+        return args
+    return str(obj.get("question", "")) if isinstance(obj, dict) else args
+
+
+def _compact_flight_filter(payload: Any, args: str, cap: int) -> str | None:
+    return encode_flights(payload, cap) if isinstance(payload, list) else None
+
+
+def _compact_rag_search(payload: Any, args: str, cap: int) -> str | None:
+    return compact_rag(payload, _question(args), cap) if isinstance(payload, list) else None
+
+
+COMPACTORS: Dict[str, Callable[[Any, str, int], str | None]] = {
+    "flight_filter": _compact_flight_filter,
+    "rag_search": _compact_rag_search,
+}
+
+
+def budget_tool_output(name: str, args: str, text: str, cap: int = TOOL_OUTPUT_TOKEN_CAP) -> str:
+    """The tool message content actually sent to the model for one tool result.
+
+    Known tools get a compact encoding (COMPACTORS); anything still over the
+    cap, or from a tool without a compactor, is truncated. Sizes before and
+    after are observed as tool.output_tokens_raw / tool.output_tokens.
+    """
+    raw_tokens = count_tokens(text)
+    out = text
+    compactor = COMPACTORS.get(name) if TOOL_OUTPUT_COMPACT else None
+    if compactor is not None:
+        try:
+            out = compactor(json.loads(text), args, cap) or text
+        except ValueError:
+            pass
+        except Exception:
+            logger.warning("Compacting '%s' output failed; sending it as is.", name, exc_info=True)
+    tokens = count_tokens(out) if out is not text else raw_tokens
+    if cap and tokens > cap:
+        out = truncate_tokens(out, cap)
+        tokens = count_tokens(out)
+        metrics.incr("tool.output_truncated")
+    metrics.observe("tool.output_tokens_raw", raw_tokens)
+    metrics.observe("tool.output_tokens", tokens)
+    metrics.observe(f"tool.output_tokens.{name}", tokens)
+    if tokens < raw_tokens:
+        logger.info("Tool '%s' output compacted: %d -> %d tokens.", name, raw_tokens, tokens)
+    return out
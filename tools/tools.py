@@ -8,7 +8,7 @@ from typing import Dict, Any, List, Optional
 from langchain.tools import tool
 import json
 from rag_store import search as rag_search_impl
-from helpers import load_flights, filter_flights
+from helpers import load_flights, filter_flights, FlightResultCache
 
 
 def _maybe_json(s: str) -> Optional[dict]:
@@ -39,13 +39,7 @@ def rag_search(input_text: str) -> str:
     return json.dumps(hits, ensure_ascii=False)
 
 
-@tool("flight_filter", return_direct=True)
-def flight_filter(input_text: str) -> str:
-    """
-    Filter the mock flight dataset.
-    INPUT: either a raw FlightCriteria JSON string, or a JSON string like {"criteria_json": "{...}"}.
-    OUTPUT: JSON list of itineraries.
-    """
+def _parse_criteria(input_text: str) -> Dict[str, Any]:
     # Accept both shapes:
     #   1) input_text == '{"origin":"Dubai", ...}'   (the criteria dict directly)
     #   2) input_text == '{"criteria_json":"{...}"}' (wrapper with a nested JSON string)
@@ -65,8 +59,17 @@ def flight_filter(input_text: str) -> str:
             criteria_dict = json.loads(input_text)
         except Exception:
             criteria_dict = {}
+    return criteria_dict if isinstance(criteria_dict, dict) else {}
+
 
-    matches = filter_flights(load_flights(), criteria_dict)
+@tool("flight_filter", return_direct=True)
+def flight_filter(input_text: str) -> str:
+    """
+    Filter the mock flight dataset.
+    INPUT: either a raw FlightCriteria JSON string, or a JSON string like {"criteria_json": "{...}"}.
+    OUTPUT: JSON list of itineraries.
+    """
+    matches = filter_flights(load_flights(), _parse_criteria(input_text))
     return json.dumps(matches, ensure_ascii=False)
 
 
@@ -106,9 +109,12 @@ def openai_tools_for_faq() -> List[Dict[str, Any]]:
         }
     ]
 
-def flight_dispatch() -> Dict[str, Any]:
+def flight_dispatch(cache: FlightResultCache | None = None) -> Dict[str, Any]:
+    """With a conversation cache, flight_filter re-filters the previous matches when the criteria only narrow."""
+    if cache is None:
+        return {"flight_filter": flight_filter.invoke}
     return {
-        "flight_filter": flight_filter.invoke,
+        "flight_filter": lambda input_text: json.dumps(cache.search(_parse_criteria(input_text)), ensure_ascii=False),
     }
 
 
@@ -0,0 +1,87 @@
+import os
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Tuple
+import metrics
+
+logger = logging.getLogger("agentic_chatbot.warmup")
+
+WARMUP_ENABLED = os.getenv("WARMUP", "1").lower() not in ("0", "false", "no")
+
+_status: Dict[str, Dict[str, Any]] = {}
+_thread: threading.Thread | None = None
+_lock = threading.Lock()
+
+
+def _flight_store():
+    from helpers import load_flights
+    return {"itineraries": len(load_flights())}
+
+
+def _retriever():
+    import rag_store
+    return rag_store.warm_up()
+
+
+def _intent_centroids():
+    from agents.intent_classifier import warm_up
+    return {"ready": warm_up()}
+
+
+def _answer_cache():
+    from answer_cache import get_answer_cache
+    return get_answer_cache().info()
+
+
+def _llm_client():
+    from graph.openai_client import get_client
+    get_client()
+    return {}
+
+
+# Cheapest first, so a turn that arrives early finds as much ready as possible.
+STEPS: List[Tuple[str, Callable[[], Any]]] = [
+    ("flight_store", _flight_store),
+    ("llm_client", _llm_client),
+    ("retriever", _retriever),
+    ("intent_centroids", _intent_centroids),
+    ("answer_cache", _answer_cache),
+]
+
+
+def run_warmup():
+    for name, step in STEPS:
+        t0 = time.perf_counter()
+        try:
+            info = step() or {}
+            ok = True
+        except Exception as e:
+            logger.warning(f"Warmup step '{name}' failed: {e!r}")
+            info, ok = {"error": repr(e)}, False
+        ms = (time.perf_counter() - t0) * 1000.0
+        metrics.observe(f"warmup.{name}_ms", ms)
+        with _lock:
+            _status[name] = {"ok": ok, "ms": round(ms, 1), **info}
+    logger.info("Warmup finished: " + ", ".join(f"{k}={v['ms']}ms" for k, v in status().items()))
+
+
+def start_warmup() -> threading.Thread | None:
+    """Preload the flight store, retriever and caches on a daemon thread (once per process).
+
+    Resources are lock-protected singletons, so a turn that needs one before
+    the warmup reaches it simply loads it itself or waits for the warmup.
+    """
+    global _thread
+    if not WARMUP_ENABLED:
+        return None
+    with _lock:
+        if _thread is None:
+            _thread = threading.Thread(target=run_warmup, name="warmup", daemon=True)
+            _thread.start()
+        return _thread
+
+
+def status() -> Dict[str, Dict[str, Any]]:
+    with _lock:
+        return {k: dict(v) for k, v in _status.items()}